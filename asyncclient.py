@@ -0,0 +1,463 @@
+'''
+基于 asyncio 的 IMAP 客户端，接口与 EmailClient 一致
+同一连接上可以同时有多条带标签的命令在途（流水线），一个事件循环即可服务多个账号
+'''
+import asyncio
+import logging
+import re
+import ssl
+from collections import deque
+
+from imapparse import chunked, parse, parse_fetch, sequence_set
+from to163 import EmailClient
+
+_LITERAL_END = re.compile(rb'\{(\d+)\}\r\n$')
+# SEARCH 结果可能是很长的一行，放宽 StreamReader 的单行长度限制
+_LINE_LIMIT = 16 * 1024 * 1024
+
+
+class ImapError(Exception):
+    '''连接断开或协议错误'''
+
+
+def _quote(value):
+    '''把参数转换为 IMAP 带引号字符串'''
+    return '"' + str(value).replace('\\', '\\\\').replace('"', '\\"') + '"'
+
+
+class _Pending:
+    '''一条在途命令：收集属于它的未标记响应，等待带标签的完成响应'''
+
+    def __init__(self, future):
+        self.future = future
+        self.untagged = []
+
+
+class AsyncEmailClient:
+    '''
+    异步 IMAP 客户端
+    :param user: 邮箱账号
+    :param password: 邮箱密码或授权码
+    :param host: IMAP 服务器地址
+    :param port: IMAP 服务器端口
+    :param use_ssl: 是否使用 SSL
+    :param use_uid: 为 True 时搜索、获取、复制和删除都使用 UID
+    :param pipeline: fetch_emails 同时在途的批次数
+    :param quiet: 为 True 时不打印，提示和错误分别记录为 logging.info 和 logging.error
+    '''
+
+    Email = EmailClient.Email
+    FETCH_MODES = EmailClient.FETCH_MODES
+    HEADER_FIELDS = EmailClient.HEADER_FIELDS
+
+    # 与 EmailClient 共用的邮件解析逻辑
+    _parse_message = EmailClient._parse_message
+    _decode_content = staticmethod(EmailClient._decode_content)
+    _email_record = EmailClient._email_record
+    _fetch_id = EmailClient._fetch_id
+    _partial_items = EmailClient._partial_items
+    _collect_headers = EmailClient._collect_headers
+    _collect_bodies = EmailClient._collect_bodies
+    _build_partial = EmailClient._build_partial
+    _attr_uid = staticmethod(EmailClient._attr_uid)
+    _text_part = staticmethod(EmailClient._text_part)
+    _decode_transfer = staticmethod(EmailClient._decode_transfer)
+    _info = EmailClient._info
+
+    def __init__(self, user=None, password=None, host='imap.163.com', port=993, use_ssl=True,
+                 use_uid=True, pipeline=4, quiet=False):
+        self.user = user
+        self.password = password
+        self.host = host
+        self.port = port
+        self.use_ssl = use_ssl
+        self.use_uid = use_uid
+        self.pipeline = pipeline
+        self.quiet = quiet
+        self.capabilities = ()
+        self.current_folder = None
+        self.uidvalidity = None
+        self.exists = 0
+        self.unsolicited = []
+        self._reader = None
+        self._writer = None
+        self._read_task = None
+        self._pending = {}
+        self._tag = 0
+
+    def _error(self, message):
+        '''打印错误信息，quiet 模式下记录为 logging.error'''
+        if self.quiet:
+            logging.error(message)
+        else:
+            print(message)
+
+    @property
+    def connected(self):
+        return self._writer is not None and not self._writer.is_closing()
+
+    # ---- 协议层 ----
+
+    async def _read_loop(self):
+        '''读取服务器响应，未标记响应归属最早的在途命令，带标签响应完成对应命令'''
+        try:
+            while True:
+                line = await self._reader.readline()
+                if not line:
+                    raise ImapError('连接已被服务器关闭')
+                while True:
+                    mo = _LITERAL_END.search(line)
+                    if not mo:
+                        break
+                    line += await self._reader.readexactly(int(mo.group(1)))
+                    line += await self._reader.readline()
+                line = line.rstrip(b'\r\n')
+                if line.startswith(b'* '):
+                    target = next(iter(self._pending.values()), None)
+                    (target.untagged if target else self.unsolicited).append(line[2:])
+                elif line.startswith(b'+'):
+                    continue
+                else:
+                    tag, _, rest = line.partition(b' ')
+                    status, _, text = rest.partition(b' ')
+                    pending = self._pending.pop(tag, None)
+                    if pending and not pending.future.done():
+                        pending.future.set_result((status.decode().upper(), pending.untagged, text))
+        except (ImapError, OSError, ValueError, asyncio.IncompleteReadError) as e:
+            error = e if isinstance(e, ImapError) else ImapError(str(e))
+            for pending in self._pending.values():
+                if not pending.future.done():
+                    pending.future.set_exception(error)
+            self._pending.clear()
+
+    def _send(self, name, *args):
+        '''
+        立即发送一条命令，不等待完成
+        :return: future，结果为 (状态, 未标记响应列表, 状态文本)
+        '''
+        if not self.connected:
+            raise ImapError('未连接')
+        self._tag += 1
+        tag = f"A{self._tag:05d}".encode()
+        future = asyncio.get_running_loop().create_future()
+        self._pending[tag] = _Pending(future)
+        line = ' '.join([name] + [str(a) for a in args])
+        self._writer.write(tag + b' ' + line.encode('utf-8') + b'\r\n')
+        return future
+
+    async def command(self, name, *args):
+        '''
+        发送命令并等待完成
+        :return: (状态, 未标记响应列表, 状态文本)
+        '''
+        future = self._send(name, *args)
+        await self._writer.drain()
+        return await future
+
+    def _msg_name(self, name):
+        return f"UID {name}" if self.use_uid else name
+
+    @staticmethod
+    def _fetch_data(untagged):
+        '''把未标记的 FETCH 响应转换为 parse_fetch 能处理的数据列表'''
+        data = []
+        for line in untagged:
+            seq, _, rest = line.partition(b' ')
+            kind, _, rest = rest.partition(b' ')
+            if kind.upper() == b'FETCH':
+                data.append(seq + b' ' + rest)
+        return data
+
+    # ---- 与 EmailClient 一致的接口 ----
+
+    async def login(self):
+        '''登录邮箱'''
+        if not self.user or not self.password:
+            self._error("用户名或密码未提供")
+            return None
+        try:
+            context = ssl.create_default_context() if self.use_ssl else None
+            self._reader, self._writer = await asyncio.open_connection(
+                self.host, self.port, ssl=context, limit=_LINE_LIMIT)
+            await self._reader.readline()
+            self._read_task = asyncio.create_task(self._read_loop())
+            # CAPABILITY 与 LOGIN 一起流水线发送
+            capability = self._send('CAPABILITY')
+            typ, untagged, text = await self.command('LOGIN', _quote(self.user), _quote(self.password))
+            _, caps, _ = await capability
+            for line in caps:
+                if line.upper().startswith(b'CAPABILITY '):
+                    self.capabilities = tuple(line.decode().upper().split()[1:])
+            if typ != 'OK':
+                self._error(text.decode())
+                return None
+            self._info(f"登录成功: {self.user}")
+        except (OSError, ImapError) as e:
+            self._error(f"登录失败: {e}")
+            return None
+
+        try:
+            args = ("name", self.user, "contact", self.user, "version", "1.0.0", "vendor", "myclient")
+            await self.command('ID', '(' + ' '.join(_quote(a) for a in args) + ')')
+        except ImapError as e:
+            self._error(f"发送 ID 命令失败: {e}")
+        return self
+
+    async def select_folder(self, folder):
+        '''选择文件夹'''
+        if not self.connected:
+            return None
+        try:
+            typ, untagged, text = await self.command('SELECT', _quote(folder))
+        except ImapError as e:
+            self._error(f"选择文件夹 {folder} 失败: {e}")
+            return None
+        if typ != 'OK':
+            self._error(text.decode())
+            return None
+        self.current_folder = folder
+        self.uidvalidity = None
+        for line in untagged:
+            parts = line.split()
+            if len(parts) > 1 and parts[1].upper() == b'EXISTS':
+                self.exists = int(parts[0])
+            mo = re.search(rb'\[UIDVALIDITY (\d+)\]', line)
+            if mo:
+                self.uidvalidity = int(mo.group(1))
+        self._info(f"已选择文件夹 {folder}")
+        self._info(f"邮件数量: {self.exists}")
+        return typ, [str(self.exists).encode()]
+
+    async def folder_status(self, folder, items=('MESSAGES', 'UNSEEN')):
+        '''
+        用一条 STATUS 命令获取文件夹的邮件数等信息
+        :return: {状态项: 整数}，失败时返回 None
+        '''
+        if not self.connected:
+            return None
+        try:
+            typ, untagged, text = await self.command('STATUS', _quote(folder), f"({' '.join(items)})")
+        except ImapError as e:
+            self._error(f"获取文件夹 {folder} 状态失败: {e}")
+            return None
+        if typ != 'OK':
+            self._error(text.decode())
+            return None
+        for line in untagged:
+            if line.upper().startswith(b'STATUS '):
+                values = parse(line[7:])
+                attrs = values[-1] if values and isinstance(values[-1], list) else []
+                return {attrs[i].decode().upper(): int(attrs[i + 1]) for i in range(0, len(attrs) - 1, 2)}
+        return None
+
+    async def list_folders(self):
+        '''列出所有文件夹'''
+        if not self.connected:
+            return []
+        try:
+            typ, untagged, _ = await self.command('LIST', '""', '"*"')
+        except ImapError as e:
+            self._error(f"列出文件夹失败: {e}")
+            return []
+        folder_list = []
+        if typ == 'OK':
+            pattern = r'"([^"]+)"$'
+            for line in untagged:
+                if line.upper().startswith(b'LIST '):
+                    match = re.search(pattern, line.decode('utf-8', 'replace'))
+                    if match:
+                        folder_list.append(match.group(1))
+        return folder_list
+
+    async def search_emails(self, criteria):
+        '''
+        搜索邮件
+        :param criteria: 搜索条件，例如 'FROM "sender@example.com"'
+        :return: 搜索到的邮件 ID 列表，UID 模式下为 UID
+        '''
+        if not self.connected:
+            self._error("未登录邮箱，无法搜索邮件。")
+            return []
+        try:
+            typ, untagged, text = await self.command(self._msg_name('SEARCH'), criteria)
+        except ImapError as e:
+            self._error(f"搜索邮件失败: {e}")
+            return []
+        if typ != 'OK':
+            self._error(text.decode())
+            return []
+        email_ids = []
+        for line in untagged:
+            if line.upper().startswith(b'SEARCH'):
+                email_ids.extend(line.decode().split()[1:])
+        return email_ids
+
+    async def fetch_email(self, email_id, mode='full'):
+        '''
+        获取邮件内容
+        :param email_id: 要获取的邮件的ID
+        :param mode: 获取模式，'full'、'text' 或 'headers'
+        :return: 邮件对象
+        '''
+        async for email_obj in self.fetch_emails([email_id], mode=mode):
+            return email_obj
+        return None
+
+    async def fetch_emails(self, email_ids, batch_size=500, mode='full'):
+        '''
+        批量获取邮件内容，同时保持最多 pipeline 个批次在途
+        :param email_ids: 要获取的邮件ID列表
+        :param batch_size: 每条 FETCH 命令包含的邮件数量
+        :param mode: 获取模式，'full'、'text' 或 'headers'
+        :return: 异步生成器，按顺序产出邮件对象
+        '''
+        if mode not in self.FETCH_MODES:
+            raise ValueError(f"未知的获取模式: {mode}")
+        if not self.connected:
+            logging.error("未登录邮箱，无法获取邮件。")
+            return
+        batches = deque(chunked(email_ids, batch_size))
+        in_flight = deque()
+        try:
+            while batches or in_flight:
+                while batches and len(in_flight) < self.pipeline:
+                    in_flight.append(asyncio.ensure_future(self._fetch_batch(batches.popleft(), mode)))
+                for email_obj in await in_flight.popleft():
+                    yield email_obj
+        finally:
+            for task in in_flight:
+                task.cancel()
+
+    async def _fetch_batch(self, batch, mode):
+        '''获取一批邮件，返回邮件对象列表'''
+        id_set = sequence_set(batch)
+        try:
+            if mode == 'full':
+                typ, untagged, text = await self.command(self._msg_name('FETCH'), id_set, '(UID RFC822)')
+                if typ != 'OK':
+                    logging.error(f"批量获取邮件 ({id_set}) 时收到非 OK 响应: {text.decode()}")
+                    return []
+                return [self._parse_message(self._fetch_id(seq, attrs, self.use_uid), attrs['RFC822'],
+                                            self._attr_uid(attrs))
+                        for seq, attrs in parse_fetch(self._fetch_data(untagged)) if 'RFC822' in attrs]
+
+            typ, untagged, text = await self.command(self._msg_name('FETCH'), id_set, self._partial_items(mode))
+            if typ != 'OK':
+                logging.error(f"批量获取邮件 ({id_set}) 时收到非 OK 响应: {text.decode()}")
+                return []
+            messages, sections = self._collect_headers(self._fetch_data(untagged), mode, self.use_uid)
+            # 各部分编号的正文请求同时发出
+            futures = {section: self._send(self._msg_name('FETCH'), sequence_set(ids), f"(BODY.PEEK[{section}])")
+                       for section, ids in sections.items()}
+            await self._writer.drain()
+            bodies = {}
+            for section, future in futures.items():
+                typ, untagged, _ = await future
+                if typ == 'OK':
+                    bodies.update(self._collect_bodies(self._fetch_data(untagged), section, self.use_uid))
+            return list(self._build_partial(messages, bodies))
+        except ImapError as e:
+            logging.error(f"批量获取邮件 ({id_set}) 失败: {e}")
+            return []
+
+    async def copy_email(self, email_id, target_folder):
+        '''
+        复制邮件到指定文件夹
+        :return: 复制成功返回 True，失败返回 False
+        '''
+        return await self.copy_emails([email_id], target_folder)
+
+    async def copy_emails(self, email_ids, target_folder):
+        '''批量复制邮件，ID 压缩成一个序列集'''
+        if not self.connected:
+            self._error("未登录邮箱，无法复制邮件。")
+            return False
+        if not await self._simple(self._msg_name('COPY'), sequence_set(email_ids), _quote(target_folder)):
+            return False
+        self._info(f"{len(email_ids)} 封邮件已成功复制到 {target_folder} 文件夹")
+        return True
+
+    async def delete_email(self, email_id, trash='Trash'):
+        '''
+        删除邮件：移动到垃圾箱
+        :return: 删除成功返回 True，失败返回 False
+        '''
+        return await self.delete_emails([email_id], trash)
+
+    async def delete_emails(self, email_ids, trash='Trash', expunge_all=False):
+        '''
+        批量删除邮件，服务器支持 MOVE 时直接移动到垃圾箱，
+        否则复制后标记 \\Deleted 并清除；trash 为 None 时不保留副本
+        注意：清除时只有 UID 模式且服务器支持 UIDPLUS 才能用 UID EXPUNGE 只清除这些邮件；否则普通 EXPUNGE
+        会清除文件夹中所有带 \\Deleted 标志的邮件，文件夹中还有其他这样的邮件时不执行任何操作并返回 False，
+        除非 expunge_all 为 True
+        '''
+        if not self.connected:
+            self._error("未登录邮箱，无法删除邮件。")
+            return False
+        id_set = sequence_set(email_ids)
+        if trash and 'MOVE' in self.capabilities:
+            ok = await self._simple(self._msg_name('MOVE'), id_set, _quote(trash))
+        else:
+            uid_expunge = self.use_uid and 'UIDPLUS' in self.capabilities
+            if not uid_expunge and not expunge_all and not await self._expunge_is_safe(email_ids):
+                return False
+            ok = (not trash or await self._simple(self._msg_name('COPY'), id_set, _quote(trash))) \
+                and await self._simple(self._msg_name('STORE'), id_set, '+FLAGS.SILENT', '(\\Deleted)')
+            if ok:
+                if uid_expunge:
+                    ok = await self._simple('UID EXPUNGE', id_set)
+                else:
+                    ok = await self._simple('EXPUNGE')
+        if ok:
+            self._info(f"{len(email_ids)} 封邮件已删除")
+        return ok
+
+    async def _expunge_is_safe(self, email_ids):
+        '''
+        普通 EXPUNGE 会清除文件夹中所有带 \\Deleted 标志的邮件，除 email_ids 以外还有这样的邮件时拒绝执行
+        :return: 可以清除返回 True；会连带清除其他邮件或检查失败时打印原因并返回 False
+        '''
+        try:
+            typ, untagged, text = await self.command(self._msg_name('SEARCH'), 'DELETED')
+        except ImapError as e:
+            self._error(f"检查带删除标志的邮件失败: {e}")
+            return False
+        if typ != 'OK':
+            self._error(text.decode())
+            return False
+        deleted = set()
+        for line in untagged:
+            if line.upper().startswith(b'SEARCH'):
+                deleted.update(int(n) for n in line.split()[1:])
+        others = deleted - set(map(int, email_ids))
+        if others:
+            self._error(f"服务器不支持 UIDPLUS，EXPUNGE 会连带清除文件夹中另外 {len(others)} 封已标记删除的邮件，未执行操作；"
+                  f"确认要一起清除时传入 expunge_all=True。")
+            return False
+        return True
+
+    async def _simple(self, name, *args):
+        '''发送命令，成功返回 True，失败时打印原因并返回 False'''
+        try:
+            typ, _, text = await self.command(name, *args)
+        except ImapError as e:
+            self._error(f"{name} 失败: {e}")
+            return False
+        if typ != 'OK':
+            self._error(text.decode())
+            return False
+        return True
+
+    async def logout(self):
+        '''退出登录'''
+        if not self.connected:
+            return
+        try:
+            typ, _, text = await self.command('LOGOUT')
+            self._info(f"{typ} {text.decode()}")
+        except ImapError:
+            pass
+        self._writer.close()
+        if self._read_task:
+            self._read_task.cancel()
@@ -0,0 +1,166 @@
+'''
+附件提取：根据 BODYSTRUCTURE 找出附件，按 BODY.PEEK[n]<offset.length> 分块获取，
+边下载边做 base64/quoted-printable 解码写入磁盘；文件按 SHA-256 保存在内容寻址的目录中，
+相同的附件只保存一份，内存占用只与分块大小有关，与附件大小无关
+'''
+import binascii
+import hashlib
+import os
+import tempfile
+from email.utils import decode_rfc2231
+from urllib.parse import unquote
+
+import headers
+from imapparse import parse_bodystructure
+
+
+class Base64Decoder:
+    '''增量 base64 解码：不足 4 个字符的尾部留到下一块再解码'''
+
+    def __init__(self):
+        self._tail = b''
+
+    def feed(self, data):
+        data = self._tail + b''.join(data.split())
+        cut = len(data) - len(data) % 4
+        self._tail = data[cut:]
+        return binascii.a2b_base64(data[:cut]) if cut else b''
+
+    def finish(self):
+        tail, self._tail = self._tail, b''
+        if not tail.strip(b'='):
+            return b''
+        return binascii.a2b_base64(tail + b'=' * (-len(tail) % 4))
+
+
+class QuotedPrintableDecoder:
+    '''增量 quoted-printable 解码：按整行解码，最后一个换行之后的内容留到下一块'''
+
+    def __init__(self):
+        self._tail = b''
+
+    def feed(self, data):
+        data = self._tail + data
+        cut = data.rfind(b'\n') + 1
+        if not cut:
+            # 还没有完整的行：解码到可能被截断的 '=XX' 转义之前
+            escape = data.rfind(b'=', -2)
+            cut = escape if escape >= 0 else len(data)
+        self._tail = data[cut:]
+        return binascii.a2b_qp(data[:cut])
+
+    def finish(self):
+        tail, self._tail = self._tail, b''
+        return binascii.a2b_qp(tail)
+
+
+class IdentityDecoder:
+    '''7bit、8bit、binary 等不需要解码的传输编码'''
+
+    def feed(self, data):
+        return data
+
+    def finish(self):
+        return b''
+
+
+def make_decoder(encoding):
+    '''
+    :param encoding: BODYSTRUCTURE 中的传输编码（小写）
+    :return: 对应的增量解码器
+    '''
+    if encoding == 'base64':
+        return Base64Decoder()
+    if encoding == 'quoted-printable':
+        return QuotedPrintableDecoder()
+    return IdentityDecoder()
+
+
+def _filename(part):
+    '''取附件文件名，支持 RFC 2047 encoded-word 和 RFC 2231 的 filename* 参数'''
+    for key in ('filename*', 'name*'):
+        value = part['disposition_params'].get(key) or part['params'].get(key)
+        if value:
+            charset, _, text = decode_rfc2231(value)
+            return unquote(text, encoding=charset or 'utf-8', errors='replace')
+    if part['filename']:
+        return headers.decode_header_value(part['filename'])
+    return None
+
+
+def attachment_parts(structure, text_section=None):
+    '''
+    从 BODYSTRUCTURE 中找出附件
+    :param structure: parse_fetch 返回的 BODYSTRUCTURE 值
+    :param text_section: 作为正文的部分编号，不视为附件
+    :return: 部分字典列表（见 parse_bodystructure），另加解码后的 filename
+    '''
+    found = []
+    for part in parse_bodystructure(structure):
+        if part['section'] == text_section:
+            continue
+        filename = _filename(part)
+        if part['disposition'] == 'attachment' or filename:
+            part['filename'] = filename or f"part-{part['section']}"
+            found.append(part)
+    return found
+
+
+class _BlobWriter:
+    '''写入一个附件：先写临时文件并计算 SHA-256，提交时按摘要移动到存储目录'''
+
+    def __init__(self, store):
+        self.store = store
+        self.size = 0
+        self._hash = hashlib.sha256()
+        fd, self._tmp = tempfile.mkstemp(dir=store.tmp_dir, suffix='.part')
+        self._file = os.fdopen(fd, 'wb')
+
+    def write(self, data):
+        if data:
+            self._hash.update(data)
+            self._file.write(data)
+            self.size += len(data)
+
+    def commit(self):
+        '''
+        :return: 文件的 SHA-256 十六进制摘要；相同内容已经存在时丢弃临时文件
+        '''
+        self._file.close()
+        digest = self._hash.hexdigest()
+        path = self.store.path(digest)
+        if os.path.exists(path):
+            os.remove(self._tmp)
+        else:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            os.replace(self._tmp, path)
+        return digest
+
+    def abort(self):
+        self._file.close()
+        try:
+            os.remove(self._tmp)
+        except OSError:
+            pass
+
+
+class AttachmentStore:
+    '''
+    内容寻址的附件目录，文件保存为 <root>/<摘要前两位>/<摘要>
+    :param root: 存储目录
+    '''
+
+    def __init__(self, root):
+        self.root = root
+        self.tmp_dir = os.path.join(root, 'tmp')
+        os.makedirs(self.tmp_dir, exist_ok=True)
+
+    def path(self, digest):
+        return os.path.join(self.root, digest[:2], digest)
+
+    def __contains__(self, digest):
+        return os.path.exists(self.path(digest))
+
+    def writer(self):
+        ''':return: 写入一个新附件的对象，调用 write、commit 或 abort'''
+        return _BlobWriter(self)
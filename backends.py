@@ -0,0 +1,233 @@
+'''
+EmailClient 的连接后端：真实 IMAP 服务器、进程内的桩服务器和本地 mbox/Maildir 归档
+后端只负责建立 imaplib 连接，EmailClient 的搜索、获取、导出等逻辑在所有后端上完全相同；
+本地归档通过进程内的桩服务器提供，删除、移动等修改只在本次运行的内存中生效，不会写回归档
+'''
+import email
+import imaplib
+import mmap
+import os
+import re
+from array import array
+
+import fakeimap
+
+# mboxrd 转义：正文中以 "From " 开头的行写入时加了 '>'，读取时去掉一个
+_FROM_ESCAPE = re.compile(rb'(?m)^>(>*From )')
+_STATUS = re.compile(rb'(?mi)^(X-)?Status:[ \t]*([A-Za-z]*)')
+
+# mbox 的 Status/X-Status 头和 Maildir 文件名中的标志字母
+_MBOX_FLAGS = {'R': '\\Seen', 'A': '\\Answered', 'F': '\\Flagged', 'D': '\\Deleted', 'T': '\\Draft'}
+_MAILDIR_FLAGS = {'S': '\\Seen', 'R': '\\Answered', 'F': '\\Flagged', 'T': '\\Deleted', 'D': '\\Draft'}
+
+
+class ImapBackend:
+    '''
+    真实的 IMAP 服务器
+    :param host: IMAP 服务器地址
+    :param port: IMAP 服务器端口
+    :param use_ssl: 是否使用 SSL
+    :param timeout: 连接和读写的超时时间（秒），为 None 时不超时
+    '''
+
+    def __init__(self, host='imap.163.com', port=993, use_ssl=True, timeout=None):
+        self.host = host
+        self.port = port
+        self.use_ssl = use_ssl
+        self.timeout = timeout
+
+    def connect(self):
+        ''':return: 已连接、尚未登录的 imaplib.IMAP4'''
+        if self.use_ssl:
+            return imaplib.IMAP4_SSL(port=self.port, host=self.host, timeout=self.timeout)
+        return imaplib.IMAP4(port=self.port, host=self.host, timeout=self.timeout)
+
+
+class _LocalIMAP4(imaplib.IMAP4):
+    '''通过 socketpair 与进程内桩服务器通信的 imaplib 连接'''
+
+    def __init__(self, server):
+        self._server = server
+        super().__init__('local')
+
+    def _create_socket(self, timeout):
+        return self._server.connect()
+
+
+class FakeBackend:
+    '''
+    进程内的桩服务器，不监听端口也不访问网络，用于测试
+    :param mailbox: fakeimap.Mailbox，为 None 时创建空邮箱
+    :param server_kwargs: 传给 fakeimap.LocalServer 的其它参数，例如 latency、capabilities
+    '''
+
+    def __init__(self, mailbox=None, **server_kwargs):
+        self.server = fakeimap.LocalServer(mailbox, **server_kwargs)
+
+    @property
+    def mailbox(self):
+        return self.server.mailbox
+
+    def connect(self):
+        return _LocalIMAP4(self.server)
+
+
+class LocalBackend(FakeBackend):
+    '''
+    本地归档，账号和密码可以任意填写
+    :param path: mbox 文件、Maildir 目录，或包含多个 mbox 文件/Maildir 的目录（每个一个文件夹）
+    :param server_kwargs: 传给 fakeimap.LocalServer 的其它参数
+    '''
+
+    def __init__(self, path, **server_kwargs):
+        super().__init__(load_archive(path), **server_kwargs)
+
+
+class ArchiveMessage(fakeimap.Message):
+    '''归档中的一封邮件，内容每次按序号从归档读取，不常驻内存'''
+
+    def __init__(self, uid, archive, index, flags=(), modseq=1):
+        self.uid = uid
+        self.archive = archive
+        self.index = index
+        self.flags = set(flags)
+        self.modseq = modseq
+
+    @property
+    def raw(self):
+        return self.archive.read(self.index)
+
+    @property
+    def parsed(self):
+        return email.message_from_bytes(self.raw)
+
+
+class MboxArchive:
+    '''
+    mbox 文件：用 mmap 映射整个文件，打开时扫描一遍建立每封邮件的偏移索引，
+    之后按序号 O(1) 读取任意一封邮件
+    :param path: mbox 文件路径
+    '''
+
+    def __init__(self, path):
+        self.path = path
+        self.uidvalidity = int(os.stat(path).st_mtime) & 0xffffffff or 1
+        self.starts = array('Q')
+        self.ends = array('Q')
+        self.flags = []
+        with open(path, 'rb') as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if os.fstat(f.fileno()).st_size else b''
+        self._index()
+
+    def _index(self):
+        data = self._map
+        size = len(data)
+        if data[:5] == b'From ':
+            pos = 0
+        else:
+            pos = data.find(b'\nFrom ')
+            if pos < 0:
+                return
+            pos += 1
+        while True:
+            start = data.find(b'\n', pos) + 1
+            if not start:
+                break
+            nxt = data.find(b'\nFrom ', start)
+            if nxt >= 0:
+                # 分隔行前的空行属于 mbox 格式，不属于邮件
+                end = nxt
+            else:
+                end = size - 1 if data[size - 2:size] == b'\n\n' else size
+            self.starts.append(start)
+            self.ends.append(end)
+            self.flags.append(self._flags(data, start, end))
+            if nxt < 0:
+                break
+            pos = nxt + 1
+
+    @staticmethod
+    def _flags(data, start, end):
+        header_end = data.find(b'\n\n', start, end)
+        header = data[start:header_end if header_end >= 0 else end]
+        flags = set()
+        for _, letters in _STATUS.findall(header):
+            flags.update(_MBOX_FLAGS[c] for c in letters.decode('ascii').upper() if c in _MBOX_FLAGS)
+        return flags
+
+    def __len__(self):
+        return len(self.starts)
+
+    def read(self, index):
+        ''':return: 第 index 封邮件的原始字节'''
+        data = self._map[self.starts[index]:self.ends[index]]
+        return _FROM_ESCAPE.sub(rb'\1', data) if b'>From ' in data else data
+
+
+class MaildirArchive:
+    '''
+    Maildir 目录：cur/ 和 new/ 中的每个文件是一封邮件，按文件名排序分配 UID
+    :param path: 包含 cur、new 子目录的目录
+    '''
+
+    def __init__(self, path):
+        self.path = path
+        self.uidvalidity = int(os.stat(path).st_mtime) & 0xffffffff or 1
+        self.files = []
+        self.flags = []
+        entries = []
+        for sub in ('cur', 'new'):
+            directory = os.path.join(path, sub)
+            if os.path.isdir(directory):
+                entries.extend((name, sub) for name in os.listdir(directory) if not name.startswith('.'))
+        for name, sub in sorted(entries):
+            self.files.append(os.path.join(path, sub, name))
+            info = name.rpartition(':2,')[2] if ':2,' in name else ''
+            self.flags.append({_MAILDIR_FLAGS[c] for c in info if c in _MAILDIR_FLAGS})
+
+    def __len__(self):
+        return len(self.files)
+
+    def read(self, index):
+        with open(self.files[index], 'rb') as f:
+            return f.read()
+
+
+def _is_maildir(path):
+    return os.path.isdir(os.path.join(path, 'cur'))
+
+
+def _add_folder(mailbox, name, archive):
+    folder = mailbox.create(name, archive.uidvalidity)
+    folder.uidvalidity = archive.uidvalidity
+    for index in range(len(archive)):
+        folder.highestmodseq += 1
+        folder.messages.append(ArchiveMessage(folder.uidnext, archive, index, archive.flags[index],
+                                              folder.highestmodseq))
+        folder.uidnext += 1
+
+
+def load_archive(path):
+    '''
+    把本地归档加载为桩服务器的邮箱，只建立索引，不读取邮件内容
+    单个 mbox 文件或 Maildir 目录作为 INBOX；Maildir++ 的 .名称 子目录和目录中的 mbox 文件各为一个文件夹
+    :param path: 归档路径
+    :return: fakeimap.Mailbox
+    '''
+    mailbox = fakeimap.Mailbox()
+    if os.path.isfile(path):
+        _add_folder(mailbox, 'INBOX', MboxArchive(path))
+        return mailbox
+    if _is_maildir(path):
+        _add_folder(mailbox, 'INBOX', MaildirArchive(path))
+    for name in sorted(os.listdir(path)):
+        full = os.path.join(path, name)
+        if name.startswith('.') and _is_maildir(full):
+            _add_folder(mailbox, name[1:], MaildirArchive(full))
+        elif name in ('cur', 'new', 'tmp') or name.startswith('.'):
+            continue
+        elif _is_maildir(full):
+            _add_folder(mailbox, name, MaildirArchive(full))
+        elif os.path.isfile(full):
+            _add_folder(mailbox, 'INBOX' if name.upper() == 'INBOX' else name, MboxArchive(full))
+    return mailbox
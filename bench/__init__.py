@@ -0,0 +1,5 @@
+'''
+基准测试脚本，在仓库根目录下以 python -m bench.<脚本名> 运行
+python -m bench.suite 用合成邮箱运行全部可重复的基准测试，结果可以写成 JSON 并与基线比较
+各脚本通过 bench.server.start_server 在独立进程中启动桩服务器
+'''
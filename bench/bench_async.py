@@ -0,0 +1,86 @@
+'''
+对比 EmailClient 逐个账号导出与 AsyncEmailClient 在一个事件循环中同时服务多个账号的速度
+用法: python -m bench.bench_async [--count 2000] [--latency 0.02] [--accounts 8] [--batch-size 50] [--pipeline 4]
+'''
+import argparse
+import asyncio
+import contextlib
+import io
+import time
+
+from asyncclient import AsyncEmailClient
+from bench.server import numbered_mailbox, start_server
+from to163 import EmailClient
+
+
+def _sync_export(options, accounts, batch_size):
+    total = 0
+    for i in range(accounts):
+        client = EmailClient(f'bench{i}@example.com', 'secret', **options)
+        client.login()
+        client.select_folder('INBOX')
+        ids = client.search_emails('ALL')
+        total += sum(1 for e in client.fetch_emails(ids, batch_size) if e)
+        client.logout()
+    return total
+
+
+async def _async_export(options, accounts, batch_size, pipeline):
+    async def export(i):
+        client = AsyncEmailClient(f'bench{i}@example.com', 'secret', pipeline=pipeline, **options)
+        await client.login()
+        await client.select_folder('INBOX')
+        ids = await client.search_emails('ALL')
+        count = 0
+        async for e in client.fetch_emails(ids, batch_size):
+            count += 1 if e else 0
+        await client.logout()
+        return count
+
+    return sum(await asyncio.gather(*(export(i) for i in range(accounts))))
+
+
+def run(count=2000, latency=0.02, accounts=8, batch_size=50, pipeline=4):
+    process, (host, port), _ = start_server(numbered_mailbox, count, latency=latency)
+    options = dict(host=host, port=port, use_ssl=False)
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            start = time.perf_counter()
+            sync_total = _sync_export(options, accounts, batch_size)
+            sync_time = time.perf_counter() - start
+
+            start = time.perf_counter()
+            async_total = asyncio.run(_async_export(options, accounts, batch_size, pipeline))
+            async_time = time.perf_counter() - start
+    finally:
+        process.terminate()
+
+    return {
+        'count': count,
+        'latency': latency,
+        'accounts': accounts,
+        'pipeline': pipeline,
+        'sync_msgs_per_sec': sync_total / sync_time,
+        'async_msgs_per_sec': async_total / async_time,
+        'speedup': (async_total / async_time) / (sync_total / sync_time),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--count', type=int, default=2000)
+    parser.add_argument('--latency', type=float, default=0.02)
+    parser.add_argument('--accounts', type=int, default=8)
+    parser.add_argument('--batch-size', type=int, default=50)
+    parser.add_argument('--pipeline', type=int, default=4)
+    opts = parser.parse_args()
+    result = run(opts.count, opts.latency, opts.accounts, opts.batch_size, opts.pipeline)
+    print(f"每个账号邮件数量: {result['count']}，每条命令延迟: {result['latency'] * 1000:.1f} ms")
+    print(f"同步逐个账号: {result['sync_msgs_per_sec']:.0f} 封/秒")
+    print(f"异步 {result['accounts']} 个账号（流水线 {result['pipeline']}）: "
+          f"{result['async_msgs_per_sec']:.0f} 封/秒")
+    print(f"加速比: {result['speedup']:.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,75 @@
+'''
+附件下载的速度和内存峰值：对比 RFC822 整封获取与 save_attachments 分块获取
+桩服务器运行在独立进程中，内存峰值只统计客户端进程（tracemalloc），附件在存储中已存在时仍会完整下载
+用法: python -m bench.bench_attachments [--size-mb 100] [--chunk-kb 1024]
+'''
+import argparse
+import contextlib
+import io
+import os
+import tempfile
+import time
+import tracemalloc
+from email.message import EmailMessage
+
+from bench.server import start_server
+from fakeimap import Mailbox
+from to163 import EmailClient
+
+
+def _attachment_mailbox(size_mb):
+    msg = EmailMessage()
+    msg['Subject'] = '附件测试'
+    msg['From'] = 'bench@example.com'
+    msg['Date'] = 'Mon, 01 Jan 2024 10:00:00 +0800'
+    msg.set_content('正文')
+    msg.add_attachment(os.urandom(size_mb * 1024 * 1024), maintype='application',
+                       subtype='octet-stream', filename='large.bin')
+    mailbox = Mailbox()
+    mailbox.append('INBOX', msg.as_bytes())
+    return mailbox
+
+
+def _measure(func):
+    ''':return: (耗时秒数, 内存峰值字节数)'''
+    tracemalloc.start()
+    start = time.perf_counter()
+    func()
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return elapsed, peak
+
+
+def run(size_mb=100, chunk_kb=1024):
+    process, (host, port), _ = start_server(_attachment_mailbox, size_mb)
+    try:
+        with contextlib.redirect_stdout(io.StringIO()), tempfile.TemporaryDirectory() as tmp:
+            client = EmailClient('bench@example.com', 'secret', host=host, port=port, use_ssl=False)
+            client.login()
+            client.select_folder('INBOX')
+            email_id = client.search_emails('ALL')[0]
+            full = _measure(lambda: client.fetch_email(email_id, 'full'))
+            # 桩服务器第一次返回 BODYSTRUCTURE 和部分内容时要重新序列化整封邮件，预热后再计时
+            client.save_attachments([email_id], tmp, chunk_size=chunk_kb * 1024)
+            chunked = _measure(lambda: client.save_attachments([email_id], tmp, chunk_size=chunk_kb * 1024))
+            client.logout()
+    finally:
+        process.terminate()
+    return {'size_mb': size_mb, 'full': full, 'chunked': chunked}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--size-mb', type=int, default=100)
+    parser.add_argument('--chunk-kb', type=int, default=1024)
+    opts = parser.parse_args()
+    result = run(opts.size_mb, opts.chunk_kb)
+    print(f"附件大小: {result['size_mb']} MB，分块大小: {opts.chunk_kb} KB")
+    for name, label in (('full', 'RFC822 整封获取'), ('chunked', '分块获取写入磁盘')):
+        elapsed, peak = result[name]
+        print(f"{label}: {result['size_mb'] / elapsed:.1f} MB/秒，内存峰值 {peak / 1024 / 1024:.1f} MB")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,159 @@
+'''
+对比原来立即解码的邮件类与延迟解码的 EmailClient.Email 的内存占用和构造速度
+分三种访问方式：只取 ID、读取头部字段、读取全部字段（含正文）
+内存为构造完成、输入的原始字节释放后仍被邮件对象占用的内存
+用法: python -m bench.bench_email [--count 5000] [--body-kb 4]
+'''
+import argparse
+import contextlib
+import email
+import gc
+import io
+import re
+import time
+import tracemalloc
+from datetime import datetime
+from email.header import decode_header
+
+from fakeimap import make_message
+from to163 import EmailClient
+
+
+class EagerEmail:
+    '''改动前的邮件类：构造时解码主题、发件人和日期，保存解码后的正文'''
+
+    def __init__(self, email_id, subject, sender, date, content, uid=None, uidvalidity=None):
+        try:
+            self.date = self._parse_date(date)
+        except ValueError:
+            self.date = date
+        try:
+            self.subject = self._decode_email_header(subject)
+        except UnicodeDecodeError:
+            self.subject = subject
+        self.email_id = email_id
+        self.uid = uid
+        self.uidvalidity = uidvalidity
+        try:
+            self.sender = self._decode_email_header(sender)
+        except UnicodeDecodeError:
+            self.sender = sender
+        self.content = content
+
+    def _parse_date(self, date):
+        date_str = re.sub(r' \(CST\)', '', date)
+        datetime_obj = datetime.strptime(date_str, '%a, %d %b %Y %H:%M:%S %z')
+        return datetime_obj.strftime('%Y-%m-%d')
+
+    def _decode_email_header(self, header):
+        if header is None:
+            return ""
+        part, charset = decode_header(header)[0]
+        if isinstance(part, bytes):
+            try:
+                return part.decode(charset or 'utf-8')
+            except (UnicodeDecodeError, LookupError):
+                return part.decode('utf-8', errors='replace')
+        return part
+
+
+def _eager_full(email_id, raw):
+    msg = email.message_from_bytes(raw)
+    content = ''
+    if msg.is_multipart():
+        for part in msg.walk():
+            if part.get_content_type() == 'text/plain':
+                content = EmailClient._decode_content(email_id, part.get_payload(decode=True), part.get_content_charset())
+                break
+    else:
+        content = EmailClient._decode_content(email_id, msg.get_payload(decode=True), msg.get_content_charset())
+    return EagerEmail(email_id, msg['Subject'], msg['From'], msg['Date'], content, int(email_id), 1)
+
+
+def _eager_headers(email_id, header):
+    msg = email.message_from_bytes(header)
+    return EagerEmail(email_id, msg['Subject'], msg['From'], msg['Date'], '', int(email_id), 1)
+
+
+def _lazy_full(email_id, raw):
+    return EmailClient.Email.from_raw(email_id, raw, int(email_id), 1)
+
+
+def _lazy_headers(email_id, header):
+    return EmailClient.Email.from_parts(email_id, header, uid=int(email_id), uidvalidity=1)
+
+
+ACCESS = {
+    'id': lambda e: e.email_id,
+    'headers': lambda e: (e.subject, e.sender, e.date),
+    'all': lambda e: (e.subject, e.sender, e.date, e.content),
+}
+
+
+def _messages(count, body_kb, headers_only):
+    line = "这是一行用于测试内存占用的正文内容。\n"
+    body = line * (body_kb * 1024 // len(line.encode('utf-8')) + 1)
+    messages = []
+    for i in range(count):
+        raw = make_message(i, body=body)
+        if headers_only:
+            raw = raw[:raw.find(b'\n\n') + 1]
+        messages.append((str(i + 1), raw))
+    return messages
+
+
+def _throughput(build, access, messages):
+    ''':return: 每秒处理的邮件数'''
+    start = time.perf_counter()
+    for email_id, raw in messages:
+        access(build(email_id, raw))
+    return len(messages) / (time.perf_counter() - start)
+
+
+def _retained(build, access, messages):
+    '''
+    :return: 每封邮件保留的字节数：构造并访问完所有邮件、释放输入的原始字节后仍占用的内存，
+             被邮件对象引用的原始字节也计算在内
+    '''
+    gc.collect()
+    tracemalloc.start()
+    # 复制一份原始字节，模拟从 FETCH 响应中得到、用完即释放的数据
+    raws = [(email_id, bytes(bytearray(raw))) for email_id, raw in messages]
+    records = [build(email_id, raw) for email_id, raw in raws]
+    for record in records:
+        access(record)
+    del raws
+    gc.collect()
+    retained = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return retained / len(messages)
+
+
+def run(count=5000, body_kb=4):
+    results = {}
+    with contextlib.redirect_stdout(io.StringIO()):
+        for fetch_mode, headers_only, eager, lazy in (('full', False, _eager_full, _lazy_full),
+                                                      ('headers', True, _eager_headers, _lazy_headers)):
+            messages = _messages(count, body_kb, headers_only)
+            for access_name, access in ACCESS.items():
+                if headers_only and access_name == 'all':
+                    continue
+                results[(fetch_mode, access_name)] = tuple(
+                    (_retained(build, access, messages), _throughput(build, access, messages))
+                    for build in (eager, lazy))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--count', type=int, default=5000)
+    parser.add_argument('--body-kb', type=int, default=4)
+    opts = parser.parse_args()
+    print(f"邮件数量: {opts.count}，正文约 {opts.body_kb} KB")
+    for (fetch_mode, access_name), ((eager_mem, eager_rate), (lazy_mem, lazy_rate)) in run(opts.count, opts.body_kb).items():
+        print(f"{fetch_mode:7} 访问 {access_name:7}: 立即解码 {eager_mem:8.0f} 字节/封 {eager_rate:8.0f} 封/秒，"
+              f"延迟解码 {lazy_mem:8.0f} 字节/封 {lazy_rate:8.0f} 封/秒")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,70 @@
+'''
+对比逐封 FETCH 与批量 FETCH 的吞吐量
+用法: python -m bench.bench_fetch [--count 2000] [--latency 0.002] [--batch-size 500] [--mode full]
+'''
+import argparse
+import contextlib
+import io
+import time
+
+from bench.server import numbered_mailbox
+from fakeimap import FakeImapServer
+from to163 import EmailClient
+
+
+def build_server(count, latency):
+    server = FakeImapServer(numbered_mailbox(count), latency=latency)
+    return server, server.start()
+
+
+def connect(host, port):
+    client = EmailClient('bench@example.com', 'secret', host=host, port=port, use_ssl=False)
+    with contextlib.redirect_stdout(io.StringIO()):
+        client.login()
+        client.select_folder('INBOX')
+    return client
+
+
+def run(count=2000, latency=0.002, batch_size=500, mode='full'):
+    server, (host, port) = build_server(count, latency)
+    try:
+        client = connect(host, port)
+        ids = client.search_emails('ALL')
+
+        start = time.perf_counter()
+        single = sum(1 for i in ids if client.fetch_email(i, mode=mode))
+        single_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        batched = sum(1 for _ in client.fetch_emails(ids, batch_size=batch_size, mode=mode))
+        batched_time = time.perf_counter() - start
+        client.mail.logout()
+    finally:
+        server.stop()
+
+    return {
+        'count': count,
+        'latency': latency,
+        'mode': mode,
+        'single_msgs_per_sec': single / single_time,
+        'batched_msgs_per_sec': batched / batched_time,
+        'speedup': single_time / batched_time,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--count', type=int, default=2000)
+    parser.add_argument('--latency', type=float, default=0.002)
+    parser.add_argument('--batch-size', type=int, default=500)
+    parser.add_argument('--mode', choices=EmailClient.FETCH_MODES, default='full')
+    opts = parser.parse_args()
+    result = run(opts.count, opts.latency, opts.batch_size, opts.mode)
+    print(f"邮件数量: {result['count']}，每条命令延迟: {result['latency'] * 1000:.1f} ms，获取模式: {result['mode']}")
+    print(f"逐封 FETCH: {result['single_msgs_per_sec']:.0f} 封/秒")
+    print(f"批量 FETCH: {result['batched_msgs_per_sec']:.0f} 封/秒")
+    print(f"加速比: {result['speedup']:.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,145 @@
+'''
+头部解码微基准：对比原来只取第一个 encoded-word、用 strptime 解析日期的实现与 headers 模块
+语料模拟国内邮箱常见的头部：GBK/GB2312/UTF-8 的 B 编码和 Q 编码、长主题折行成多个 encoded-word、
+未编码的 8 位 GBK 头部、各种时区写法的日期，发件人在语料中大量重复
+用法: python -m bench.bench_headers [--count 100000] [--senders 500]
+'''
+import argparse
+import base64
+import email
+import random
+import re
+import time
+from datetime import datetime, timedelta, timezone
+from email.header import decode_header
+from email.utils import format_datetime
+
+import headers
+
+_SUBJECTS = ['关于下周项目评审会议的通知', '发票已开具，请查收', '报销单审批结果', '【重要】系统升级维护公告',
+             'Re: 合同草案第三版修改意见', '周报 - 研发部 - 第12周', 'Your invoice is ready', '镕铖科技 客户回访']
+_NAMES = ['张三', '李四', '王小明', '欧阳娜娜', '财务部', '人力资源部', 'Service Desk', '钟镕']
+_CHARSETS = ['gbk', 'gb2312', 'utf-8', 'GB2312', 'GBK', 'UTF-8']
+_ZONES = [' +0800', ' +0800 (CST)', ' +0000 (UTC)', ' GMT', ' -0000', ' -0700 (PDT)']
+
+
+def _b_word(data, charset):
+    return f"=?{charset}?B?{base64.b64encode(data).decode()}?="
+
+
+def _q_word(data, charset):
+    return f"=?{charset}?Q?" + ''.join(chr(b) if chr(b).isalnum() and b < 128 else f"={b:02X}" for b in data) + "?="
+
+
+def _encode(text, charset, rng):
+    '''
+    把文本编码成一个或多个 encoded-word，长文本折行时多字节字符可能被拆到相邻的两个 encoded-word 中；
+    标成 gb2312 的头部和真实邮件一样可能含有 GBK 才有的字符
+    '''
+    codec = 'gb18030' if charset.lower() in ('gbk', 'gb2312') else charset
+    data = text.encode(codec)
+    step = rng.choice([12, 30, 45])
+    word = _b_word if rng.random() < 0.7 else _q_word
+    return '\r\n '.join(word(data[i:i + step], charset) for i in range(0, len(data), step))
+
+
+def corpus(count=100000, senders=500, seed=0):
+    '''
+    生成头部语料
+    :return: [(subject, sender, date), ...]，subject 和 sender 与 compat32 解析邮件后的 msg['Subject'] 一致
+    '''
+    rng = random.Random(seed)
+    from_values = []
+    for i in range(senders):
+        name = rng.choice(_NAMES)
+        address = f"user{i}@example.com"
+        charset = rng.choice(_CHARSETS)
+        from_values.append(f"{_encode(name, charset, rng)} <{address}>" if not name.isascii() else f"{name} <{address}>")
+    raw_headers = []
+    start = datetime(2024, 1, 1)
+    for i in range(count):
+        text = f"{rng.choice(_SUBJECTS)} {i}"
+        if rng.random() < 0.1:
+            # 未编码的 8 位 GBK 头部，compat32 解析为 Header 对象
+            raw_headers.append(f"Subject: {text}\r\n".encode('gbk'))
+        else:
+            raw_headers.append(f"Subject: {_encode(text, rng.choice(_CHARSETS), rng)}\r\n".encode())
+    records = []
+    for raw in raw_headers:
+        subject = email.message_from_bytes(raw)['Subject']
+        when = start + timedelta(minutes=rng.randrange(525600))
+        date = format_datetime(when.replace(tzinfo=timezone.utc))[:-6] + rng.choice(_ZONES)
+        if rng.random() < 0.2:
+            date = date[5:]  # 没有星期
+        records.append((subject, rng.choice(from_values), date))
+    return records
+
+
+def legacy_header(header):
+    '''原来的实现：只解码第一个 encoded-word'''
+    if header is None:
+        return ""
+    part, charset = decode_header(header)[0]
+    if isinstance(part, bytes):
+        try:
+            if charset and charset.lower() != 'unknown-8bit':
+                return part.decode(charset)
+            return part.decode('utf-8', errors='replace')
+        except (UnicodeDecodeError, LookupError):
+            return part.decode('utf-8', errors='replace')
+    return part
+
+
+def legacy_date(date):
+    '''原来的实现：只去掉 (CST)，用 strptime 解析，失败时保留原始值'''
+    try:
+        date_str = re.sub(r' \(CST\)', '', date)
+        return datetime.strptime(date_str, '%a, %d %b %Y %H:%M:%S %z').strftime('%Y-%m-%d')
+    except ValueError:
+        return date
+
+
+def _time(func, values):
+    start = time.perf_counter()
+    results = [func(v) for v in values]
+    return len(values) / (time.perf_counter() - start), results
+
+
+def run(count=100000, senders=500):
+    records = corpus(count, senders)
+    subjects = [r[0] for r in records]
+    froms = [r[1] for r in records]
+    dates = [r[2] for r in records]
+    headers._decode_cached.cache_clear()
+    headers.lookup_decoder.cache_clear()
+
+    result = {}
+    for name, values, old, new in (('subject', subjects, legacy_header, headers.decode_header_value),
+                                   ('sender', froms, legacy_header, headers.decode_sender),
+                                   ('date', dates, legacy_date, headers.format_date)):
+        old_rate, old_results = _time(old, values)
+        new_rate, new_results = _time(new, values)
+        if name == 'date':
+            # 原来的实现解析失败时返回原始字符串
+            old_failed = sum(1 for v, r in zip(values, old_results) if r == v)
+            new_failed = sum(1 for r in new_results if r is None)
+        else:
+            old_failed = sum(1 for o, n in zip(old_results, new_results) if o != n)
+            new_failed = sum(1 for r in new_results if '�' in r)
+        result[name] = (old_rate, old_failed, new_rate, new_failed)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--count', type=int, default=100000)
+    parser.add_argument('--senders', type=int, default=500)
+    opts = parser.parse_args()
+    print(f"头部数量: {opts.count}，不同发件人: {opts.senders}")
+    for name, (old_rate, old_failed, new_rate, new_failed) in run(opts.count, opts.senders).items():
+        print(f"{name:8}: 原实现 {old_rate:9.0f} 个/秒，结果错误 {old_failed}；"
+              f"headers {new_rate:9.0f} 个/秒，结果错误 {new_failed}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,65 @@
+'''
+对比在下载线程中解析与用进程池解析整封邮件的速度
+桩服务器运行在独立进程中；多核机器上进程池解析可以和下载重叠
+用法: python -m bench.bench_parse [--count 2000] [--body-kb 32] [--latency 0.01] [--workers 4] [--batch-size 100]
+'''
+import argparse
+import contextlib
+import io
+import os
+import time
+
+from bench.server import numbered_mailbox, start_server
+from to163 import EmailClient
+
+
+def run(count=2000, body_kb=32, latency=0.01, workers=4, batch_size=100):
+    line = "这是一行用于测试解析速度的正文内容。\n"
+    body = line * (body_kb * 1024 // len(line.encode('utf-8')) + 1)
+    process, (host, port), _ = start_server(numbered_mailbox, count, body, latency=latency)
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            client = EmailClient('bench@example.com', 'secret', host=host, port=port, use_ssl=False)
+            client.login()
+            client.select_folder('INBOX')
+            ids = client.search_emails('ALL')
+
+            start = time.perf_counter()
+            inline = sum(1 for e in client.fetch_emails(ids, batch_size, workers=0) if e and e.decode())
+            inline_time = time.perf_counter() - start
+
+            start = time.perf_counter()
+            pooled = sum(1 for e in client.fetch_emails(ids, batch_size, workers=workers) if e and e.decode())
+            pooled_time = time.perf_counter() - start
+            client.logout()
+    finally:
+        process.terminate()
+
+    return {
+        'count': count,
+        'body_kb': body_kb,
+        'workers': workers,
+        'cpus': os.cpu_count(),
+        'inline_msgs_per_sec': inline / inline_time,
+        'pooled_msgs_per_sec': pooled / pooled_time,
+        'speedup': (pooled / pooled_time) / (inline / inline_time),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--count', type=int, default=2000)
+    parser.add_argument('--body-kb', type=int, default=32)
+    parser.add_argument('--latency', type=float, default=0.01)
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--batch-size', type=int, default=100)
+    opts = parser.parse_args()
+    result = run(opts.count, opts.body_kb, opts.latency, opts.workers, opts.batch_size)
+    print(f"邮件数量: {result['count']}，正文约 {result['body_kb']} KB，CPU 核心数: {result['cpus']}")
+    print(f"下载线程中解析: {result['inline_msgs_per_sec']:.0f} 封/秒")
+    print(f"{result['workers']} 个解析进程: {result['pooled_msgs_per_sec']:.0f} 封/秒")
+    print(f"加速比: {result['speedup']:.1f}x")
+
+
+if __name__ == '__main__':
+    main()
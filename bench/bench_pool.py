@@ -0,0 +1,66 @@
+'''
+对比单连接与连接池并行导出的速度
+桩服务器运行在独立进程中，避免与客户端线程争用 GIL
+用法: python -m bench.bench_pool [--count 4000] [--latency 0.05] [--connections 4] [--batch-size 50]
+'''
+import argparse
+import contextlib
+import io
+import tempfile
+import time
+
+from bench.server import numbered_mailbox, start_server
+from exporter import Exporter
+from pool import ConnectionPool
+from to163 import EmailClient
+
+
+def run(count=4000, latency=0.05, connections=4, batch_size=50):
+    process, (host, port), _ = start_server(numbered_mailbox, count, latency=latency)
+    options = dict(host=host, port=port, use_ssl=False)
+    try:
+        with tempfile.TemporaryDirectory() as tmp, contextlib.redirect_stdout(io.StringIO()):
+            client = EmailClient('bench@example.com', 'secret', **options)
+            client.login()
+            client.select_folder('INBOX')
+            ids = client.search_emails('ALL')
+            start = time.perf_counter()
+            records = ((e.uid, client._email_record(e)) for e in client.fetch_emails(ids, batch_size))
+            single = Exporter(f"{tmp}/single.json", checkpoint_every=0).export(records)
+            single_time = time.perf_counter() - start
+            client.logout()
+
+            with ConnectionPool('bench@example.com', 'secret', size=connections,
+                                max_per_account=connections, **options) as pool:
+                start = time.perf_counter()
+                pooled = pool.save_folder('INBOX', tmp, mode='full', batch_size=batch_size)
+                pooled_time = time.perf_counter() - start
+    finally:
+        process.terminate()
+
+    return {
+        'count': count,
+        'latency': latency,
+        'connections': connections,
+        'single_msgs_per_sec': single / single_time,
+        'pooled_msgs_per_sec': pooled / pooled_time,
+        'speedup': (pooled / pooled_time) / (single / single_time),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--count', type=int, default=4000)
+    parser.add_argument('--latency', type=float, default=0.05)
+    parser.add_argument('--connections', type=int, default=4)
+    parser.add_argument('--batch-size', type=int, default=50)
+    opts = parser.parse_args()
+    result = run(opts.count, opts.latency, opts.connections, opts.batch_size)
+    print(f"邮件数量: {result['count']}，每条命令延迟: {result['latency'] * 1000:.1f} ms")
+    print(f"单连接: {result['single_msgs_per_sec']:.0f} 封/秒")
+    print(f"{result['connections']} 个连接: {result['pooled_msgs_per_sec']:.0f} 封/秒")
+    print(f"加速比: {result['speedup']:.1f}x")
+
+
+if __name__ == '__main__':
+    main()
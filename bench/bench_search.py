@@ -0,0 +1,67 @@
+'''
+本地全文搜索的查询耗时：向缓存写入合成邮件后执行若干查询
+用法: python -m bench.bench_search [--count 200000] [--limit 50]
+'''
+import argparse
+import os
+import random
+import tempfile
+import time
+
+from mailcache import MailCache
+
+_WORDS = ['会议', '纪要', '项目', '进度', '发票', '报销', '合同', '审批', '周报', '客户',
+          '需求', '测试', '上线', '预算', 'budget', 'review', 'invoice', 'release', 'meeting', 'report']
+
+QUERIES = ['项目进度', '发票', '审', 'budget review', '客户 合同', '不存在的词语']
+
+
+def _records(count, seed=0):
+    rng = random.Random(seed)
+    for uid in range(1, count + 1):
+        yield {
+            'uid': uid,
+            'subject': f"{rng.choice(_WORDS)}{rng.choice(_WORDS)} {uid}",
+            'sender': f"发件人{uid % 97} <sender{uid % 97}@example.com>",
+            'date': '2024-01-01 00:00:00',
+            'content': '，'.join(rng.choice(_WORDS) + rng.choice(_WORDS) for _ in range(40)),
+        }
+
+
+def run(count=200000, limit=50, batch_size=5000):
+    with tempfile.TemporaryDirectory() as tmp:
+        cache = MailCache(os.path.join(tmp, 'cache.db'))
+        cache.reset_folder('INBOX', 1)
+        start = time.perf_counter()
+        batch = []
+        for record in _records(count):
+            batch.append(record)
+            if len(batch) >= batch_size:
+                cache.store('INBOX', batch)
+                batch = []
+        cache.store('INBOX', batch)
+        index_time = time.perf_counter() - start
+
+        timings = {}
+        for query in QUERIES:
+            start = time.perf_counter()
+            hits = len(cache.search(query, 'INBOX', limit))
+            timings[query] = (hits, (time.perf_counter() - start) * 1000)
+        cache.close()
+
+    return {'count': count, 'index_msgs_per_sec': count / index_time, 'queries': timings}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--count', type=int, default=200000)
+    parser.add_argument('--limit', type=int, default=50)
+    opts = parser.parse_args()
+    result = run(opts.count, opts.limit)
+    print(f"邮件数量: {result['count']}，建立索引 {result['index_msgs_per_sec']:.0f} 封/秒")
+    for query, (hits, ms) in result['queries'].items():
+        print(f"{query!r}: {hits} 条结果，{ms:.1f} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,226 @@
+'''
+合成邮箱生成器：按固定的随机种子生成接近真实的邮件，同样的参数总是生成完全相同的字节
+可以配置邮件数量、MIME 结构的比例、字符集的比例、正文和附件大小以及重复邮件的比例；
+第 i 封邮件只由种子和 i 决定，增加数量不会改变前面的邮件
+用法: python -m bench.mailgen --count 1000 --output mail.mbox [--mix plain=0.6,attachment=0.4] [--charsets gbk=1]
+'''
+import argparse
+import random
+from datetime import datetime, timedelta, timezone
+from email.charset import BASE64, QP, Charset
+from email.header import Header
+from email.mime.application import MIMEApplication
+from email.mime.message import MIMEMessage
+from email.mime.multipart import MIMEMultipart
+from email.mime.text import MIMEText
+from email.utils import format_datetime, formataddr
+
+from fakeimap import Mailbox
+
+# MIME 结构：plain 单个 text/plain；alternative 为 text/plain + text/html；
+# attachment 为正文加一个附件；nested 为 multipart/alternative 正文、两个附件和一封转发的 message/rfc822
+MIME_KINDS = ('plain', 'alternative', 'attachment', 'nested')
+DEFAULT_MIX = {'plain': 0.55, 'alternative': 0.25, 'attachment': 0.15, 'nested': 0.05}
+
+# 国内邮箱常见的字符集；gb2312 和 gbk 的内容都只用 GB2312 范围内的字
+DEFAULT_CHARSETS = {'utf-8': 0.5, 'gbk': 0.25, 'gb2312': 0.2, 'gb18030': 0.05}
+
+_SUBJECTS = ['关于下周项目评审会议的通知', '发票已开具，请查收', '报销单审批结果', '【重要】系统升级维护公告',
+             '合同草案第三版修改意见', '周报 研发部', '客户回访记录', '季度预算调整说明',
+             'Your invoice is ready', 'Weekly status report', 'Build failed on main']
+_NAMES = ['张三', '李四', '王小明', '欧阳娜娜', '财务部', '人力资源部', '运维中心', 'Service Desk', 'Alice Chen']
+_WORDS = ['会议', '纪要', '项目', '进度', '发票', '报销', '合同', '审批', '周报', '客户', '需求', '测试',
+          '上线', '预算', '请', '查收', '附件', '谢谢', '如有', '问题', '及时', '联系', '我们', '已经',
+          'budget', 'review', 'invoice', 'release', 'meeting', 'report', 'deadline', 'thanks']
+_ATTACHMENTS = [('报价单.pdf', 'application', 'pdf'), ('合同.docx', 'application', 'octet-stream'),
+                ('截图.png', 'image', 'png'), ('data.xlsx', 'application', 'octet-stream'),
+                ('logs.zip', 'application', 'zip'), ('发票扫描件.jpg', 'image', 'jpeg')]
+_ZONES = [timezone(timedelta(hours=8)), timezone.utc, timezone(timedelta(hours=-7))]
+_START = datetime(2024, 1, 1)
+
+
+def parse_weights(text):
+    '''
+    解析命令行中的比例，例如 'plain=0.6,attachment=0.4'
+    :return: {名称: 权重}
+    '''
+    weights = {}
+    for item in text.split(','):
+        name, _, value = item.partition('=')
+        weights[name.strip()] = float(value) if value else 1.0
+    return weights
+
+
+def _choose(rng, weights):
+    names = list(weights)
+    return rng.choices(names, [weights[n] for n in names])[0]
+
+
+class MailGenerator:
+    '''
+    合成邮件生成器，生成过程中在 stats 中统计邮件数、字节数、重复邮件数、附件数以及各 MIME 结构和字符集的数量
+    :param seed: 随机种子
+    :param mix: {MIME 结构: 权重}，见 MIME_KINDS
+    :param charsets: {字符集: 权重}
+    :param body_kb: 正文的平均大小（KB）
+    :param attachment_kb: 附件的平均大小（KB）
+    :param duplicates: 与前面某封邮件完全相同的邮件比例，用于测试查找重复邮件
+    :param senders: 不同发件人的数量
+    '''
+
+    def __init__(self, seed=0, mix=None, charsets=None, body_kb=2, attachment_kb=64, duplicates=0.02, senders=200):
+        self.seed = seed
+        self.mix = dict(mix or DEFAULT_MIX)
+        unknown = set(self.mix) - set(MIME_KINDS)
+        if unknown:
+            raise ValueError(f"未知的 MIME 结构: {', '.join(sorted(unknown))}")
+        self.charsets = dict(charsets or DEFAULT_CHARSETS)
+        self.body_kb = body_kb
+        self.attachment_kb = attachment_kb
+        self.duplicates = duplicates
+        self.senders = senders
+        self.stats = {'messages': 0, 'bytes': 0, 'duplicates': 0, 'attachments': 0,
+                      'kinds': dict.fromkeys(self.mix, 0), 'charsets': dict.fromkeys(self.charsets, 0)}
+
+    def _rng(self, index):
+        # 字符串种子的哈希在不同进程和不同版本的 Python 中都相同
+        return random.Random(f"{self.seed}:{index}")
+
+    def _text(self, rng, size):
+        words = []
+        length = 0
+        while length < size:
+            word = rng.choice(_WORDS)
+            words.append(word)
+            length += len(word.encode('utf-8')) + 1
+            if rng.random() < 0.08:
+                words.append('。\n')
+        return ' '.join(words)
+
+    def _body(self, rng, text, subtype, charset):
+        cs = Charset(charset)
+        # 同一字符集的正文有的用 base64，有的用 quoted-printable
+        cs.body_encoding = BASE64 if rng.random() < 0.7 else QP
+        return MIMEText(text, subtype, cs)
+
+    def _attachment(self, rng, charset):
+        filename, maintype, subtype = rng.choice(_ATTACHMENTS)
+        size = max(1, int(self.attachment_kb * 1024 * rng.uniform(0.5, 1.5)))
+        part = MIMEApplication(rng.randbytes(size), subtype)
+        if maintype != 'application':
+            part.replace_header('Content-Type', f"{maintype}/{subtype}")
+        if filename.isascii():
+            part.add_header('Content-Disposition', 'attachment', filename=filename)
+        else:
+            # 非 ASCII 文件名按 RFC 2231 编码
+            part.add_header('Content-Disposition', 'attachment', filename=(charset, '', filename))
+        self.stats['attachments'] += 1
+        return part
+
+    def _build(self, index):
+        ''':return: (邮件原始字节, 是否为重复邮件)'''
+        rng = self._rng(index)
+        if index and rng.random() < self.duplicates:
+            raw, _ = self._build(rng.randrange(index))
+            return raw, True
+        kind = _choose(rng, self.mix)
+        charset = _choose(rng, self.charsets)
+        self.stats['kinds'][kind] += 1
+        self.stats['charsets'][charset] += 1
+        body_size = max(16, int(self.body_kb * 1024 * rng.uniform(0.3, 1.7)))
+        text = self._text(rng, body_size)
+
+        # email 默认用随机数生成 multipart 边界，这里按序号固定，保证字节完全相同
+        boundary = f"=_bench_{self.seed}_{index}_"
+        if kind == 'plain':
+            msg = self._body(rng, text, 'plain', charset)
+        elif kind == 'alternative':
+            msg = MIMEMultipart('alternative', boundary + 'a')
+            msg.attach(self._body(rng, text, 'plain', charset))
+            msg.attach(self._body(rng, f"<html><body><p>{text}</p></body></html>", 'html', charset))
+        elif kind == 'attachment':
+            msg = MIMEMultipart('mixed', boundary + 'm')
+            msg.attach(self._body(rng, text, 'plain', charset))
+            msg.attach(self._attachment(rng, charset))
+        else:
+            msg = MIMEMultipart('mixed', boundary + 'm')
+            alternative = MIMEMultipart('alternative', boundary + 'a')
+            alternative.attach(self._body(rng, text, 'plain', charset))
+            alternative.attach(self._body(rng, f"<html><body><p>{text}</p></body></html>", 'html', charset))
+            msg.attach(alternative)
+            msg.attach(self._attachment(rng, charset))
+            msg.attach(self._attachment(rng, charset))
+            forwarded = self._body(rng, self._text(rng, 256), 'plain', charset)
+            forwarded['Subject'] = Header(rng.choice(_SUBJECTS), charset)
+            forwarded['From'] = 'forward@example.com'
+            msg.attach(MIMEMessage(forwarded))
+
+        subject = f"{rng.choice(_SUBJECTS)} {index}"
+        msg['Subject'] = subject if subject.isascii() else Header(subject, charset)
+        sender = rng.randrange(self.senders)
+        name = _NAMES[sender % len(_NAMES)]
+        msg['From'] = formataddr((name, f"sender{sender}@example.com"), charset)
+        msg['To'] = 'me@example.com'
+        when = (_START + timedelta(minutes=index * 7 + rng.randrange(7))).replace(tzinfo=rng.choice(_ZONES))
+        msg['Date'] = format_datetime(when)
+        msg['Message-ID'] = f"<{self.seed}.{index}@bench.example.com>"
+        return msg.as_bytes(), False
+
+    def message(self, index):
+        ''':return: 第 index 封邮件的原始字节（从 0 开始）'''
+        raw, duplicate = self._build(index)
+        self.stats['messages'] += 1
+        self.stats['bytes'] += len(raw)
+        if duplicate:
+            self.stats['duplicates'] += 1
+        return raw
+
+    def messages(self, count):
+        ''':return: 生成器，依次产出 count 封邮件的原始字节'''
+        for index in range(count):
+            yield self.message(index)
+
+    def mailbox(self, count, folder='INBOX', mailbox=None):
+        '''
+        把邮件加入桩服务器的邮箱
+        :param mailbox: fakeimap.Mailbox，为 None 时新建
+        :return: Mailbox
+        '''
+        mailbox = mailbox or Mailbox()
+        for raw in self.messages(count):
+            mailbox.append(folder, raw)
+        return mailbox
+
+    def write_mbox(self, path, count):
+        '''写入 mbox 文件（mboxrd 转义），可以用 backends.LocalBackend 打开'''
+        with open(path, 'wb') as f:
+            for index, raw in enumerate(self.messages(count)):
+                f.write(f"From sender{index}@bench.example.com Mon Jan  1 00:00:00 2024\n".encode())
+                for line in raw.replace(b'\r\n', b'\n').split(b'\n'):
+                    if line.lstrip(b'>').startswith(b'From '):
+                        line = b'>' + line
+                    f.write(line + b'\n')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--count', type=int, default=1000)
+    parser.add_argument('--output', required=True, help='输出的 mbox 文件')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--mix', type=parse_weights, default=None, help='MIME 结构比例，例如 plain=0.6,attachment=0.4')
+    parser.add_argument('--charsets', type=parse_weights, default=None, help='字符集比例，例如 utf-8=0.5,gbk=0.5')
+    parser.add_argument('--body-kb', type=float, default=2)
+    parser.add_argument('--attachment-kb', type=float, default=64)
+    parser.add_argument('--duplicates', type=float, default=0.02)
+    opts = parser.parse_args()
+    generator = MailGenerator(opts.seed, opts.mix, opts.charsets, opts.body_kb, opts.attachment_kb, opts.duplicates)
+    generator.write_mbox(opts.output, opts.count)
+    stats = generator.stats
+    print(f"已生成 {stats['messages']} 封邮件，共 {stats['bytes'] / 1024 / 1024:.1f} MB，"
+          f"重复邮件 {stats['duplicates']} 封，附件 {stats['attachments']} 个")
+    print(f"MIME 结构: {stats['kinds']}")
+    print(f"字符集: {stats['charsets']}")
+
+
+if __name__ == '__main__':
+    main()
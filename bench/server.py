@@ -0,0 +1,42 @@
+'''
+基准测试共用的桩服务器进程：在独立进程中建立邮箱并启动 FakeImapServer，避免服务器线程与客户端争用 GIL
+'''
+import multiprocessing
+import time
+
+from fakeimap import FakeImapServer, Mailbox, make_message
+
+
+def numbered_mailbox(count, body=None):
+    '''
+    :param count: 邮件数量
+    :param body: 每封邮件的正文，为 None 时用 make_message 的默认正文
+    :return: INBOX 中有 count 封 make_message 测试邮件的 Mailbox
+    '''
+    mailbox = Mailbox()
+    for i in range(count):
+        mailbox.append('INBOX', make_message(i, body=body))
+    return mailbox
+
+
+def _serve(build, args, latency, conn):
+    built = build(*args)
+    mailbox, info = built if isinstance(built, tuple) else (built, None)
+    server = FakeImapServer(mailbox, latency=latency)
+    conn.send((server.start(), info))
+    while True:
+        time.sleep(3600)
+
+
+def start_server(build, *args, latency=0.0):
+    '''
+    在独立进程中调用 build(*args) 建立邮箱并启动桩服务器，用完后调用 process.terminate()
+    :param build: 模块级函数，返回 Mailbox，或 (Mailbox, 附加信息)，附加信息会传回调用方
+    :param latency: 每条命令的附加延迟（秒）
+    :return: (进程, (host, port), 附加信息)
+    '''
+    parent, child = multiprocessing.Pipe()
+    process = multiprocessing.Process(target=_serve, args=(build, args, latency, child), daemon=True)
+    process.start()
+    address, info = parent.recv()
+    return process, address, info
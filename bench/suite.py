@@ -0,0 +1,334 @@
+'''
+可重复的基准测试套件：用 mailgen 按固定种子生成合成邮箱，由独立进程中的桩服务器提供（可注入每条命令的延迟），
+依次测试获取、导出、查找重复、搜索和界面列表模型加载，每项重复多次取中位数，结果写成 JSON 便于跟踪性能回退
+指标名以 _per_sec 结尾的越大越好，以 _ms 结尾的越小越好，以 _commands 结尾的是发送的 IMAP 命令数，
+与时间无关，变多说明多了往返；与基线比较时超过容差的变化记为回退，退出码为 1
+用法: python -m bench.suite [--count 2000] [--latency 0.002] [--repeat 3] [--only fetch,export]
+                           [--output results.json] [--baseline old.json] [--tolerance 0.15]
+'''
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from bench.mailgen import MailGenerator, parse_weights
+from bench.server import start_server
+from metrics import Metrics
+from to163 import EmailClient
+
+# 本地全文搜索使用的查询，词语来自 mailgen 的正文词表
+QUERIES = ['项目 进度', '发票', '审批', 'budget review', '客户 合同', '不存在的词语']
+
+
+def _generated_mailbox(count, generator_kwargs):
+    ''':return: (合成邮箱, 生成器统计)，在服务器进程中调用'''
+    generator = MailGenerator(**generator_kwargs)
+    return generator.mailbox(count), generator.stats
+
+
+class Context:
+    '''
+    一次套件运行的环境
+    :param address: 桩服务器的 (host, port)
+    :param stats: 邮箱统计，见 MailGenerator.stats
+    :param batch_size: 每条 FETCH 命令包含的邮件数量
+    '''
+
+    def __init__(self, address, stats, batch_size=200):
+        self.host, self.port = address
+        self.stats = stats
+        self.batch_size = batch_size
+
+    def client(self, folder='INBOX', **kwargs):
+        ''':return: 已登录并选择了文件夹的 EmailClient，使用独立的 Metrics'''
+        # 限速器的速率固定在很高的值上，测量的是客户端本身而不是 AIMD 的调整过程
+        client = EmailClient('bench@example.com', 'secret', host=self.host, port=self.port, use_ssl=False,
+                             rate=1e9, min_rate=1e9, quiet=True, metrics=Metrics(), **kwargs)
+        if not client.login() or not client.select_folder(folder):
+            raise RuntimeError(f"无法连接桩服务器 {self.host}:{self.port}")
+        return client
+
+
+def _commands(client):
+    ''':return: 客户端发送的 IMAP 命令总数，不包括登录、ID 和 SELECT'''
+    commands = client.metrics.snapshot()['commands']
+    return sum(s['count'] for name, s in commands.items() if name not in ('LOGIN', 'ID', 'SELECT', 'LOGOUT'))
+
+
+def bench_fetch(ctx):
+    '''三种获取模式的吞吐量，每封邮件都完整解码'''
+    result = {}
+    for mode in EmailClient.FETCH_MODES:
+        client = ctx.client()
+        ids = client.search_emails('ALL')
+        start = time.perf_counter()
+        count = sum(1 for e in client.fetch_emails(ids, ctx.batch_size, mode) if e and e.decode())
+        elapsed = time.perf_counter() - start
+        result[f'{mode}_msgs_per_sec'] = count / elapsed
+        result[f'{mode}_commands'] = _commands(client)
+        client.logout()
+    return result
+
+
+def bench_export(ctx):
+    '''save_emails_to_local 的端到端吞吐量，分别测试不带附件和分块下载附件'''
+    result = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for name, attachment_dir in (('export', None), ('attachments', os.path.join(tmp, 'store'))):
+            client = ctx.client()
+            start = time.perf_counter()
+            count = client.save_emails_to_local('INBOX', os.path.join(tmp, name), fmt='ndjson',
+                                                attachment_dir=attachment_dir)
+            elapsed = time.perf_counter() - start
+            written = client.metrics.snapshot()['stages']['export']['bytes']
+            result[f'{name}_msgs_per_sec'] = count / elapsed
+            result[f'{name}_mb_per_sec'] = written / 1024 / 1024 / elapsed
+            result[f'{name}_commands'] = _commands(client)
+            client.logout()
+    return result
+
+
+def bench_dedup(ctx):
+    '''find_duplicates 的吞吐量，并检查找到的重复邮件数与生成时一致'''
+    client = ctx.client()
+    start = time.perf_counter()
+    keep, delete = client.find_duplicates()
+    elapsed = time.perf_counter() - start
+    result = {
+        'dedup_msgs_per_sec': (len(keep) + len(delete)) / elapsed,
+        'dedup_commands': _commands(client),
+        'duplicates_found': len(delete),
+        'duplicates_expected': ctx.stats['duplicates'],
+    }
+    client.logout()
+    return result
+
+
+def bench_search(ctx):
+    '''服务器端 UID SEARCH 的耗时、同步到本地缓存的吞吐量和本地全文搜索的平均耗时'''
+    with tempfile.TemporaryDirectory() as tmp:
+        client = ctx.client(cache_path=os.path.join(tmp, 'cache.db'))
+        start = time.perf_counter()
+        client._uid_search('ALL')
+        server_ms = (time.perf_counter() - start) * 1000
+        start = time.perf_counter()
+        synced = client.sync_folder('INBOX', batch_size=ctx.batch_size)
+        sync_elapsed = time.perf_counter() - start
+        start = time.perf_counter()
+        for query in QUERIES:
+            client.search_local(query, 'INBOX')
+        local_ms = (time.perf_counter() - start) * 1000 / len(QUERIES)
+        client.logout()
+        client.cache.close()
+    return {
+        'server_search_ms': server_ms,
+        'sync_msgs_per_sec': synced / sync_elapsed,
+        'local_search_ms': local_ms,
+    }
+
+
+def bench_gui(ctx, window_size=100):
+    '''
+    界面列表模型：从设置数据源到第一屏显示的耗时，以及滚动到底并加载全部窗口的吞吐量
+    需要 PyQt5，只用 QCoreApplication，不需要显示器
+    '''
+    from PyQt5.QtCore import QCoreApplication
+    from mailmodel import ClientSource, EmailListModel
+
+    app = QCoreApplication.instance() or QCoreApplication(sys.argv[:1])
+    client = ctx.client()
+    total = ctx.stats['messages']
+    model = EmailListModel(window_size=window_size, max_windows=total // window_size + 1)
+
+    def wait(condition, timeout=600):
+        deadline = time.monotonic() + timeout
+        while not condition():
+            if time.monotonic() > deadline:
+                raise RuntimeError('界面模型加载超时')
+            app.processEvents()
+            time.sleep(0.0005)
+
+    start = time.perf_counter()
+    model.set_source(ClientSource(client, 'INBOX'))
+    wait(lambda: model.total() == total)
+    model.data(model.index(0))
+    wait(lambda: model.data(model.index(0)) != model.PLACEHOLDER)
+    first_ms = (time.perf_counter() - start) * 1000
+
+    start = time.perf_counter()
+    while model.canFetchMore():
+        model.fetchMore()
+    for row in range(0, model.rowCount(), window_size):
+        model.data(model.index(row))
+    wait(lambda: all(model.data(model.index(row)) != model.PLACEHOLDER
+                     for row in range(0, model.rowCount(), window_size)))
+    scroll_elapsed = time.perf_counter() - start
+    result = {
+        'first_window_ms': first_ms,
+        'scroll_rows_per_sec': model.rowCount() / scroll_elapsed,
+        'gui_commands': _commands(client),
+    }
+    model.set_source(None)
+    client.logout()
+    return result
+
+
+BENCHMARKS = {
+    'fetch': bench_fetch,
+    'export': bench_export,
+    'dedup': bench_dedup,
+    'search': bench_search,
+    'gui': bench_gui,
+}
+
+
+def _git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__)))).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def run(names=None, count=2000, latency=0.002, repeat=3, batch_size=200, **generator_kwargs):
+    '''
+    运行基准测试
+    :param names: 要运行的测试名称列表，为 None 时运行全部，见 BENCHMARKS
+    :param count: 合成邮箱的邮件数量
+    :param latency: 桩服务器每条命令的附加延迟（秒）
+    :param repeat: 每项测试重复的次数，结果取中位数
+    :param batch_size: 每条 FETCH 命令包含的邮件数量
+    :param generator_kwargs: 传给 MailGenerator 的参数，例如 seed、mix、charsets、attachment_kb
+    :return: 可 JSON 序列化的结果字典
+    '''
+    names = names or list(BENCHMARKS)
+    unknown = set(names) - set(BENCHMARKS)
+    if unknown:
+        raise ValueError(f"未知的基准测试: {', '.join(sorted(unknown))}")
+    process, address, stats = start_server(_generated_mailbox, count, generator_kwargs, latency=latency)
+    ctx = Context(address, stats, batch_size)
+    benchmarks = {}
+    try:
+        for name in names:
+            runs = []
+            for _ in range(repeat):
+                try:
+                    with contextlib.redirect_stdout(io.StringIO()):
+                        runs.append(BENCHMARKS[name](ctx))
+                except ImportError as e:
+                    runs = None
+                    benchmarks[name] = {'skipped': f"缺少依赖: {e.name}"}
+                    break
+            if runs:
+                benchmarks[name] = {metric: {'median': statistics.median(r[metric] for r in runs),
+                                             'runs': [r[metric] for r in runs]}
+                                    for metric in runs[0]}
+    finally:
+        process.terminate()
+    return {
+        'meta': {
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+            'commit': _git_commit(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpus': os.cpu_count(),
+            'params': {'count': count, 'latency': latency, 'repeat': repeat, 'batch_size': batch_size,
+                       **generator_kwargs},
+            'corpus': stats,
+        },
+        'benchmarks': benchmarks,
+    }
+
+
+def compare(result, baseline, tolerance=0.15):
+    '''
+    与基线结果比较
+    :param tolerance: 允许的相对变化，吞吐量下降或耗时增加超过这个比例记为回退；命令数增加都记为回退
+    :return: [(测试名, 指标名, 基线值, 当前值, 相对变化, 是否回退), ...]
+    '''
+    rows = []
+    for name, metrics in result['benchmarks'].items():
+        old_metrics = baseline.get('benchmarks', {}).get(name, {})
+        for metric, value in metrics.items():
+            old = old_metrics.get(metric)
+            if not isinstance(value, dict) or not isinstance(old, dict):
+                continue
+            new_value, old_value = value['median'], old['median']
+            change = (new_value - old_value) / old_value if old_value else 0.0
+            if metric.endswith('_per_sec'):
+                regressed = change < -tolerance
+            elif metric.endswith('_ms'):
+                regressed = change > tolerance
+            elif metric.endswith('_commands'):
+                regressed = new_value > old_value
+            else:
+                regressed = new_value != old_value
+            rows.append((name, metric, old_value, new_value, change, regressed))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--count', type=int, default=2000)
+    parser.add_argument('--latency', type=float, default=0.002)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--batch-size', type=int, default=200)
+    parser.add_argument('--only', default=None, help=f"逗号分隔的测试名称: {','.join(BENCHMARKS)}")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--mix', type=parse_weights, default=None, help='MIME 结构比例，例如 plain=0.6,attachment=0.4')
+    parser.add_argument('--charsets', type=parse_weights, default=None, help='字符集比例，例如 utf-8=0.5,gbk=0.5')
+    parser.add_argument('--body-kb', type=float, default=2)
+    parser.add_argument('--attachment-kb', type=float, default=64)
+    parser.add_argument('--duplicates', type=float, default=0.02)
+    parser.add_argument('--output', default=None, help='结果 JSON 文件')
+    parser.add_argument('--baseline', default=None, help='用于比较的基线结果 JSON 文件')
+    parser.add_argument('--tolerance', type=float, default=0.15)
+    opts = parser.parse_args()
+
+    generator_kwargs = {'seed': opts.seed, 'body_kb': opts.body_kb, 'attachment_kb': opts.attachment_kb,
+                        'duplicates': opts.duplicates}
+    if opts.mix:
+        generator_kwargs['mix'] = opts.mix
+    if opts.charsets:
+        generator_kwargs['charsets'] = opts.charsets
+    names = opts.only.split(',') if opts.only else None
+    result = run(names, opts.count, opts.latency, opts.repeat, opts.batch_size, **generator_kwargs)
+
+    corpus = result['meta']['corpus']
+    print(f"邮件数量: {corpus['messages']}（{corpus['bytes'] / 1024 / 1024:.1f} MB，附件 {corpus['attachments']} 个，"
+          f"重复 {corpus['duplicates']} 封），每条命令延迟: {opts.latency * 1000:.1f} ms，重复 {opts.repeat} 次取中位数")
+    for name, metrics in result['benchmarks'].items():
+        if 'skipped' in metrics:
+            print(f"{name:8}: 跳过，{metrics['skipped']}")
+            continue
+        for metric, value in metrics.items():
+            print(f"{name:8} {metric:24} {value['median']:12.1f}")
+    if opts.output:
+        with open(opts.output, 'w', encoding='utf-8') as f:
+            json.dump(result, f, ensure_ascii=False, indent=2)
+        print(f"结果已写入 {opts.output}")
+    if opts.baseline:
+        with open(opts.baseline, encoding='utf-8') as f:
+            baseline = json.load(f)
+        if baseline.get('meta', {}).get('params') != result['meta']['params']:
+            print("警告: 基线使用的参数与本次不同，比较结果可能没有意义")
+        rows = compare(result, baseline, opts.tolerance)
+        regressions = 0
+        for name, metric, old, new, change, regressed in rows:
+            mark = '回退' if regressed else ''
+            regressions += regressed
+            print(f"{name:8} {metric:24} {old:12.1f} -> {new:12.1f} {change:+7.1%} {mark}")
+        print(f"与基线 {opts.baseline} 比较：{regressions} 项回退")
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
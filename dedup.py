@@ -0,0 +1,95 @@
+'''
+重复邮件检测：根据 Message-ID、Date、From、Subject 和 RFC822.SIZE 计算指纹，
+只在内存中保存定长的指纹，单次遍历即可处理十万封以上的文件夹
+'''
+import hashlib
+from email.parser import BytesHeaderParser
+from email.policy import compat32
+from email.utils import parseaddr, parsedate_to_datetime
+
+# FETCH 时请求的数据项：只取指纹需要的头部字段和邮件大小
+FETCH_ITEMS = '(UID RFC822.SIZE BODY.PEEK[HEADER.FIELDS (MESSAGE-ID DATE FROM SUBJECT)])'
+
+_parser = BytesHeaderParser(policy=compat32)
+
+
+def _header(msg, name):
+    value = msg[name]
+    return ' '.join(str(value).split()) if value is not None else ''
+
+
+def _timestamp(value):
+    '''把 Date 头转换为 UTC 时间戳字符串，无法解析时返回原始值'''
+    try:
+        return str(int(parsedate_to_datetime(value).timestamp()))
+    except (TypeError, ValueError, IndexError, OverflowError):
+        return value
+
+
+def message_key(header, size):
+    '''
+    计算邮件指纹
+    :param header: HEADER.FIELDS 返回的头部字节
+    :param size: RFC822.SIZE
+    :return: 16 字节的摘要，所有字段都相同的邮件指纹相同
+    '''
+    msg = _parser.parsebytes(header or b'')
+    fields = (
+        _header(msg, 'Message-ID'),
+        _timestamp(_header(msg, 'Date')),
+        parseaddr(_header(msg, 'From'))[1].lower(),
+        _header(msg, 'Subject'),
+        str(size),
+    )
+    return hashlib.blake2b('\0'.join(fields).encode('utf-8', 'replace'), digest_size=16).digest()
+
+
+def content_digest(text):
+    ''':return: 正文文本的 SHA-256 摘要'''
+    return hashlib.sha256((text or '').encode('utf-8', 'replace')).digest()
+
+
+class DuplicateIndex:
+    '''
+    指纹索引，每个指纹只保留第一次出现的邮件 ID
+    '''
+
+    def __init__(self):
+        self._first = {}
+        self.seen = 0
+        # [(重复邮件ID, 保留邮件ID), ...]
+        self.duplicates = []
+
+    def add(self, email_id, key):
+        '''
+        加入一封邮件
+        :return: 与之重复的、先出现的邮件 ID，不重复时返回 None
+        '''
+        self.seen += 1
+        first = self._first.setdefault(key, email_id)
+        if first == email_id:
+            return None
+        self.duplicates.append((email_id, first))
+        return first
+
+    def confirm(self, digests):
+        '''
+        用正文摘要复核候选重复邮件：同一指纹下正文不同的邮件不再视为重复
+        :param digests: {邮件ID: 正文摘要}，缺少摘要的候选按不重复处理
+        '''
+        kept = {}
+        confirmed = []
+        for email_id, first in self.duplicates:
+            digest = digests.get(email_id)
+            if digest is None:
+                continue
+            group = kept.setdefault(first, {digests.get(first): first})
+            if digest in group:
+                confirmed.append((email_id, group[digest]))
+            else:
+                group[digest] = email_id
+        self.duplicates = confirmed
+
+    def delete_ids(self):
+        ''':return: 需要删除的邮件 ID 集合'''
+        return {email_id for email_id, _ in self.duplicates}
@@ -0,0 +1,160 @@
+'''
+流式导出邮件记录：逐条序列化并写入带缓冲的文件，支持 JSON 数组和 NDJSON，
+定期记录断点（最后写入的 UID 和文件偏移），中断后可以从断点继续
+'''
+import json
+import os
+
+FORMATS = ('json', 'ndjson')
+
+
+class Exporter:
+    '''
+    邮件记录导出器
+    导出过程中数据写入 "<file_path>.part"，断点保存在 "<file_path>.checkpoint"，
+    全部写完后才改名为 file_path，因此目标文件不会是写了一半的内容
+
+    :param file_path: 输出文件路径
+    :param fmt: 'json' 输出 JSON 数组，'ndjson' 每行一条记录
+    :param buffer_size: 写文件的缓冲区大小（字节）
+    :param checkpoint_every: 每写入多少条记录保存一次断点，为 0 时不保存断点
+    :param indent: JSON 缩进，为 None 时输出紧凑格式
+    :param quiet: 为 True 时不打印导出进度
+    '''
+
+    def __init__(self, file_path, fmt='json', buffer_size=1 << 20, checkpoint_every=500, indent=None,
+                 quiet=False):
+        if fmt not in FORMATS:
+            raise ValueError(f"未知的导出格式: {fmt}")
+        self.file_path = file_path
+        self.part_path = file_path + '.part'
+        self.checkpoint_path = file_path + '.checkpoint'
+        self.fmt = fmt
+        self.buffer_size = buffer_size
+        self.checkpoint_every = checkpoint_every
+        self.indent = indent
+        self.quiet = quiet
+        self.uidvalidity = None
+        self.last_uid = 0
+        self.count = 0
+        # 本次导出写入的字节数，不包括断点之前已写入的部分
+        self.bytes_written = 0
+        self._file = None
+        self._offset = 0
+
+    def _load_checkpoint(self, uidvalidity):
+        '''读取断点，格式或 UIDVALIDITY 不一致、数据文件缺失时返回 None'''
+        try:
+            with open(self.checkpoint_path, encoding='utf-8') as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if state.get('format') != self.fmt or state.get('uidvalidity') != uidvalidity:
+            return None
+        if not os.path.exists(self.part_path) or os.path.getsize(self.part_path) < state.get('offset', 0):
+            return None
+        return state
+
+    def open(self, uidvalidity=None):
+        '''
+        开始导出，存在匹配的断点时从断点继续
+        :param uidvalidity: 文件夹的 UIDVALIDITY，与断点记录的不一致时重新导出
+        :return: 已导出的最大 UID，从头导出时为 0
+        '''
+        self.uidvalidity = uidvalidity
+        state = self._load_checkpoint(uidvalidity) if self.checkpoint_every else None
+        if state:
+            self._file = open(self.part_path, 'r+b', buffering=self.buffer_size)
+            # 丢弃断点之后写了一半的数据
+            self._file.truncate(state['offset'])
+            self._file.seek(state['offset'])
+            self._offset = state['offset']
+            self.last_uid = state['last_uid']
+            self.count = state['count']
+            if not self.quiet:
+                print(f"从断点继续导出 {self.file_path}：已导出 {self.count} 封，最后的 UID 为 {self.last_uid}")
+        else:
+            self._file = open(self.part_path, 'wb', buffering=self.buffer_size)
+            self._offset = 0
+            self.last_uid = 0
+            self.count = 0
+            if self.fmt == 'json':
+                self._write(b'[')
+            self._save_checkpoint()
+        return self.last_uid
+
+    def _write(self, data):
+        self._file.write(data)
+        self._offset += len(data)
+        self.bytes_written += len(data)
+
+    def write(self, record, uid=None):
+        '''
+        写入一条记录
+        :param record: 可 JSON 序列化的字典
+        :param uid: 记录对应的 UID，须按升序写入，用于断点续传
+        '''
+        data = json.dumps(record, ensure_ascii=False, indent=self.indent).encode('utf-8')
+        if self.fmt == 'json':
+            self._write(b',' + data if self.count else data)
+        else:
+            self._write(data + b'\n')
+        self.count += 1
+        if uid is not None:
+            self.last_uid = int(uid)
+        if self.checkpoint_every and self.count % self.checkpoint_every == 0:
+            self._save_checkpoint()
+            if not self.quiet:
+                print(f"已导出 {self.count} 封邮件")
+
+    def _save_checkpoint(self):
+        '''先把数据刷到磁盘，再原子地替换断点文件'''
+        if not self.checkpoint_every:
+            return
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        state = {'format': self.fmt, 'uidvalidity': self.uidvalidity, 'last_uid': self.last_uid,
+                 'count': self.count, 'offset': self._offset}
+        tmp_path = self.checkpoint_path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(state, f)
+        os.replace(tmp_path, self.checkpoint_path)
+
+    def close(self):
+        '''
+        结束导出：补全 JSON 数组，改名为目标文件并删除断点
+        :return: 导出的记录总数（包括断点之前的）
+        '''
+        if self.fmt == 'json':
+            self._write(b']')
+        self._file.close()
+        self._file = None
+        os.replace(self.part_path, self.file_path)
+        if os.path.exists(self.checkpoint_path):
+            os.remove(self.checkpoint_path)
+        return self.count
+
+    def abort(self):
+        '''中断导出：保存断点并保留未完成的数据，下次 open 时继续'''
+        if self._file is None:
+            return
+        if self.checkpoint_every:
+            self._save_checkpoint()
+        self._file.close()
+        self._file = None
+
+    def export(self, records, uidvalidity=None):
+        '''
+        一次性导出所有记录，出错或被中断时保存断点后重新抛出异常
+        :param records: (uid, 记录字典) 的可迭代对象，按 UID 升序
+        :return: 导出的记录总数
+        '''
+        if self._file is None:
+            self.open(uidvalidity)
+        try:
+            for uid, record in records:
+                self.write(record, uid)
+        except BaseException:
+            self.abort()
+            raise
+        return self.close()
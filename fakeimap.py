@@ -0,0 +1,714 @@
+'''
+本地 IMAP 桩服务器，用于基准测试和离线调试
+只实现 EmailClient 用到的命令子集，数据全部保存在内存中
+'''
+import contextlib
+import select
+import socket
+import socketserver
+import threading
+import time
+import email
+from email.message import EmailMessage
+from email.utils import format_datetime
+from datetime import datetime, timedelta, timezone
+
+from imapparse import parse
+
+# fail() 的响应：不回应命令，直接关闭连接
+DROP = object()
+
+# SEARCH 中按标志筛选的条件，前面加 UN 表示没有该标志
+_SEARCH_FLAGS = {
+    'SEEN': '\\Seen',
+    'ANSWERED': '\\Answered',
+    'FLAGGED': '\\Flagged',
+    'DELETED': '\\Deleted',
+    'DRAFT': '\\Draft',
+}
+
+
+class Message:
+    '''桩服务器中的一封邮件'''
+
+    def __init__(self, uid, raw, flags=(), modseq=1):
+        self.uid = uid
+        self.raw = raw
+        self.flags = set(flags)
+        self.modseq = modseq
+        self._parsed = None
+
+    @property
+    def parsed(self):
+        '''解析后的 email.message.Message，首次访问时解析'''
+        if self._parsed is None:
+            self._parsed = email.message_from_bytes(self.raw)
+        return self._parsed
+
+
+class Folder:
+    '''桩服务器中的一个文件夹'''
+
+    def __init__(self, name, uidvalidity=1):
+        self.name = name
+        self.uidvalidity = uidvalidity
+        self.uidnext = 1
+        self.highestmodseq = 1
+        self.messages = []
+
+    def append(self, raw, flags=()):
+        self.highestmodseq += 1
+        msg = Message(self.uidnext, raw, flags, self.highestmodseq)
+        self.uidnext += 1
+        self.messages.append(msg)
+        return msg
+
+    def touch(self, msg):
+        '''邮件标志变化时更新 MODSEQ'''
+        self.highestmodseq += 1
+        msg.modseq = self.highestmodseq
+
+
+class Mailbox:
+    '''内存中的邮箱数据，可被多个连接共享'''
+
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.folders = {'INBOX': Folder('INBOX')}
+
+    def folder(self, name):
+        if name.upper() == 'INBOX':
+            name = 'INBOX'
+        return self.folders.get(name)
+
+    def create(self, name, uidvalidity=1):
+        if name not in self.folders:
+            self.folders[name] = Folder(name, uidvalidity)
+        return self.folders[name]
+
+    def append(self, name, raw, flags=()):
+        with self.lock:
+            return self.create(name).append(raw, flags)
+
+
+def make_message(index, subject=None, sender=None, date=None, body=None):
+    '''
+    生成一封简单的测试邮件
+    :param index: 邮件序号，用于生成默认主题和正文
+    :return: 邮件原始字节
+    '''
+    msg = EmailMessage()
+    msg['Subject'] = subject or f"测试邮件 {index}"
+    msg['From'] = sender or f"发件人{index % 7} <sender{index % 7}@example.com>"
+    msg['To'] = 'me@example.com'
+    when = date or datetime(2024, 1, 1, tzinfo=timezone(timedelta(hours=8))) + timedelta(minutes=index)
+    msg['Date'] = format_datetime(when)
+    msg['Message-ID'] = f"<{index}@example.com>"
+    msg.set_content(body or f"这是第 {index} 封测试邮件的正文。\n" * 5)
+    return msg.as_bytes()
+
+
+def parse_set(spec, maxval):
+    '''
+    解析 IMAP 序列集
+    :param spec: 序列集字符串，例如 '1:3,5,7:*'
+    :param maxval: '*' 所代表的值
+    :return: 整数集合
+    '''
+    result = set()
+    for part in spec.split(','):
+        if ':' in part:
+            lo, hi = part.split(':', 1)
+            lo = maxval if lo == '*' else int(lo)
+            hi = maxval if hi == '*' else int(hi)
+            if lo > hi:
+                lo, hi = hi, lo
+            result.update(range(lo, hi + 1))
+        elif part:
+            result.add(maxval if part == '*' else int(part))
+    return result
+
+
+def _quote(value):
+    return '"' + value.replace('\\', '\\\\').replace('"', '\\"') + '"'
+
+
+def _text(value):
+    return value.decode('utf-8', 'replace') if isinstance(value, bytes) else value
+
+
+def _split_header(raw):
+    '''将原始字节拆分为 (头部, 正文)，头部包含结尾的空行'''
+    for sep in (b'\r\n\r\n', b'\n\n'):
+        pos = raw.find(sep)
+        if pos >= 0:
+            return raw[:pos + len(sep)], raw[pos + len(sep):]
+    return raw, b''
+
+
+def _header_fields(header, names, exclude=False):
+    '''从头部中挑出指定字段（含折行），用于 HEADER.FIELDS'''
+    wanted = {n.upper() for n in names}
+    out = []
+    keep = False
+    for line in header.splitlines(keepends=True):
+        if line[:1] in (b' ', b'\t'):
+            if keep:
+                out.append(line)
+            continue
+        if not line.strip():
+            continue
+        name = line.split(b':', 1)[0].strip().decode('ascii', 'replace').upper()
+        keep = (name in wanted) != exclude
+        if keep:
+            out.append(line)
+    return b''.join(out) + b'\r\n'
+
+
+def _payload_bytes(part):
+    '''返回部分经过传输编码后的正文字节'''
+    return _split_header(part.as_bytes())[1]
+
+
+def _find_part(msg, path):
+    '''按 1.2.3 形式的路径查找 MIME 部分'''
+    part = msg
+    for index in path:
+        if part.is_multipart():
+            part = part.get_payload()[index - 1]
+        elif part.get_content_type() == 'message/rfc822':
+            part = part.get_payload()[0]
+            if part.is_multipart():
+                part = part.get_payload()[index - 1]
+        elif index != 1:
+            raise IndexError('no such section')
+    return part
+
+
+def body_section(msg, spec):
+    '''
+    返回 BODY[spec] 的内容
+    :param msg: Message 对象
+    :param spec: 方括号内的部分说明，例如 '1.2'、'HEADER'、'HEADER.FIELDS (SUBJECT FROM)'
+    '''
+    if not spec:
+        return msg.raw
+    head, _, rest = spec.partition(' ')
+    path = []
+    tokens = head.split('.')
+    while tokens and tokens[0].isdigit():
+        path.append(int(tokens.pop(0)))
+    suffix = '.'.join(tokens).upper()
+    if not path:
+        header, body = _split_header(msg.raw)
+    else:
+        part = _find_part(msg.parsed, path)
+        if suffix in ('HEADER', 'TEXT', 'HEADER.FIELDS', 'HEADER.FIELDS.NOT') \
+                and part.get_content_type() == 'message/rfc822':
+            part = part.get_payload()[0]
+        header, body = _split_header(part.as_bytes())
+        if not suffix:
+            return _payload_bytes(part)
+    if suffix in ('HEADER', 'MIME'):
+        return header
+    if suffix == 'TEXT':
+        return body
+    if suffix.startswith('HEADER.FIELDS'):
+        names = [_text(n) for n in parse(rest.encode())[0]]
+        return _header_fields(header, names, suffix.endswith('.NOT'))
+    return body
+
+
+def bodystructure(part):
+    '''生成部分的 BODYSTRUCTURE 字符串'''
+    if part.is_multipart():
+        children = ''.join(bodystructure(p) for p in part.get_payload())
+        return f"({children} {_quote(part.get_content_subtype().upper())})"
+    maintype = part.get_content_maintype()
+    subtype = part.get_content_subtype()
+    params = [(k, v) for k, v in (part.get_params() or [])[1:]]
+    params = '(' + ' '.join(f"{_quote(k)} {_quote(str(v))}" for k, v in params) + ')' if params else 'NIL'
+    encoding = part.get('Content-Transfer-Encoding', '7bit').strip()
+    body = _payload_bytes(part)
+    lines = body.count(b'\n')
+    fields = f"{_quote(maintype.upper())} {_quote(subtype.upper())} {params} NIL NIL {_quote(encoding.upper())} {len(body)}"
+    if maintype == 'text':
+        fields += f" {lines}"
+    elif part.get_content_type() == 'message/rfc822':
+        fields += f" NIL {bodystructure(part.get_payload()[0])} {lines}"
+    disposition = part.get_content_disposition()
+    if disposition:
+        filename = part.get_filename()
+        extra = f"({_quote('filename')} {_quote(filename)})" if filename else 'NIL'
+        fields += f" NIL ({_quote(disposition.upper())} {extra})"
+    return f"({fields})"
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    '''处理单个客户端连接'''
+
+    wbufsize = 65536
+
+    def setup(self):
+        super().setup()
+        self.folder = None
+        self.condstore = False
+        self.mailbox = self.server.mailbox
+        # 本连接最近一次看到的 [(UID, 标志)]，NOOP/IDLE 时与当前状态比较得出变化
+        self.snapshot = []
+        self.fingerprint = None
+        # 最近一封邮件的 BODYSTRUCTURE 和 BODY[spec] 结果，分块获取大附件时不必每块都重新序列化整个部分
+        self._cached_msg = None
+        self._cache = {}
+
+    def write(self, data):
+        if isinstance(data, str):
+            data = data.encode('utf-8')
+        self.wfile.write(data)
+
+    def untagged(self, line):
+        self.write('* ' + line + '\r\n')
+
+    def read_command(self):
+        '''读取一条命令，处理客户端发送的同步字面量'''
+        line = self.rfile.readline()
+        if not line:
+            return None
+        buf = line
+        while buf.endswith(b'}\r\n') and b'{' in buf:
+            size = int(buf[buf.rindex(b'{') + 1:-3].rstrip(b'+'))
+            self.write('+ go ahead\r\n')
+            self.wfile.flush()
+            buf += self.rfile.read(size)
+            buf += self.rfile.readline()
+        return buf
+
+    def handle(self):
+        self.untagged('OK fake IMAP ready')
+        self.wfile.flush()
+        while True:
+            line = self.read_command()
+            if line is None:
+                break
+            parts = line.rstrip(b'\r\n').split(b' ', 2)
+            if len(parts) < 2:
+                continue
+            tag = parts[0].decode()
+            name = parts[1].decode().upper()
+            args = parse(parts[2]) if len(parts) > 2 else []
+            if self.server.latency:
+                time.sleep(self.server.latency)
+            uid = False
+            if name == 'UID' and args:
+                uid = True
+                name = _text(args.pop(0)).upper()
+            handler = getattr(self, 'cmd_' + name.lower(), None)
+            failure = self.server.take_failure(name)
+            if failure is DROP:
+                # 模拟连接中断：不回应，直接关闭连接
+                break
+            if failure is not None:
+                self.write(f"{tag} {failure}\r\n")
+            elif handler is None:
+                self.write(f"{tag} BAD unknown command {name}\r\n")
+            else:
+                # IDLE 会一直等待，不能占着邮箱锁
+                lock = contextlib.nullcontext() if name == 'IDLE' else self.mailbox.lock
+                try:
+                    with lock:
+                        result = handler(args, uid) if uid else handler(args)
+                        if name in self._MUTATING and self.folder is not None:
+                            self._snapshot()
+                except Exception as e:
+                    result = f"BAD {e}"
+                self.write(f"{tag} {result or 'OK completed'}\r\n")
+            self.wfile.flush()
+            if name == 'LOGOUT':
+                break
+
+    # ---- 基本命令 ----
+
+    def cmd_capability(self, args):
+        self.untagged('CAPABILITY ' + ' '.join(self.server.capabilities))
+
+    def cmd_login(self, args):
+        pass
+
+    def cmd_id(self, args):
+        self.untagged('ID NIL')
+
+    def cmd_noop(self, args):
+        if self.folder is not None:
+            self._notify()
+
+    def cmd_idle(self, args):
+        if 'IDLE' not in self.server.capabilities:
+            return 'BAD IDLE not supported'
+        self.write('+ idling\r\n')
+        self.wfile.flush()
+        while True:
+            with self.mailbox.lock:
+                if self.folder is not None and self._fingerprint() != self.fingerprint:
+                    self._notify()
+            self.wfile.flush()
+            readable, _, _ = select.select([self.connection], [], [], 0.05)
+            if readable:
+                line = self.rfile.readline()
+                if not line:
+                    return 'BAD connection closed'
+                if line.strip().upper() == b'DONE':
+                    return 'OK IDLE terminated'
+
+    # 会改变所选文件夹、需要更新本连接快照的命令
+    _MUTATING = ('SELECT', 'EXAMINE', 'STORE', 'EXPUNGE', 'MOVE', 'COPY')
+
+    def _fingerprint(self):
+        folder = self.folder
+        return len(folder.messages), folder.uidnext, folder.highestmodseq
+
+    def _snapshot(self):
+        self.snapshot = [(m.uid, frozenset(m.flags)) for m in self.folder.messages]
+        self.fingerprint = self._fingerprint()
+
+    def _notify(self):
+        '''把快照之后其它连接造成的变化以 EXPUNGE、EXISTS、FETCH 未标记响应发给客户端'''
+        current = {m.uid: m for m in self.folder.messages}
+        kept = []
+        for uid, flags in self.snapshot:
+            if uid not in current:
+                # 序号随每条 EXPUNGE 前移，所以用已保留的数量计算
+                self.untagged(f"{len(kept) + 1} EXPUNGE")
+                continue
+            kept.append((uid, flags))
+        if len(current) != len(kept):
+            self.untagged(f"{len(current)} EXISTS")
+        for seq, (uid, flags) in enumerate(kept, 1):
+            msg = current[uid]
+            if frozenset(msg.flags) != flags:
+                self.untagged(f"{seq} FETCH (FLAGS ({' '.join(sorted(msg.flags))}))")
+        self._snapshot()
+
+    def cmd_enable(self, args):
+        if 'ENABLE' not in self.server.capabilities:
+            return 'BAD ENABLE not supported'
+        enabled = [_text(a).upper() for a in args if _text(a).upper() in self.server.capabilities]
+        if 'CONDSTORE' in enabled:
+            self.condstore = True
+        self.untagged('ENABLED' + ''.join(' ' + e for e in enabled))
+
+    def cmd_logout(self, args):
+        self.untagged('BYE logging out')
+
+    def cmd_list(self, args):
+        for name in self.mailbox.folders:
+            self.untagged(f'LIST (\\HasNoChildren) "/" {_quote(name)}')
+
+    def cmd_create(self, args):
+        name = _text(args[0])
+        if name in self.mailbox.folders:
+            return 'NO folder exists'
+        self.mailbox.create(name)
+
+    def cmd_delete(self, args):
+        name = _text(args[0])
+        if self.mailbox.folders.pop(name, None) is None:
+            return 'NO no such folder'
+
+    def cmd_select(self, args):
+        folder = self.mailbox.folder(_text(args[0]))
+        if folder is None:
+            self.folder = None
+            return 'NO no such folder'
+        self.folder = folder
+        if len(args) > 1 and 'CONDSTORE' in self.server.capabilities:
+            self.condstore = True
+        self.untagged(f"{len(folder.messages)} EXISTS")
+        self.untagged('0 RECENT')
+        self.untagged(f"OK [UIDVALIDITY {folder.uidvalidity}] UIDs valid")
+        self.untagged(f"OK [UIDNEXT {folder.uidnext}] predicted next UID")
+        if self.condstore:
+            self.untagged(f"OK [HIGHESTMODSEQ {folder.highestmodseq}] highest")
+        return 'OK [READ-WRITE] SELECT completed'
+
+    cmd_examine = cmd_select
+
+    def cmd_status(self, args):
+        folder = self.mailbox.folder(_text(args[0]))
+        if folder is None:
+            return 'NO no such folder'
+        values = {
+            'MESSAGES': len(folder.messages),
+            'RECENT': 0,
+            'UIDNEXT': folder.uidnext,
+            'UIDVALIDITY': folder.uidvalidity,
+            'UNSEEN': sum(1 for m in folder.messages if '\\Seen' not in m.flags),
+            'HIGHESTMODSEQ': folder.highestmodseq,
+        }
+        names = [_text(n).upper() for n in (args[1] if len(args) > 1 else [])]
+        items = ' '.join(f"{n} {values[n]}" for n in names if n in values)
+        self.untagged(f"STATUS {_quote(folder.name)} ({items})")
+
+    # ---- 邮件命令 ----
+
+    def _selected(self, spec, uid):
+        '''返回序列集选中的 (序号, 邮件) 列表'''
+        messages = self.folder.messages
+        spec = _text(spec)
+        if uid:
+            maxuid = messages[-1].uid if messages else 0
+            wanted = parse_set(spec, maxuid)
+            return [(i + 1, m) for i, m in enumerate(messages) if m.uid in wanted]
+        wanted = parse_set(spec, len(messages))
+        return [(i, messages[i - 1]) for i in sorted(wanted) if 1 <= i <= len(messages)]
+
+    def cmd_search(self, args, uid=False):
+        if self.folder is None:
+            return 'BAD no folder selected'
+        matched = []
+        for i, m in enumerate(self.folder.messages, 1):
+            if self._match(args, i, m):
+                matched.append(str(m.uid if uid else i))
+        self.untagged('SEARCH' + ''.join(' ' + n for n in matched))
+
+    def _match(self, criteria, seq, msg):
+        items = list(criteria)
+        while items:
+            key = _text(items.pop(0)).upper()
+            if key == 'ALL':
+                continue
+            if key == 'UID':
+                maxuid = self.folder.messages[-1].uid if self.folder.messages else 0
+                if msg.uid not in parse_set(_text(items.pop(0)), maxuid):
+                    return False
+            elif key in ('FROM', 'SUBJECT'):
+                needle = _text(items.pop(0)).lower()
+                header = email.message_from_bytes(msg.raw).get(key, '')
+                if needle not in str(header).lower():
+                    return False
+            elif key in _SEARCH_FLAGS:
+                if _SEARCH_FLAGS[key] not in msg.flags:
+                    return False
+            elif key.startswith('UN') and key[2:] in _SEARCH_FLAGS:
+                if _SEARCH_FLAGS[key[2:]] in msg.flags:
+                    return False
+            elif key[:1].isdigit():
+                if seq not in parse_set(key, len(self.folder.messages)):
+                    return False
+        return True
+
+    def cmd_fetch(self, args, uid=False):
+        if self.folder is None:
+            return 'BAD no folder selected'
+        items = args[1] if isinstance(args[1], list) else [args[1]]
+        names = [_text(i).upper() for i in items]
+        if uid and 'UID' not in names:
+            names.insert(0, 'UID')
+        selected = self._selected(args[0], uid)
+        if len(args) > 2 and isinstance(args[2], list) and len(args[2]) == 2 \
+                and _text(args[2][0]).upper() == 'CHANGEDSINCE':
+            # CONDSTORE：只返回 MODSEQ 大于指定值的邮件
+            since = int(args[2][1])
+            selected = [(seq, m) for seq, m in selected if m.modseq > since]
+            if 'MODSEQ' not in names:
+                names.append('MODSEQ')
+        if not self.server.admit(len(selected)):
+            return 'NO [THROTTLED] too many requests'
+        for seq, msg in selected:
+            self.write(f"* {seq} FETCH (")
+            for n, name in enumerate(names):
+                if n:
+                    self.write(' ')
+                self._fetch_item(name, msg)
+            self.write(')\r\n')
+
+    def _fetch_item(self, name, msg):
+        if name == 'UID':
+            self.write(f"UID {msg.uid}")
+        elif name == 'FLAGS':
+            self.write('FLAGS (' + ' '.join(sorted(msg.flags)) + ')')
+        elif name == 'RFC822.SIZE':
+            self.write(f"RFC822.SIZE {len(msg.raw)}")
+        elif name == 'MODSEQ':
+            self.write(f"MODSEQ ({msg.modseq})")
+        elif name == 'RFC822':
+            self._literal('RFC822', msg.raw)
+        elif name == 'RFC822.HEADER':
+            self._literal('RFC822.HEADER', _split_header(msg.raw)[0])
+        elif name == 'BODYSTRUCTURE':
+            self.write('BODYSTRUCTURE ' + self._cached(msg, name, lambda: bodystructure(msg.parsed)))
+        elif name.startswith('BODY[') or name.startswith('BODY.PEEK['):
+            spec = name[name.index('[') + 1:name.rindex(']')]
+            partial = name[name.rindex(']') + 1:]
+            label = f"BODY[{spec}]"
+            if partial:
+                data = self._cached(msg, label, lambda: body_section(msg, spec))
+                offset, _, length = partial.strip('<>').partition('.')
+                offset = int(offset)
+                data = data[offset:offset + int(length)] if length else data[offset:]
+                label += f"<{offset}>"
+            else:
+                data = body_section(msg, spec)
+            self._literal(label, data)
+        else:
+            self.write(f"{name} NIL")
+
+    def _cached(self, msg, key, compute):
+        '''只缓存最近一封邮件的结果，内存占用不随文件夹大小增长'''
+        if msg is not self._cached_msg:
+            self._cached_msg = msg
+            self._cache = {}
+        if key not in self._cache:
+            self._cache[key] = compute()
+        return self._cache[key]
+
+    def _literal(self, label, data):
+        self.write(f"{label} {{{len(data)}}}\r\n")
+        self.write(data)
+
+    def cmd_copy(self, args, uid=False):
+        target = self.mailbox.folder(_text(args[1]))
+        if target is None:
+            return 'NO [TRYCREATE] no such folder'
+        for _, msg in self._selected(args[0], uid):
+            target.append(msg.raw, msg.flags)
+
+    def cmd_store(self, args, uid=False):
+        mode = _text(args[1]).upper()
+        flags = args[2] if isinstance(args[2], list) else [args[2]]
+        flags = {_text(f) for f in flags}
+        for seq, msg in self._selected(args[0], uid):
+            if mode.startswith('+'):
+                msg.flags |= flags
+            elif mode.startswith('-'):
+                msg.flags -= flags
+            else:
+                msg.flags = set(flags)
+            self.folder.touch(msg)
+            if '.SILENT' not in mode:
+                self.untagged(f"{seq} FETCH (FLAGS ({' '.join(sorted(msg.flags))}))")
+
+    def cmd_expunge(self, args, uid=False):
+        if self.folder is None:
+            return 'BAD no folder selected'
+        wanted = None
+        if uid:
+            # UIDPLUS：只删除指定 UID 中带 \Deleted 标志的邮件
+            wanted = {m.uid for _, m in self._selected(args[0], True)}
+        self._expunge(lambda m: '\\Deleted' in m.flags and (wanted is None or m.uid in wanted))
+
+    def _expunge(self, predicate):
+        messages = self.folder.messages
+        for i in range(len(messages), 0, -1):
+            if predicate(messages[i - 1]):
+                del messages[i - 1]
+                self.untagged(f"{i} EXPUNGE")
+
+    def cmd_move(self, args, uid=False):
+        if 'MOVE' not in self.server.capabilities:
+            return 'BAD MOVE not supported'
+        result = self.cmd_copy(args, uid)
+        if result:
+            return result
+        moved = {id(m) for _, m in self._selected(args[0], uid)}
+        self._expunge(lambda m: id(m) in moved)
+
+
+class _ServerState:
+    '''
+    桩服务器的共享状态
+    :param mailbox: Mailbox 对象
+    :param latency: 每条命令的附加延迟（秒），用于模拟网络往返
+    :param rate_limit: 每秒允许 FETCH 的邮件数，超出时返回 NO [THROTTLED]，为 None 时不限速
+    '''
+
+    def __init__(self, mailbox=None, latency=0.0, capabilities=('IMAP4rev1', 'ID'), rate_limit=None):
+        self.mailbox = mailbox or Mailbox()
+        self.latency = latency
+        self.rate_limit = rate_limit
+        self._window = (0.0, 0)
+        self.capabilities = list(capabilities)
+        # 命令名 -> [剩余次数, 响应]
+        self._failures = {}
+        self._failures_lock = threading.Lock()
+
+    def fail(self, command, count=1, response='NO [UNAVAILABLE] injected failure'):
+        '''
+        让接下来的 count 条命令直接返回 response 而不执行，用于测试客户端的错误处理
+        :param command: 命令名，UID 命令按 UID 之后的命令名计，例如 'SEARCH'、'FETCH'
+        :param response: 返回的状态和文本；为 DROP 时不回应并关闭连接，模拟连接中断
+        '''
+        with self._failures_lock:
+            self._failures[command.upper()] = [count, response]
+
+    def take_failure(self, command):
+        ''':return: 为该命令注入的响应，没有时返回 None'''
+        with self._failures_lock:
+            failure = self._failures.get(command)
+            if failure is None:
+                return None
+            failure[0] -= 1
+            if failure[0] <= 0:
+                del self._failures[command]
+            return failure[1]
+
+    def admit(self, count):
+        '''按一秒的时间窗口统计 FETCH 的邮件数，超过 rate_limit 时拒绝'''
+        if self.rate_limit is None:
+            return True
+        now = time.monotonic()
+        start, used = self._window
+        if now - start >= 1.0:
+            start, used = now, 0
+        if used + count > self.rate_limit and used:
+            self._window = (start, used)
+            return False
+        self._window = (start, used + count)
+        return True
+
+
+class FakeImapServer(_ServerState, socketserver.ThreadingTCPServer):
+    '''
+    本地 IMAP 桩服务器，监听 TCP 端口，参数见 _ServerState
+    '''
+
+    daemon_threads = True
+    allow_reuse_address = True
+    # 并发测试时可能同时有几十个连接，默认的 5 会让多余的连接卡在握手阶段
+    request_queue_size = 128
+
+    def __init__(self, mailbox=None, host='127.0.0.1', port=0, latency=0.0,
+                 capabilities=('IMAP4rev1', 'ID'), rate_limit=None):
+        socketserver.ThreadingTCPServer.__init__(self, (host, port), _Handler)
+        _ServerState.__init__(self, mailbox, latency, capabilities, rate_limit)
+        self._thread = None
+
+    def start(self):
+        '''在后台线程中启动服务器，返回 (host, port)'''
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self._thread.start()
+        return self.server_address
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+
+class LocalServer(_ServerState):
+    '''
+    不监听端口的进程内桩服务器：每个连接是一对 socketpair，另一端由后台线程处理，参数见 _ServerState
+    '''
+
+    def connect(self):
+        ''':return: 已连接到服务器的 socket'''
+        client, server = socket.socketpair()
+        threading.Thread(target=self._serve, args=(server,), daemon=True).start()
+        return client
+
+    def _serve(self, sock):
+        try:
+            _Handler(sock, ('local', 0), self)
+        except OSError:
+            # 客户端没有 LOGOUT 就关闭了连接
+            pass
+        finally:
+            sock.close()
@@ -0,0 +1,162 @@
+'''
+邮件头部解码：解码主题、发件人中的全部 encoded-word，用 parsedate_to_datetime 解析日期
+字符集到解码函数的查找和重复出现的发件人字符串都会缓存，大量邮件反复出现的发件人只解码一次
+'''
+import binascii
+import codecs
+import re
+from email.errors import HeaderParseError
+from email.header import decode_header
+from email.utils import parsedate_to_datetime
+from functools import lru_cache
+
+# 导出和界面显示的日期格式，使用邮件自身的时区
+DATE_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+# 国内邮件常把含 GBK 字符的内容标成 gb2312，统一用兼容它们的 gb18030 解码
+_SUPERSETS = {
+    'gb2312': 'gb18030',
+    'gbk': 'gb18030',
+    'x-gbk': 'gb18030',
+    'cp936': 'gb18030',
+    'euc-cn': 'gb18030',
+}
+
+# 未声明字符集的 8 位头部依次尝试的字符集
+_FALLBACKS = ('utf-8', 'gb18030')
+
+# RFC 2047 encoded-word，字符集后可以带 RFC 2231 的语言标记，例如 =?utf-8*zh?B?...?=
+_ENCODED_WORD = re.compile(r'=\?([^?*]+)(?:\*[^?]*)?\?([bBqQ])\?([^?]*)\?=')
+
+
+@lru_cache(maxsize=256)
+def lookup_decoder(charset):
+    '''
+    查找字符集对应的解码函数
+    :param charset: 字符集名称，大小写和首尾空白不影响结果
+    :return: codecs 的 decode 函数，字符集未知或为空时返回 None
+    '''
+    if not charset:
+        return None
+    name = charset.strip().lower()
+    try:
+        return codecs.lookup(_SUPERSETS.get(name, name)).decode
+    except LookupError:
+        return None
+
+
+def decode_bytes(data, charset=None):
+    '''
+    按字符集解码字节串
+    :param data: 字节串
+    :param charset: 声明的字符集，为空或 unknown-8bit 时依次尝试 utf-8 和 gb18030
+    :return: 字符串，都无法解码时用 utf-8 并替换无法解码的字符
+    '''
+    decoder = lookup_decoder(charset)
+    if decoder is not None:
+        try:
+            return decoder(data)[0]
+        except UnicodeDecodeError:
+            pass
+    for fallback in _FALLBACKS:
+        try:
+            return lookup_decoder(fallback)(data)[0]
+        except UnicodeDecodeError:
+            continue
+    return data.decode('utf-8', errors='replace')
+
+
+def decode_header_value(value):
+    '''
+    解码邮件头，拼接全部 encoded-word 和普通文本
+    :param value: 头部值，可以是字符串或 email.header.Header
+    :return: 解码后的字符串，value 为 None 时返回空字符串
+    '''
+    if value is None:
+        return ""
+    if isinstance(value, str):
+        if '=?' not in value:
+            # 没有 encoded-word，decode_header 也会原样返回
+            return value
+        decoded = _decode_words(value)
+        if decoded is not None:
+            return decoded
+    try:
+        parts = decode_header(value)
+    except HeaderParseError:
+        return str(value)
+    return ''.join(part if isinstance(part, str) else decode_bytes(part, charset)
+                   for part, charset in parts)
+
+
+def _decode_words(value):
+    '''
+    用一个正则直接解码 encoded-word，比 decode_header 逐行拆分再合并快；
+    相邻且字符集相同的 encoded-word 先拼接字节再解码，被拆开的多字节字符也能正确还原
+    :return: 解码后的字符串，encoded-word 格式不规范时返回 None，交给 decode_header 处理
+    '''
+    # 展开折行，encoded-word 之间只有空白时空白不属于内容
+    value = value.replace('\r\n', '').replace('\n', '')
+    out = []
+    pending = bytearray()
+    pending_charset = None
+    after_word = False
+    pos = 0
+    for match in _ENCODED_WORD.finditer(value):
+        text = value[pos:match.start()]
+        if text and not (after_word and text.isspace()):
+            if pending:
+                out.append(decode_bytes(bytes(pending), pending_charset))
+                pending.clear()
+            out.append(text)
+        charset, encoding, data = match.groups()
+        try:
+            if encoding in 'bB':
+                data = binascii.a2b_base64(data + '=' * (-len(data) % 4))
+            else:
+                data = binascii.a2b_qp(data.encode('ascii'), header=True)
+        except (binascii.Error, ValueError):
+            return None
+        charset = charset.lower()
+        if charset != pending_charset and pending:
+            out.append(decode_bytes(bytes(pending), pending_charset))
+            pending.clear()
+        pending_charset = charset
+        pending += data
+        after_word = True
+        pos = match.end()
+    if pending:
+        out.append(decode_bytes(bytes(pending), pending_charset))
+    out.append(value[pos:])
+    return ''.join(out)
+
+
+@lru_cache(maxsize=4096)
+def _decode_cached(value):
+    return decode_header_value(value)
+
+
+def decode_sender(value):
+    '''
+    解码发件人等重复率高的头部，结果按原始字符串缓存
+    :param value: 头部值
+    :return: 解码后的字符串
+    '''
+    if isinstance(value, str):
+        return _decode_cached(value)
+    # Header 对象不可哈希，不缓存
+    return decode_header_value(value)
+
+
+def format_date(value):
+    '''
+    解析 Date 头并格式化为 DATE_FORMAT
+    :param value: Date 头的值，支持任意时区和注释，例如 '(CST)'、'(UTC)'
+    :return: 格式化后的日期字符串，没有日期时返回空字符串，无法解析时返回 None
+    '''
+    if value is None:
+        return ""
+    try:
+        return parsedate_to_datetime(str(value)).strftime(DATE_FORMAT)
+    except (TypeError, ValueError, IndexError, OverflowError):
+        return None
@@ -0,0 +1,251 @@
+'''
+IMAP 协议辅助工具：序列集压缩与 FETCH 响应解析
+'''
+import re
+
+_LITERAL = re.compile(rb'\{(\d+)\}\r\n')
+_ATOM_END = b' ()\r\n'
+
+
+def sequence_set(ids):
+    '''
+    将邮件 ID 列表压缩为 IMAP 序列集
+    :param ids: 邮件 ID 列表，元素可以是字符串或整数
+    :return: 序列集字符串，例如 [1, 2, 3, 5] -> '1:3,5'
+    '''
+    nums = sorted({int(i) for i in ids})
+    if not nums:
+        return ''
+    ranges = []
+    start = prev = nums[0]
+    for n in nums[1:]:
+        if n == prev + 1:
+            prev = n
+            continue
+        ranges.append(f"{start}:{prev}" if start != prev else str(start))
+        start = prev = n
+    ranges.append(f"{start}:{prev}" if start != prev else str(start))
+    return ','.join(ranges)
+
+
+def chunked(ids, size):
+    '''
+    按固定大小切分 ID 列表
+    :param ids: 邮件 ID 列表
+    :param size: 每块的大小
+    :return: 生成器，依次产出子列表
+    '''
+    ids = list(ids)
+    for i in range(0, len(ids), size):
+        yield ids[i:i + size]
+
+
+def join_response(data):
+    '''
+    将 imaplib 返回的数据列表还原为线路格式的字节串
+    imaplib 会把带字面量的行拆成 (前缀, 字面量) 元组，这里重新拼接成 "{n}\\r\\n<字面量>"
+    '''
+    chunks = []
+    for item in data:
+        if item is None:
+            continue
+        if isinstance(item, tuple):
+            chunks.append(item[0] + b'\r\n' + item[1])
+        else:
+            chunks.append(item)
+    return b' '.join(chunks)
+
+
+class _Reader:
+    '''IMAP 数据的简单递归下降解析器'''
+
+    def __init__(self, buf):
+        self.buf = buf
+        self.pos = 0
+
+    def skip_space(self):
+        while self.pos < len(self.buf) and self.buf[self.pos:self.pos + 1] in (b' ', b'\r', b'\n'):
+            self.pos += 1
+
+    def at_end(self):
+        self.skip_space()
+        return self.pos >= len(self.buf)
+
+    def peek(self):
+        return self.buf[self.pos:self.pos + 1]
+
+    def value(self):
+        '''读取一个值：列表、带引号字符串、字面量或原子'''
+        self.skip_space()
+        c = self.peek()
+        if c == b'(':
+            self.pos += 1
+            items = []
+            while True:
+                self.skip_space()
+                if self.peek() in (b')', b''):
+                    self.pos += 1
+                    return items
+                items.append(self.value())
+        if c == b'"':
+            return self._quoted()
+        if c == b'{':
+            mo = _LITERAL.match(self.buf, self.pos)
+            if mo:
+                size = int(mo.group(1))
+                start = mo.end()
+                self.pos = start + size
+                return self.buf[start:self.pos]
+        return self._atom()
+
+    def _quoted(self):
+        self.pos += 1
+        out = bytearray()
+        while self.pos < len(self.buf):
+            c = self.buf[self.pos]
+            if c == 0x5c:  # 反斜杠转义
+                out.append(self.buf[self.pos + 1])
+                self.pos += 2
+                continue
+            if c == 0x22:
+                self.pos += 1
+                break
+            out.append(c)
+            self.pos += 1
+        return bytes(out)
+
+    def _atom(self):
+        start = self.pos
+        depth = 0
+        while self.pos < len(self.buf):
+            c = self.buf[self.pos:self.pos + 1]
+            if c == b'[':
+                depth += 1
+            elif c == b']':
+                depth -= 1
+            elif depth == 0 and c in _ATOM_END:
+                break
+            self.pos += 1
+        if self.pos == start and self.pos < len(self.buf):
+            # 多余的右括号等不规范的数据：跳过一个字节，否则调用方会在原地无限循环
+            self.pos += 1
+        atom = self.buf[start:self.pos]
+        if atom.upper() == b'NIL':
+            return None
+        return atom
+
+
+def parse(buf):
+    '''
+    解析一段 IMAP 数据
+    :param buf: 字节串，例如 b'(1 "a" NIL)'
+    :return: 解析后的值列表
+    '''
+    reader = _Reader(buf)
+    values = []
+    while not reader.at_end():
+        values.append(reader.value())
+    return values
+
+
+def parse_fetch(data):
+    '''
+    解析 FETCH 命令的响应
+    :param data: imaplib fetch/uid 返回的数据列表
+    :return: [(序号, {属性名: 值}), ...]，属性名为大写字符串，例如 'RFC822'、'UID'
+    '''
+    reader = _Reader(join_response(data))
+    results = []
+    while not reader.at_end():
+        seq = reader.value()
+        if not isinstance(seq, bytes) or not seq.isdigit():
+            # 不是序号时只跳过这一个值，下一个值可能就是下一条响应的序号
+            continue
+        items = reader.value()
+        if not isinstance(items, list):
+            continue
+        attrs = {}
+        for i in range(0, len(items) - 1, 2):
+            key = items[i]
+            if isinstance(key, bytes):
+                attrs[key.decode('ascii', 'replace').upper()] = items[i + 1]
+        results.append((int(seq), attrs))
+    return results
+
+
+def _str(value):
+    if value is None:
+        return None
+    return value.decode('utf-8', 'replace') if isinstance(value, bytes) else str(value)
+
+
+def _params(value):
+    '''将 ("charset" "utf-8" ...) 形式的参数列表转换为字典，键为小写'''
+    params = {}
+    if isinstance(value, list):
+        for i in range(0, len(value) - 1, 2):
+            params[_str(value[i]).lower()] = _str(value[i + 1])
+    return params
+
+
+def parse_bodystructure(value):
+    '''
+    解析 BODYSTRUCTURE，列出所有叶子部分
+    :param value: parse_fetch 返回的 BODYSTRUCTURE 值（嵌套列表）
+    :return: 部分列表，每项为字典，包含 section（如 '1.2'）、type、subtype、params、
+             encoding、size、disposition、disposition_params、filename
+    '''
+    parts = []
+    if isinstance(value, list):
+        _walk_bodystructure(value, '', parts)
+    return parts
+
+
+def _walk_bodystructure(node, section, parts):
+    if node and isinstance(node[0], list):
+        # multipart：先列出各子部分，最后是子类型和扩展字段
+        index = 0
+        for child in node:
+            if not isinstance(child, list):
+                break
+            index += 1
+            _walk_bodystructure(child, f"{section}.{index}" if section else str(index), parts)
+        return
+
+    ctype = (_str(node[0]) or 'text').lower()
+    subtype = (_str(node[1]) or 'plain').lower()
+    params = _params(node[2])
+    if ctype == 'text':
+        ext = 8
+    elif ctype == 'message' and subtype == 'rfc822':
+        ext = 10
+    else:
+        ext = 7
+    disposition, disposition_params, filename = None, {}, params.get('name')
+    if len(node) > ext + 1 and isinstance(node[ext + 1], list) and node[ext + 1]:
+        disposition = (_str(node[ext + 1][0]) or '').lower()
+        if len(node[ext + 1]) > 1:
+            disposition_params = _params(node[ext + 1][1])
+            filename = disposition_params.get('filename', filename)
+    parts.append({
+        'section': section or '1',
+        'type': ctype,
+        'subtype': subtype,
+        'params': params,
+        'encoding': (_str(node[5]) or '7bit').lower(),
+        'size': int(node[6]) if node[6] and node[6].isdigit() else 0,
+        'disposition': disposition,
+        'disposition_params': disposition_params,
+        'filename': filename,
+    })
+
+
+def find_attr(attrs, prefix):
+    '''
+    按前缀查找 FETCH 属性，例如 find_attr(attrs, 'BODY[HEADER')
+    :return: 属性值，未找到时返回 None
+    '''
+    for key, value in attrs.items():
+        if key.startswith(prefix):
+            return value
+    return None
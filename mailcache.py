@@ -0,0 +1,255 @@
+'''
+本地邮件缓存：按 (文件夹, UIDVALIDITY, UID) 保存已下载的邮件，使用 SQLite
+'''
+import re
+import sqlite3
+import threading
+
+_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS folders (
+    folder TEXT PRIMARY KEY,
+    uidvalidity INTEGER NOT NULL,
+    highestmodseq INTEGER
+);
+CREATE TABLE IF NOT EXISTS messages (
+    folder TEXT NOT NULL,
+    uidvalidity INTEGER NOT NULL,
+    uid INTEGER NOT NULL,
+    subject TEXT,
+    sender TEXT,
+    date TEXT,
+    content TEXT,
+    flags TEXT DEFAULT '',
+    PRIMARY KEY (folder, uidvalidity, uid)
+);
+CREATE VIRTUAL TABLE IF NOT EXISTS messages_fts USING fts5(subject, sender, content, tokenize='unicode61');
+'''
+
+# messages_fts 的 rowid 与 messages 的 rowid 一致；user_version 为 1 表示已经为旧数据建立过索引
+_FTS_VERSION = 1
+
+# 中日韩文字没有空格分词，按相邻两个字切成二元组
+_CJK = re.compile(r'[\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uac00-\ud7af\uf900-\ufaff]+')
+
+
+def _bigrams(match):
+    run = match.group(0)
+    grams = [run[i:i + 2] for i in range(len(run) - 1)]
+    # 末尾再放一个单字，单字查询用前缀匹配时才能找到处在词尾的字
+    grams.append(run[-1])
+    return ' ' + ' '.join(grams) + ' '
+
+
+def index_text(text):
+    '''把文本转换为写入全文索引的形式：中日韩文字切成二元组，其它文字交给 unicode61 分词'''
+    return _CJK.sub(_bigrams, text or '')
+
+
+def _query_phrase(word):
+    '''
+    把查询词转换为与 index_text 一致的短语
+    :return: (短语, 是否前缀匹配)
+    '''
+    pieces = []
+    pos = 0
+    prefix = False
+    for mo in _CJK.finditer(word):
+        run = mo.group(0)
+        grams = [run[i:i + 2] for i in range(len(run) - 1)]
+        if mo.end() < len(word):
+            # 中文段后面还有其它字符时，索引里这一段同样以单字结尾
+            grams.append(run[-1])
+        elif len(run) == 1:
+            # 词尾的单个汉字在索引里可能是二元组的第一个字，用前缀匹配
+            grams.append(run)
+            prefix = True
+        pieces += [word[pos:mo.start()], ' ', ' '.join(grams), ' ']
+        pos = mo.end()
+    pieces.append(word[pos:])
+    return ''.join(pieces).strip(), prefix
+
+
+def fts_query(query):
+    '''
+    把用户输入的查询转换为 FTS5 查询：按空白切分的每个词都必须出现，
+    中日韩词语转换为相邻二元组组成的短语，词尾的单个汉字用前缀匹配
+    '''
+    terms = []
+    for word in query.split():
+        phrase, prefix = _query_phrase(word)
+        if phrase:
+            terms.append('"' + phrase.replace('"', '""') + '"' + ('*' if prefix else ''))
+    return ' AND '.join(terms)
+
+
+class MailCache:
+    '''
+    SQLite 邮件缓存
+    :param path: 数据库文件路径，':memory:' 表示只保存在内存中
+    '''
+
+    def __init__(self, path):
+        self.path = path
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        self.conn.executescript(_SCHEMA)
+        self.lock = threading.RLock()
+        if self.conn.execute('PRAGMA user_version').fetchone()[0] < _FTS_VERSION:
+            self.rebuild_index()
+
+    def folder_state(self, folder):
+        '''
+        :return: (uidvalidity, highestmodseq)，文件夹未缓存时返回 None
+        '''
+        with self.lock:
+            row = self.conn.execute(
+                'SELECT uidvalidity, highestmodseq FROM folders WHERE folder = ?', (folder,)).fetchone()
+        return row
+
+    def rebuild_index(self):
+        '''根据 messages 表重建全文索引'''
+        with self.lock, self.conn:
+            self.conn.execute('DELETE FROM messages_fts')
+            rows = self.conn.execute('SELECT rowid, subject, sender, content FROM messages')
+            self.conn.executemany(
+                'INSERT INTO messages_fts (rowid, subject, sender, content) VALUES (?, ?, ?, ?)',
+                ((rowid, index_text(subject), index_text(sender), index_text(content))
+                 for rowid, subject, sender, content in rows))
+            self.conn.execute(f'PRAGMA user_version = {_FTS_VERSION}')
+
+    def reset_folder(self, folder, uidvalidity):
+        '''清空文件夹缓存并记录新的 UIDVALIDITY'''
+        with self.lock, self.conn:
+            self.conn.execute(
+                'DELETE FROM messages_fts WHERE rowid IN (SELECT rowid FROM messages WHERE folder = ?)', (folder,))
+            self.conn.execute('DELETE FROM messages WHERE folder = ?', (folder,))
+            self.conn.execute(
+                'INSERT OR REPLACE INTO folders (folder, uidvalidity, highestmodseq) VALUES (?, ?, NULL)',
+                (folder, uidvalidity))
+
+    def set_modseq(self, folder, modseq):
+        with self.lock, self.conn:
+            self.conn.execute('UPDATE folders SET highestmodseq = ? WHERE folder = ?', (modseq, folder))
+
+    def _uidvalidity(self, folder):
+        state = self.folder_state(folder)
+        return state[0] if state else None
+
+    def max_uid(self, folder):
+        ''':return: 已缓存的最大 UID，没有缓存时返回 0'''
+        with self.lock:
+            row = self.conn.execute(
+                'SELECT MAX(uid) FROM messages WHERE folder = ? AND uidvalidity = ?',
+                (folder, self._uidvalidity(folder))).fetchone()
+        return row[0] or 0
+
+    def count(self, folder):
+        with self.lock:
+            row = self.conn.execute(
+                'SELECT COUNT(*) FROM messages WHERE folder = ? AND uidvalidity = ?',
+                (folder, self._uidvalidity(folder))).fetchone()
+        return row[0]
+
+    def uids(self, folder):
+        ''':return: 已缓存的 UID 集合'''
+        with self.lock:
+            rows = self.conn.execute(
+                'SELECT uid FROM messages WHERE folder = ? AND uidvalidity = ?',
+                (folder, self._uidvalidity(folder))).fetchall()
+        return {r[0] for r in rows}
+
+    def store(self, folder, records):
+        '''
+        写入邮件记录，同时更新全文索引
+        :param records: 字典列表，包含 uid、subject、sender、date、content，可选 flags
+        :return: 写入的记录数
+        '''
+        uidvalidity = self._uidvalidity(folder)
+        rows = [(folder, uidvalidity, int(r['uid']), r['subject'], r['sender'], r['date'],
+                 r['content'], r.get('flags', '')) for r in records]
+        with self.lock, self.conn:
+            # 用 UPSERT 而不是 INSERT OR REPLACE，已有记录的 rowid 保持不变，索引行可以按 rowid 覆盖
+            self.conn.executemany(
+                'INSERT INTO messages (folder, uidvalidity, uid, subject, sender, date, content, flags) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?, ?) ON CONFLICT (folder, uidvalidity, uid) DO UPDATE SET '
+                'subject = excluded.subject, sender = excluded.sender, date = excluded.date, '
+                'content = excluded.content, flags = excluded.flags', rows)
+            self.conn.executemany(
+                'INSERT OR REPLACE INTO messages_fts (rowid, subject, sender, content) VALUES ('
+                '(SELECT rowid FROM messages WHERE folder = ? AND uidvalidity = ? AND uid = ?), ?, ?, ?)',
+                [(folder, uidvalidity, row[2], index_text(row[3]), index_text(row[4]), index_text(row[6]))
+                 for row in rows])
+        return len(rows)
+
+    def update_flags(self, folder, flags):
+        '''
+        :param flags: {uid: 标志字符串}
+        '''
+        uidvalidity = self._uidvalidity(folder)
+        with self.lock, self.conn:
+            self.conn.executemany(
+                'UPDATE messages SET flags = ? WHERE folder = ? AND uidvalidity = ? AND uid = ?',
+                [(f, folder, uidvalidity, int(uid)) for uid, f in flags.items()])
+
+    def remove(self, folder, uids):
+        '''删除指定 UID 的缓存'''
+        uidvalidity = self._uidvalidity(folder)
+        keys = [(folder, uidvalidity, int(uid)) for uid in uids]
+        with self.lock, self.conn:
+            self.conn.executemany(
+                'DELETE FROM messages_fts WHERE rowid = '
+                '(SELECT rowid FROM messages WHERE folder = ? AND uidvalidity = ? AND uid = ?)', keys)
+            self.conn.executemany(
+                'DELETE FROM messages WHERE folder = ? AND uidvalidity = ? AND uid = ?', keys)
+
+    def records(self, folder, batch_size=1000, after=0):
+        '''
+        按 UID 顺序逐条读取缓存的邮件记录
+        :param after: 只读取 UID 大于该值的邮件，用于断点续传
+        :return: 生成器，产出包含 uid、subject、sender、date、content、flags 的字典
+        '''
+        uidvalidity = self._uidvalidity(folder)
+        last = after
+        while True:
+            with self.lock:
+                rows = self.conn.execute(
+                    'SELECT uid, subject, sender, date, content, flags FROM messages '
+                    'WHERE folder = ? AND uidvalidity = ? AND uid > ? ORDER BY uid LIMIT ?',
+                    (folder, uidvalidity, last, batch_size)).fetchall()
+            if not rows:
+                return
+            for uid, subject, sender, date, content, flags in rows:
+                yield {'uid': uid, 'subject': subject, 'sender': sender, 'date': date,
+                       'content': content, 'flags': flags}
+            last = rows[-1][0]
+
+    def search(self, query, folder=None, limit=50):
+        '''
+        在主题、发件人和正文中全文搜索
+        :param query: 查询词，空格分隔的多个词须同时出现
+        :param folder: 只搜索该文件夹，为 None 时搜索所有文件夹
+        :param limit: 最多返回的结果数
+        :return: 字典列表，包含 folder、uid、subject、sender、date、content、flags，最近缓存的邮件在前
+        '''
+        match = fts_query(query)
+        if not match:
+            return []
+        sql = ('SELECT m.folder, m.uid, m.subject, m.sender, m.date, m.content, m.flags '
+               'FROM messages_fts JOIN messages m ON m.rowid = messages_fts.rowid '
+               'JOIN folders f ON f.folder = m.folder AND f.uidvalidity = m.uidvalidity '
+               'WHERE messages_fts MATCH ?')
+        args = [match]
+        if folder is not None:
+            sql += ' AND m.folder = ?'
+            args.append(folder)
+        sql += ' ORDER BY messages_fts.rowid DESC LIMIT ?'
+        args.append(limit)
+        with self.lock:
+            rows = self.conn.execute(sql, args).fetchall()
+        return [{'folder': r[0], 'uid': r[1], 'subject': r[2], 'sender': r[3], 'date': r[4],
+                 'content': r[5], 'flags': r[6]} for r in rows]
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
@@ -0,0 +1,295 @@
+'''
+邮件列表模型：QListView 滚动到哪里才在后台按窗口加载哪里的邮件头部，
+已加载的窗口保存在 LRU 中，文件夹再大内存占用也保持不变
+'''
+from collections import OrderedDict
+
+from PyQt5.QtCore import QAbstractListModel, QModelIndex, QObject, QRunnable, QThreadPool, Qt, pyqtSignal
+
+
+class LRUCache:
+    '''
+    最近最少使用缓存
+    :param capacity: 最多保存的条目数
+    '''
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self._items = OrderedDict()
+
+    def get(self, key, default=None):
+        if key not in self._items:
+            return default
+        self._items.move_to_end(key)
+        return self._items[key]
+
+    def put(self, key, value):
+        self._items[key] = value
+        self._items.move_to_end(key)
+        while len(self._items) > self.capacity:
+            self._items.popitem(last=False)
+
+    def __contains__(self, key):
+        return key in self._items
+
+    def __len__(self):
+        return len(self._items)
+
+    def clear(self):
+        self._items.clear()
+
+
+class ListSource:
+    '''
+    内存中的邮件列表
+    :param emails: 字典列表，包含 id、subject、sender、date
+    '''
+
+    def __init__(self, emails):
+        self.emails = {str(e['id']): e for e in emails}
+
+    def ids(self):
+        return list(self.emails)
+
+    def headers(self, ids):
+        return [self.emails[i] for i in ids if i in self.emails]
+
+
+class ClientSource:
+    '''
+    通过 EmailClient 获取邮件：先搜索出文件夹中全部邮件的 ID，再按窗口用 headers 模式获取
+    EmailClient 不是线程安全的，同一个 client 只能交给一个单线程的加载队列使用
+    :param client: 已登录的 EmailClient
+    :param folder: 邮箱文件夹名称
+    '''
+
+    def __init__(self, client, folder):
+        self.client = client
+        self.folder = folder
+
+    def ids(self):
+        if not self.client.select_folder(self.folder):
+            return []
+        return self.client.search_emails('ALL')
+
+    def headers(self, ids):
+        return [{'id': e.email_id, 'subject': e.subject, 'sender': e.sender, 'date': e.date}
+                for e in self.client.fetch_emails(ids, batch_size=len(ids), mode='headers') if e]
+
+
+class TaskSignals(QObject):
+    done = pyqtSignal(int, object, object)
+    failed = pyqtSignal(int, object, str)
+
+
+class Task(QRunnable):
+    '''
+    在线程池中执行 func(*args)，完成后通过信号把结果交回主线程
+    :param generation: 发起任务时的代数，接收方据此丢弃过期的结果
+    :param key: 任务标识，随结果一起发回
+    '''
+
+    def __init__(self, generation, key, func, *args):
+        super().__init__()
+        self.generation = generation
+        self.key = key
+        self.func = func
+        self.args = args
+        self.signals = TaskSignals()
+
+    def run(self):
+        try:
+            result = self.func(*self.args)
+        except Exception as e:
+            self.signals.failed.emit(self.generation, self.key, str(e))
+            return
+        self.signals.done.emit(self.generation, self.key, result)
+
+
+class EmailListModel(QAbstractListModel):
+    '''
+    懒加载的邮件列表模型，最新的邮件排在最前面
+    行数随滚动通过 canFetchMore/fetchMore 增长；每 window_size 行为一个窗口，
+    显示到某个窗口时才在后台获取该窗口的头部，被 LRU 淘汰的窗口再次显示时重新获取
+
+    :param window_size: 每个窗口的邮件数量，也是一条 FETCH 获取的邮件数量
+    :param max_windows: LRU 中最多保存的窗口数
+    :param pool: 执行加载任务的线程池，为 None 时创建单线程的线程池
+    '''
+
+    # 加载失败时发出，参数为错误信息
+    loadFailed = pyqtSignal(str)
+    # 全部邮件 ID 加载完成时发出，参数为邮件总数
+    countChanged = pyqtSignal(int)
+
+    PLACEHOLDER = "加载中…"
+
+    def __init__(self, window_size=100, max_windows=20, pool=None, parent=None):
+        super().__init__(parent)
+        self.window_size = window_size
+        self._windows = LRUCache(max_windows)
+        if pool is None:
+            pool = QThreadPool(self)
+            pool.setMaxThreadCount(1)
+        self._pool = pool
+        self._source = None
+        self._generation = 0
+        self._ids = []
+        self._visible = 0
+        # 窗口 -> 请求时该窗口的邮件 ID 列表
+        self._loading = {}
+        self._checked = set()
+
+    def set_source(self, source):
+        '''切换数据源，在后台重新获取邮件 ID 列表'''
+        self.beginResetModel()
+        self._generation += 1
+        self._source = source
+        self._ids = []
+        self._visible = 0
+        self._windows.clear()
+        self._loading.clear()
+        self._checked.clear()
+        self.endResetModel()
+        if source is not None:
+            self._start(None, source.ids)
+
+    def total(self):
+        ''':return: 文件夹中的邮件总数'''
+        return len(self._ids)
+
+    def _start(self, key, func, *args):
+        task = Task(self._generation, key, func, *args)
+        task.signals.done.connect(self._on_done)
+        task.signals.failed.connect(self._on_failed)
+        self._pool.start(task)
+
+    def _on_done(self, generation, key, result):
+        if generation != self._generation:
+            return
+        if key is None:
+            self.beginResetModel()
+            self._ids = [str(i) for i in reversed(result)]
+            self._visible = min(self.window_size, len(self._ids))
+            self.endResetModel()
+            self.countChanged.emit(len(self._ids))
+            return
+        ids = self._loading.pop(key, None)
+        first = key * self.window_size
+        if ids != self._ids[first:first + self.window_size]:
+            # 加载期间有邮件插入或删除，窗口内容已经变了，下次显示时重新加载
+            return
+        rows = {str(r['id']): r for r in result}
+        for email_id in ids:
+            # 服务器上已经不存在的邮件也占一行，避免反复加载
+            rows.setdefault(email_id, {'id': email_id, 'subject': '', 'sender': '', 'date': ''})
+        self._windows.put(key, rows)
+        last = min(first + self.window_size, self._visible) - 1
+        if last >= first:
+            self.dataChanged.emit(self.index(first), self.index(last))
+
+    def _on_failed(self, generation, key, message):
+        if generation != self._generation:
+            return
+        self._loading.pop(key, None)
+        self.loadFailed.emit(message)
+
+    def _row(self, row):
+        ''':return: 该行的头部字典，尚未加载时安排后台加载并返回 None'''
+        window = row // self.window_size
+        rows = self._windows.get(window)
+        if rows is not None and self._ids[row] in rows:
+            return rows[self._ids[row]]
+        # 未加载，或者插入、删除邮件后行发生了移动
+        if window not in self._loading:
+            ids = self._ids[window * self.window_size:(window + 1) * self.window_size]
+            self._loading[window] = ids
+            self._start(window, self._source.headers, ids)
+        return None
+
+    def add_ids(self, ids):
+        '''在列表最前面插入新邮件，ids 按从旧到新的顺序'''
+        ids = [str(i) for i in reversed(ids) if str(i) not in self._ids]
+        if not ids:
+            return
+        self.beginInsertRows(QModelIndex(), 0, len(ids) - 1)
+        self._ids[:0] = ids
+        self._visible += len(ids)
+        self.endInsertRows()
+        self.countChanged.emit(len(self._ids))
+
+    def remove_id(self, email_id):
+        '''删除一封邮件对应的行'''
+        email_id = str(email_id)
+        try:
+            row = self._ids.index(email_id)
+        except ValueError:
+            return
+        self._checked.discard(email_id)
+        if row < self._visible:
+            self.beginRemoveRows(QModelIndex(), row, row)
+            del self._ids[row]
+            self._visible -= 1
+            self.endRemoveRows()
+        else:
+            del self._ids[row]
+        self.countChanged.emit(len(self._ids))
+
+    # ---- QAbstractListModel 接口 ----
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else self._visible
+
+    def canFetchMore(self, parent=QModelIndex()):
+        return not parent.isValid() and self._visible < len(self._ids)
+
+    def fetchMore(self, parent=QModelIndex()):
+        if parent.isValid():
+            return
+        count = min(self.window_size, len(self._ids) - self._visible)
+        if count <= 0:
+            return
+        self.beginInsertRows(QModelIndex(), self._visible, self._visible + count - 1)
+        self._visible += count
+        self.endInsertRows()
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid() or index.row() >= self._visible:
+            return None
+        email_id = self._ids[index.row()]
+        if role == Qt.CheckStateRole:
+            return Qt.Checked if email_id in self._checked else Qt.Unchecked
+        if role not in (Qt.DisplayRole, Qt.ToolTipRole, Qt.UserRole):
+            return None
+        row = self._row(index.row())
+        if role == Qt.UserRole:
+            return row
+        if row is None:
+            return self.PLACEHOLDER
+        if role == Qt.ToolTipRole:
+            return row.get('date')
+        return f"{row['subject']} - {row['sender']}"
+
+    def setData(self, index, value, role=Qt.EditRole):
+        if role != Qt.CheckStateRole or not index.isValid():
+            return False
+        email_id = self._ids[index.row()]
+        if value == Qt.Checked:
+            self._checked.add(email_id)
+        else:
+            self._checked.discard(email_id)
+        self.dataChanged.emit(index, index, [Qt.CheckStateRole])
+        return True
+
+    def flags(self, index):
+        if not index.isValid():
+            return Qt.NoItemFlags
+        return Qt.ItemIsEnabled | Qt.ItemIsSelectable | Qt.ItemIsUserCheckable
+
+    def email_id(self, row):
+        ''':return: 该行邮件的 ID'''
+        return self._ids[row]
+
+    def checked_ids(self):
+        ''':return: 勾选的邮件 ID 列表'''
+        return [i for i in self._ids if i in self._checked]
@@ -0,0 +1,316 @@
+'''
+运行指标：记录每条 IMAP 命令的次数、收发字节数、耗时和重试次数，以及解析、导出等阶段的耗时和数量，
+可以导出为 Prometheus 文本格式或 JSON；也可以注册钩子，在每条命令完成时收到一条事件
+多个 EmailClient（例如连接池中的会话）可以共用同一个 Metrics，所有方法都是线程安全的
+'''
+import imaplib
+import json
+import os
+import threading
+import time
+
+# 命令耗时直方图的上界（秒）
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+class _CommandStats:
+    __slots__ = ('count', 'errors', 'retries', 'bytes_in', 'bytes_out', 'seconds', 'buckets')
+
+    def __init__(self, size):
+        self.count = 0
+        self.errors = 0
+        self.retries = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.seconds = 0.0
+        self.buckets = [0] * size
+
+
+class Metrics:
+    '''
+    指标收集器
+    :param buckets: 命令耗时直方图的上界（秒），按升序排列
+    '''
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self._lock = threading.Lock()
+        self._hooks = []
+        self.reset()
+
+    def reset(self):
+        '''清空所有计数，钩子保留'''
+        with self._lock:
+            self._commands = {}
+            # 阶段名 -> [次数, 数量, 字节数, 秒数]
+            self._stages = {}
+            self.bytes_in = 0
+            self.bytes_out = 0
+
+    def add_hook(self, hook):
+        '''
+        注册钩子 hook(event)，每条命令完成时在发送命令的线程中调用
+        event 为字典：command 命令名（UID 命令为 'UID FETCH' 等）、status（'OK'、'NO'、'BAD'，
+        连接中断时为 'ABORT'，其它异常为异常类名）、seconds 耗时、bytes_in 接收字节数、bytes_out 发送字节数
+        '''
+        self._hooks.append(hook)
+
+    def _stats(self, command):
+        stats = self._commands.get(command)
+        if stats is None:
+            stats = self._commands[command] = _CommandStats(len(self.buckets))
+        return stats
+
+    def command(self, command, status, seconds, bytes_in=0, bytes_out=0):
+        '''
+        记录一条已完成的命令
+        :param command: 命令名
+        :param status: 'OK'、'NO'、'BAD'、'ABORT' 或异常类名，除 OK 和 LOGOUT 的 BYE 外都计为错误
+        :param seconds: 耗时（秒）
+        :param bytes_in: 命令期间接收的字节数
+        :param bytes_out: 命令期间发送的字节数
+        '''
+        with self._lock:
+            stats = self._stats(command)
+            stats.count += 1
+            # imaplib 的 LOGOUT 正常结束时返回 BYE
+            if status not in ('OK', 'BYE'):
+                stats.errors += 1
+            stats.bytes_in += bytes_in
+            stats.bytes_out += bytes_out
+            stats.seconds += seconds
+            for i, bound in enumerate(self.buckets):
+                if seconds <= bound:
+                    stats.buckets[i] += 1
+                    break
+        if self._hooks:
+            event = {'command': command, 'status': status, 'seconds': seconds,
+                     'bytes_in': bytes_in, 'bytes_out': bytes_out}
+            for hook in self._hooks:
+                try:
+                    hook(event)
+                except Exception as e:
+                    print(f"指标钩子处理 {command} 失败: {e}")
+
+    def retry(self, command):
+        '''记录一次命令重试，例如服务器返回 [THROTTLED] 后重新发送的 FETCH'''
+        with self._lock:
+            self._stats(command).retries += 1
+
+    def transfer(self, bytes_in=0, bytes_out=0):
+        '''记录连接上收发的字节数，包括不属于任何命令的数据（问候语、IDLE 期间的推送）'''
+        with self._lock:
+            self.bytes_in += bytes_in
+            self.bytes_out += bytes_out
+
+    def stage(self, name, seconds, items=1, nbytes=0):
+        '''
+        记录一个处理阶段的耗时，例如 parse（解码邮件）、export（写入导出文件）
+        :param name: 阶段名
+        :param seconds: 耗时（秒）
+        :param items: 处理的邮件数量
+        :param nbytes: 处理的字节数
+        '''
+        with self._lock:
+            stats = self._stages.get(name)
+            if stats is None:
+                stats = self._stages[name] = [0, 0, 0, 0.0]
+            stats[0] += 1
+            stats[1] += items
+            stats[2] += nbytes
+            stats[3] += seconds
+
+    def timer(self, name, items=1):
+        '''
+        计时上下文管理器，退出时记录一次阶段耗时
+        with metrics.timer('parse', len(batch)): ...
+        '''
+        return _Timer(self, name, items)
+
+    def snapshot(self):
+        '''
+        :return: 当前所有指标的字典，可直接 JSON 序列化
+        '''
+        with self._lock:
+            commands = {}
+            for name, stats in sorted(self._commands.items()):
+                commands[name] = {
+                    'count': stats.count,
+                    'errors': stats.errors,
+                    'retries': stats.retries,
+                    'bytes_in': stats.bytes_in,
+                    'bytes_out': stats.bytes_out,
+                    'seconds': stats.seconds,
+                    'buckets': dict(zip(self.buckets, stats.buckets)),
+                }
+            stages = {}
+            for name, (count, items, nbytes, seconds) in sorted(self._stages.items()):
+                stages[name] = {
+                    'count': count,
+                    'items': items,
+                    'bytes': nbytes,
+                    'seconds': seconds,
+                    'items_per_second': items / seconds if seconds > 0 else 0.0,
+                }
+            return {'timestamp': time.time(), 'bytes_in': self.bytes_in, 'bytes_out': self.bytes_out,
+                    'commands': commands, 'stages': stages}
+
+    def to_json(self, indent=None):
+        ''':return: snapshot 的 JSON 字符串'''
+        return json.dumps(self.snapshot(), ensure_ascii=False, indent=indent)
+
+    def to_prometheus(self, prefix='imap_client'):
+        '''
+        :param prefix: 指标名前缀
+        :return: Prometheus 文本格式（0.0.4），可以写入 node_exporter 的 textfile 目录或由 HTTP 接口返回
+        '''
+        snap = self.snapshot()
+        lines = []
+
+        def metric(name, kind, help_text, samples):
+            lines.append(f"# HELP {prefix}_{name} {help_text}")
+            lines.append(f"# TYPE {prefix}_{name} {kind}")
+            for labels, value in samples:
+                lines.append(f"{prefix}_{name}{_labels(labels)} {_number(value)}")
+
+        commands = snap['commands']
+        metric('bytes_received_total', 'counter', '连接上接收的字节数', [({}, snap['bytes_in'])])
+        metric('bytes_sent_total', 'counter', '连接上发送的字节数', [({}, snap['bytes_out'])])
+        metric('commands_total', 'counter', 'IMAP 命令次数',
+               [({'command': c}, s['count']) for c, s in commands.items()])
+        metric('command_errors_total', 'counter', '没有返回 OK 的 IMAP 命令次数',
+               [({'command': c}, s['errors']) for c, s in commands.items()])
+        metric('command_retries_total', 'counter', 'IMAP 命令重试次数',
+               [({'command': c}, s['retries']) for c, s in commands.items()])
+        metric('command_received_bytes_total', 'counter', 'IMAP 命令期间接收的字节数',
+               [({'command': c}, s['bytes_in']) for c, s in commands.items()])
+        metric('command_sent_bytes_total', 'counter', 'IMAP 命令期间发送的字节数',
+               [({'command': c}, s['bytes_out']) for c, s in commands.items()])
+        samples = []
+        for c, s in commands.items():
+            # Prometheus 直方图的桶是累计的
+            total = 0
+            for bound, count in s['buckets'].items():
+                total += count
+                samples.append(({'command': c, 'le': _number(bound)}, total))
+            samples.append(({'command': c, 'le': '+Inf'}, s['count']))
+        lines.append(f"# HELP {prefix}_command_duration_seconds IMAP 命令耗时")
+        lines.append(f"# TYPE {prefix}_command_duration_seconds histogram")
+        for labels, value in samples:
+            lines.append(f"{prefix}_command_duration_seconds_bucket{_labels(labels)} {value}")
+        for c, s in commands.items():
+            lines.append(f"{prefix}_command_duration_seconds_sum{_labels({'command': c})} {_number(s['seconds'])}")
+            lines.append(f"{prefix}_command_duration_seconds_count{_labels({'command': c})} {s['count']}")
+
+        stages = snap['stages']
+        metric('stage_seconds_total', 'counter', '各处理阶段的耗时',
+               [({'stage': n}, s['seconds']) for n, s in stages.items()])
+        metric('stage_items_total', 'counter', '各处理阶段处理的邮件数量',
+               [({'stage': n}, s['items']) for n, s in stages.items()])
+        metric('stage_bytes_total', 'counter', '各处理阶段处理的字节数',
+               [({'stage': n}, s['bytes']) for n, s in stages.items()])
+        return '\n'.join(lines) + '\n'
+
+    def write(self, path, fmt='prometheus'):
+        '''
+        把指标写入文件，先写临时文件再替换，读取方不会读到写了一半的内容
+        :param path: 文件路径
+        :param fmt: 'prometheus' 或 'json'
+        '''
+        if fmt not in ('prometheus', 'json'):
+            raise ValueError(f"未知的指标格式: {fmt}")
+        text = self.to_prometheus() if fmt == 'prometheus' else self.to_json(indent=2)
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(text)
+        os.replace(tmp_path, path)
+
+
+class _Timer:
+    __slots__ = ('metrics', 'name', 'items', 'start')
+
+    def __init__(self, metrics, name, items):
+        self.metrics = metrics
+        self.name = name
+        self.items = items
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.metrics.stage(self.name, time.perf_counter() - self.start, self.items)
+        return False
+
+
+def _labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{k}="{_escape(str(v))}"' for k, v in labels.items()) + '}'
+
+
+def _escape(value):
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _number(value):
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+def instrument(conn, metrics):
+    '''
+    给一个 imaplib 连接加上指标记录：替换实例上的 send、read、readline 统计收发字节，
+    替换 _simple_command 记录每条命令（imaplib 的 login、select、fetch、uid 等方法都经过它）
+    :param conn: imaplib.IMAP4 对象
+    :param metrics: Metrics 对象
+    :return: conn
+    '''
+    # [接收字节数, 发送字节数]，一个连接同一时间只执行一条命令，命令前后的差值就是该命令的流量
+    counts = [0, 0]
+    send, read, readline, simple_command = conn.send, conn.read, conn.readline, conn._simple_command
+
+    def _send(data):
+        counts[1] += len(data)
+        metrics.transfer(bytes_out=len(data))
+        return send(data)
+
+    def _read(size):
+        data = read(size)
+        counts[0] += len(data)
+        metrics.transfer(bytes_in=len(data))
+        return data
+
+    def _readline():
+        line = readline()
+        counts[0] += len(line)
+        metrics.transfer(bytes_in=len(line))
+        return line
+
+    def _simple_command(name, *args):
+        command = f"UID {args[0]}".upper() if name == 'UID' and args else name
+        bytes_in, bytes_out = counts
+        status = 'OK'
+        start = time.perf_counter()
+        try:
+            typ, dat = simple_command(name, *args)
+            status = typ
+            return typ, dat
+        except imaplib.IMAP4.abort:
+            status = 'ABORT'
+            raise
+        except imaplib.IMAP4.error:
+            # imaplib 把 BAD 响应作为 error 抛出
+            status = 'BAD'
+            raise
+        except Exception as e:
+            status = type(e).__name__
+            raise
+        finally:
+            metrics.command(command, status, time.perf_counter() - start,
+                            counts[0] - bytes_in, counts[1] - bytes_out)
+
+    conn.send = _send
+    conn.read = _read
+    conn.readline = _readline
+    conn._simple_command = _simple_command
+    return conn
@@ -0,0 +1,118 @@
+'''
+下载与解析分离的流水线：下载线程把 FETCH 得到的原始字节放入有界队列，
+进程池把原始字节解析成邮件对象，两个阶段同时进行并利用多个 CPU 核心
+'''
+import os
+import queue
+import threading
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from imapparse import chunked
+
+_DONE = object()
+
+# 工作进程中复用的解析器，只用于调用 _parse_message，不会连接服务器
+_parser = None
+
+
+def _parse_batch(items, uidvalidity):
+    '''
+    在工作进程中解析一组邮件
+    :param items: [(邮件ID, 原始字节, UID), ...]
+    :return: 已解码的邮件对象列表
+    '''
+    global _parser
+    if _parser is None:
+        from to163 import EmailClient
+        _parser = EmailClient()
+    _parser.uidvalidity = uidvalidity
+    # 邮件对象默认延迟解码，在工作进程中解码完毕再传回，原始字节不必再经过进程间通信
+    return [_parser._parse_message(email_id, raw, uid).decode() for email_id, raw, uid in items]
+
+
+class _Error:
+    '''下载线程中的异常，交给消费者重新抛出'''
+
+    def __init__(self, exc):
+        self.exc = exc
+
+
+class ParsePipeline:
+    '''
+    解析流水线
+    :param workers: 解析进程数，为 None 时使用 CPU 核心数
+    :param chunk_size: 每个解析任务包含的邮件数量，一批 FETCH 会被切成多个任务分给不同进程
+    :param max_queued: 下载队列中最多缓存的 FETCH 批次数，队列满时下载线程等待解析追上来
+    :param max_in_flight: 同时提交给进程池的解析任务数，为 None 时为进程数的两倍
+    '''
+
+    def __init__(self, workers=None, chunk_size=50, max_queued=2, max_in_flight=None):
+        self.workers = workers or os.cpu_count() or 1
+        self.chunk_size = chunk_size
+        self.max_queued = max_queued
+        self.max_in_flight = max_in_flight or self.workers * 2
+
+    def _download(self, client, email_ids, batch_size, uid, strict, raw_queue, stop):
+        '''下载线程：逐批获取原始字节放入队列，stop 被设置后尽快退出'''
+        try:
+            for batch in client._fetch_raw(email_ids, batch_size, uid, strict):
+                if not self._put(raw_queue, batch, stop):
+                    return
+        except Exception as e:
+            self._put(raw_queue, _Error(e), stop)
+            return
+        self._put(raw_queue, _DONE, stop)
+
+    @staticmethod
+    def _put(raw_queue, item, stop):
+        while not stop.is_set():
+            try:
+                raw_queue.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def run(self, client, email_ids, batch_size=500, uid=True, strict=False):
+        '''
+        下载并解析邮件
+        :param client: 已登录并选择了文件夹的 EmailClient，运行期间由下载线程独占
+        :param email_ids: 邮件ID列表
+        :param batch_size: 每条 FETCH 命令包含的邮件数量
+        :param uid: 为 True 时 email_ids 是 UID
+        :param strict: 为 True 时某一批 FETCH 失败就抛出异常，见 EmailClient.fetch_emails
+        :return: 生成器，按下载顺序产出邮件对象
+        '''
+        raw_queue = queue.Queue(maxsize=self.max_queued)
+        stop = threading.Event()
+        downloader = threading.Thread(target=self._download, daemon=True,
+                                      args=(client, email_ids, batch_size, uid, strict, raw_queue, stop))
+        uidvalidity = client.uidvalidity
+        pending = deque()
+        chunks = deque()
+        done = False
+        with ProcessPoolExecutor(max_workers=self.workers) as executor:
+            downloader.start()
+            try:
+                while True:
+                    # 解析任务未满时从下载队列取数据提交，满了就先等最早的任务完成
+                    while not done and len(pending) < self.max_in_flight:
+                        if not chunks:
+                            batch = raw_queue.get()
+                            if batch is _DONE:
+                                done = True
+                                break
+                            if isinstance(batch, _Error):
+                                raise batch.exc
+                            chunks.extend(chunked(batch, self.chunk_size))
+                            continue
+                        pending.append(executor.submit(_parse_batch, chunks.popleft(), uidvalidity))
+                    if not pending:
+                        return
+                    yield from pending.popleft().result()
+            finally:
+                stop.set()
+                for future in pending:
+                    future.cancel()
+                downloader.join()
@@ -0,0 +1,271 @@
+'''
+EmailClient 连接池：同一账号登录多个会话，配合线程池并行导出
+'''
+import imaplib
+import logging
+import os
+import queue
+import shutil
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+from exporter import Exporter
+from imapparse import chunked
+from to163 import EmailClient
+
+
+class ConnectionPool:
+    '''
+    EmailClient 连接池
+    每个会话都通过 EmailClient.login 登录（包括发送 ID 命令），按需创建，用完放回池中
+
+    :param user: 邮箱账号
+    :param password: 邮箱密码或授权码
+    :param size: 连接池大小，同时也是并行任务的线程数
+    :param max_per_account: 同一账号在本进程内允许的最大连接数，所有连接池共享，避免超过服务商的限制
+    :param client_kwargs: 传给 EmailClient 的其它参数，例如 host、port、use_ssl；
+                          quiet 为 True 时连接池自身也不打印，提示和错误分别记录为 logging.info 和 logging.error
+    '''
+
+    # 账号 -> 信号量，同一进程内的所有连接池共用
+    _account_slots = {}
+    _account_lock = threading.Lock()
+
+    def __init__(self, user, password, size=4, max_per_account=4, **client_kwargs):
+        self.user = user
+        self.password = password
+        self.size = max(1, min(size, max_per_account))
+        self.client_kwargs = client_kwargs
+        self.quiet = client_kwargs.get('quiet', False)
+        with self._account_lock:
+            if user not in self._account_slots:
+                self._account_slots[user] = threading.BoundedSemaphore(max_per_account)
+            self._slots = self._account_slots[user]
+        self._idle = queue.LifoQueue()
+        self._created = 0
+        self._lock = threading.Lock()
+        self._clients = []
+
+    def _info(self, message):
+        '''打印提示信息，quiet 模式下只记录到日志'''
+        if self.quiet:
+            logging.info(message)
+        else:
+            print(message)
+
+    def _error(self, message):
+        '''打印错误信息，quiet 模式下记录为 logging.error'''
+        if self.quiet:
+            logging.error(message)
+        else:
+            print(message)
+
+    def _connect(self):
+        '''占用一个账号连接名额并登录新会话，失败时返回 None'''
+        if not self._slots.acquire(timeout=30):
+            self._error(f"账号 {self.user} 的连接数已达上限。")
+            return None
+        client = EmailClient(self.user, self.password, **self.client_kwargs)
+        if not client.login():
+            self._slots.release()
+            return None
+        with self._lock:
+            self._clients.append(client)
+        return client
+
+    def acquire(self, timeout=None):
+        '''
+        取出一个已登录的连接，池未满时新建连接，否则等待其它任务归还
+        :return: EmailClient 对象，登录失败时返回 None
+        '''
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock:
+            create = self._created < self.size
+            if create:
+                self._created += 1
+        if create:
+            client = self._connect()
+            if client is None:
+                with self._lock:
+                    self._created -= 1
+            return client
+        try:
+            return self._idle.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def release(self, client):
+        '''归还连接'''
+        if client is not None:
+            self._idle.put(client)
+
+    @contextmanager
+    def connection(self):
+        '''with pool.connection() as client: ...'''
+        client = self.acquire()
+        try:
+            yield client
+        finally:
+            self.release(client)
+
+    def map(self, func, items):
+        '''
+        在线程池中并行执行 func(client, item)，每个任务独占一个连接
+        :return: 结果列表，顺序与 items 一致；连接失败的任务结果为 None
+        '''
+        def run(item):
+            with self.connection() as client:
+                if client is None:
+                    return None
+                return func(client, item)
+
+        with ThreadPoolExecutor(max_workers=self.size) as executor:
+            return list(executor.map(run, items))
+
+    def save_folders(self, folders, save_path, mode='text', fmt='json'):
+        '''
+        并行导出多个文件夹，每个文件夹由一个连接负责
+        :return: {文件夹名称: 保存的邮件数量}
+        '''
+        counts = self.map(lambda client, folder: client.save_emails_to_local(folder, save_path, mode, fmt), folders)
+        return {folder: count or 0 for folder, count in zip(folders, counts)}
+
+    def save_folder(self, folder, save_path, mode='text', batch_size=500, fmt='json'):
+        '''
+        把一个大文件夹按 UID 区间切分，由多个连接并行导出，最后按 UID 顺序合并为一个文件
+        :param folder: 邮箱文件夹名称
+        :param save_path: 保存邮件的本地路径
+        :param mode: 获取模式
+        :param batch_size: 每条 FETCH 命令包含的邮件数量
+        :param fmt: 'json' 或 'ndjson'
+        :return: 成功保存的邮件数量；有区间失败或导出的邮件数少于该区间的 UID 数，
+                 重试一次后仍然如此时不生成文件，返回 0
+        '''
+        with self.connection() as client:
+            if client is None or not client.select_folder(folder):
+                return 0
+            uids = client._uid_search('ALL')
+        if uids is None:
+            self._error(f"搜索文件夹 {folder} 中的邮件失败。")
+            return 0
+        if not uids:
+            self._info(f"在文件夹 {folder} 中未找到邮件。")
+            return 0
+
+        if not os.path.exists(save_path):
+            os.makedirs(save_path)
+        file_path = os.path.join(save_path, f"{folder}.{fmt}")
+        share = (len(uids) + self.size - 1) // self.size
+        ranges = list(chunked(uids, max(share, batch_size)))
+        parts = [f"{file_path}.part{i}" for i in range(len(ranges))]
+
+        def export(client, index):
+            if not client.select_folder(folder):
+                return None
+            emails = client.fetch_emails(ranges[index], batch_size, mode, uid=True, strict=True)
+            records = ((e.uid, client._email_record(e)) for e in emails if e)
+            try:
+                count = Exporter(parts[index], fmt, checkpoint_every=0).export(records)
+            except imaplib.IMAP4.error as e:
+                self._error(f"导出文件夹 {folder} 的第 {index + 1} 个 UID 区间失败: {e}")
+                return None
+            # 服务器少返回了邮件（或导出期间邮件被删除）时分片不完整，同样按失败处理
+            if count < len(ranges[index]):
+                self._error(f"文件夹 {folder} 的第 {index + 1} 个 UID 区间只导出了 {count}/{len(ranges[index])} 封邮件。")
+                return None
+            return count
+
+        start_time = time.monotonic()
+        counts = self.map(export, range(len(ranges)))
+        # 失败或不完整的区间重试一次，仍然失败时放弃导出，合并结果中不能缺少一段邮件
+        failed = [i for i, c in enumerate(counts) if c is None]
+        for index, count in zip(failed, self.map(export, failed)):
+            counts[index] = count
+        if any(c is None for c in counts):
+            self._error(f"文件夹 {folder} 有 {counts.count(None)} 个 UID 区间导出失败，放弃本次导出。")
+            for part in parts:
+                for path in (part, part + '.part'):
+                    if os.path.exists(path):
+                        os.remove(path)
+            return 0
+        saved_count = sum(counts)
+        if fmt == 'json':
+            _merge_json_arrays(parts, file_path)
+        else:
+            _concat_files(parts, file_path)
+        elapsed = time.monotonic() - start_time
+        speed = saved_count / elapsed if elapsed > 0 else 0.0
+        self._info(f"共保存 {saved_count} 封邮件到 {file_path}，耗时 {elapsed:.1f} 秒，平均 {speed:.1f} 封/秒。")
+        return saved_count
+
+    def close(self):
+        '''退出所有连接并释放账号名额'''
+        with self._lock:
+            clients, self._clients = self._clients, []
+            self._created = 0
+        self._idle = queue.LifoQueue()
+        for client in clients:
+            try:
+                client.logout()
+            except Exception as e:
+                self._error(f"退出登录失败: {e}")
+            self._slots.release()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def _merge_json_arrays(parts, file_path):
+    '''把多个 JSON 数组文件按顺序拼接成一个数组，并删除分片文件'''
+    with open(file_path, 'wb') as out:
+        out.write(b'[')
+        first = True
+        for part in parts:
+            if not os.path.exists(part):
+                continue
+            size = os.path.getsize(part)
+            if size > 2:
+                if not first:
+                    out.write(b',')
+                first = False
+                with open(part, 'rb') as f:
+                    f.seek(1)
+                    shutil.copyfileobj(_Limited(f, size - 2), out)
+            os.remove(part)
+        out.write(b']')
+
+
+def _concat_files(parts, file_path):
+    '''按顺序拼接 NDJSON 分片文件，并删除分片文件'''
+    with open(file_path, 'wb') as out:
+        for part in parts:
+            if not os.path.exists(part):
+                continue
+            with open(part, 'rb') as f:
+                shutil.copyfileobj(f, out)
+            os.remove(part)
+
+
+class _Limited:
+    '''只读取前 n 个字节的文件包装，用于去掉分片末尾的右中括号'''
+
+    def __init__(self, f, n):
+        self.f = f
+        self.remaining = n
+
+    def read(self, size=-1):
+        if self.remaining <= 0:
+            return b''
+        if size < 0 or size > self.remaining:
+            size = self.remaining
+        data = self.f.read(size)
+        self.remaining -= len(data)
+        return data
@@ -7,22 +7,9 @@ mail = EmailClient(user, pwd)
 mail.login()
 # mail.select_folder('inbox')
 # mail.save_emails_to_local('inbox','./')
-mail.select_folder('Test')
-mailList = mail.search_emails('All')
-dateDict = {}
-saveList = []
-delList = []
-for i in mailList:
-    tmp = mail.fetch_email(i)
-    print(tmp.date)
-    if tmp.date not in dateDict:
-        dateDict[tmp.date] = tmp.email_id
-        saveList.append(tmp.email_id)
-    else:
-        delList.append(tmp.email_id)
-print(saveList)
-print(delList)
-for i in delList:
-    mail.delete_email(i)
+saveList, delList = mail.find_duplicates('Test')
+print(sorted(saveList, key=int))
+print(sorted(delList, key=int))
+mail.delete_emails(delList)
 # mail.fetch_email()
 mail.logout()
@@ -0,0 +1,32 @@
+'''
+测试共用的工具：在进程内的桩服务器上建立邮箱和已登录的客户端，不访问网络
+'''
+from backends import FakeBackend
+from fakeimap import Mailbox, make_message
+from to163 import EmailClient
+
+
+def make_mailbox(count, folder='INBOX', mailbox=None):
+    '''
+    :return: 包含 count 封测试邮件的 fakeimap.Mailbox
+    '''
+    mailbox = mailbox or Mailbox()
+    mailbox.create(folder)
+    for index in range(count):
+        mailbox.append(folder, make_message(index))
+    return mailbox
+
+
+def connect(backend, **kwargs):
+    '''
+    :param backend: FakeBackend 或 fakeimap.Mailbox
+    :param kwargs: 传给 EmailClient 的其它参数
+    :return: 已登录的 EmailClient
+    '''
+    if isinstance(backend, Mailbox):
+        backend = FakeBackend(backend)
+    kwargs.setdefault('quiet', True)
+    client = EmailClient('test@example.com', 'secret', backend=backend, **kwargs)
+    if not client.login():
+        raise RuntimeError('无法登录桩服务器')
+    return client
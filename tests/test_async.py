@@ -0,0 +1,62 @@
+import unittest
+
+from asyncclient import AsyncEmailClient
+from fakeimap import FakeImapServer
+from tests.support import make_mailbox
+
+
+class AsyncEmailClientTest(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        self.mailbox = make_mailbox(12)
+        self.mailbox.create('Trash')
+        self.server = FakeImapServer(self.mailbox, capabilities=('IMAP4rev1', 'ID', 'MOVE'))
+        host, port = self.server.start()
+        self.client = AsyncEmailClient('test@example.com', 'secret', host, port, use_ssl=False,
+                                       pipeline=3, quiet=True)
+        self.assertIs(await self.client.login(), self.client)
+        self.assertTrue(await self.client.select_folder('INBOX'))
+
+    async def asyncTearDown(self):
+        await self.client.logout()
+        self.server.stop()
+
+    async def _fetch(self, email_ids, **kwargs):
+        return [e async for e in self.client.fetch_emails(email_ids, **kwargs)]
+
+    async def test_pipelined_fetch_keeps_order(self):
+        self.assertEqual(self.client.exists, 12)
+        email_ids = await self.client.search_emails('ALL')
+        self.assertEqual(email_ids, [str(uid) for uid in range(1, 13)])
+        emails = await self._fetch(email_ids, batch_size=2)
+        self.assertEqual([e.email_id for e in emails], email_ids)
+        self.assertEqual([e.subject for e in emails], [f"测试邮件 {i}" for i in range(12)])
+        self.assertEqual(emails[3].content, '这是第 3 封测试邮件的正文。\n' * 5)
+
+    async def test_partial_modes(self):
+        text = await self._fetch(['2', '3'], mode='text')
+        self.assertEqual([e.content for e in text], [f"这是第 {i} 封测试邮件的正文。\n" * 5 for i in (1, 2)])
+        headers = await self._fetch(['2', '3'], mode='headers')
+        self.assertEqual([(e.subject, e.content) for e in headers], [('测试邮件 1', ''), ('测试邮件 2', '')])
+
+    async def test_failed_batch_is_skipped(self):
+        self.server.fail('FETCH')
+        emails = await self._fetch([str(uid) for uid in range(1, 7)], batch_size=2)
+        self.assertEqual([e.email_id for e in emails], ['3', '4', '5', '6'])
+
+    async def test_delete_moves_to_trash(self):
+        self.assertTrue(await self.client.delete_emails(['2', '5']))
+        self.assertEqual([m.uid for m in self.mailbox.folders['INBOX'].messages], [1, 3, 4] + list(range(6, 13)))
+        self.assertEqual(len(self.mailbox.folders['Trash'].messages), 2)
+
+    async def test_plain_expunge_refused_when_other_messages_are_deleted(self):
+        inbox = self.mailbox.folders['INBOX']
+        inbox.messages[0].flags.add('\\Deleted')
+        self.assertFalse(await self.client.delete_emails(['2', '5'], trash=None))
+        self.assertEqual(len(inbox.messages), 12)
+        self.assertTrue(await self.client.delete_emails(['2', '5'], trash=None, expunge_all=True))
+        self.assertEqual([m.uid for m in inbox.messages], [3, 4] + list(range(6, 13)))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,62 @@
+import base64
+import json
+import os
+import quopri
+import shutil
+import tempfile
+import unittest
+
+from attachments import Base64Decoder, QuotedPrintableDecoder, make_decoder
+from bench.mailgen import MailGenerator
+from tests.support import connect
+
+
+def _decode_in_chunks(decoder, data, size):
+    out = b''
+    for start in range(0, len(data), size):
+        out += decoder.feed(data[start:start + size])
+    return out + decoder.finish()
+
+
+class IncrementalDecoderTest(unittest.TestCase):
+    payload = bytes(range(256)) * 3 + '附件内容 = 测试\n'.encode('utf-8') * 20
+
+    def test_base64_every_chunk_size(self):
+        encoded = base64.encodebytes(self.payload)
+        for size in range(1, 80):
+            self.assertEqual(_decode_in_chunks(Base64Decoder(), encoded, size), self.payload, size)
+
+    def test_base64_without_padding(self):
+        encoded = base64.b64encode(b'abcde').rstrip(b'=')
+        self.assertEqual(_decode_in_chunks(Base64Decoder(), encoded, 3), b'abcde')
+
+    def test_quoted_printable_every_chunk_size(self):
+        encoded = quopri.encodestring(self.payload)
+        for size in range(1, 80):
+            self.assertEqual(_decode_in_chunks(QuotedPrintableDecoder(), encoded, size), self.payload, size)
+
+    def test_make_decoder(self):
+        self.assertIsInstance(make_decoder('base64'), Base64Decoder)
+        self.assertEqual(_decode_in_chunks(make_decoder('8bit'), b'raw bytes', 4), b'raw bytes')
+
+
+class AttachmentExportTest(unittest.TestCase):
+
+    def test_failed_download_is_marked(self):
+        mailbox = MailGenerator(mix={'attachment': 1}, attachment_kb=4, duplicates=0).mailbox(4)
+        client = connect(mailbox)
+        download = client._download_part
+        client._download_part = lambda email_id, *args: None if email_id == '3' else download(email_id, *args)
+        save_path = tempfile.mkdtemp()
+        try:
+            self.assertEqual(client.save_emails_to_local('INBOX', save_path,
+                                                         attachment_dir=os.path.join(save_path, 'files')), 4)
+            with open(os.path.join(save_path, 'INBOX.json'), encoding='utf-8') as f:
+                records = {r['email_id']: r['attachments'] for r in json.load(f)}
+        finally:
+            client.logout()
+            shutil.rmtree(save_path)
+        self.assertIsNone(records['3'])
+        for email_id in ('1', '2', '4'):
+            self.assertEqual(len(records[email_id]), 1)
+            self.assertTrue(records[email_id][0]['path'].startswith('files'))
@@ -0,0 +1,100 @@
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+from backends import LocalBackend
+from bench.mailgen import MailGenerator
+from fakeimap import make_message
+from tests.support import connect
+
+
+def _record(email):
+    return email.subject, email.sender, email.date, email.content
+
+
+class LocalBackendTest(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.dir)
+
+    def _connect(self, backend):
+        client = connect(backend)
+        self.addCleanup(client.logout)
+        return client
+
+    def _export(self, client, name):
+        path = os.path.join(self.dir, name)
+        self.assertEqual(client.save_emails_to_local('INBOX', path, mode='full'), 40)
+        with open(os.path.join(path, 'INBOX.json'), encoding='utf-8') as f:
+            return json.load(f)
+
+    def test_mbox_matches_stub_server(self):
+        generator = MailGenerator(seed=5, body_kb=1, attachment_kb=2)
+        path = os.path.join(self.dir, 'archive.mbox')
+        generator.write_mbox(path, 40)
+        local = self._connect(LocalBackend(path))
+        server = self._connect(generator.mailbox(40))
+        for client in (local, server):
+            self.assertTrue(client.select_folder('INBOX'))
+        ids = server.search_emails('ALL')
+        self.assertEqual(local.search_emails('ALL'), ids)
+        self.assertEqual(local.search_emails('UNSEEN'), ids)
+        for email_id in ids:
+            self.assertEqual(_record(local.fetch_email(email_id)), _record(server.fetch_email(email_id)))
+        self.assertEqual(self._export(local, 'local'), self._export(server, 'server'))
+
+    def test_mbox_escapes_and_status(self):
+        path = os.path.join(self.dir, 'inbox.mbox')
+        with open(path, 'wb') as f:
+            f.write(b'From a@example.com Mon Jan  1 00:00:00 2024\n'
+                    b'Subject: one\nStatus: RO\nX-Status: F\n\n>From the start\n>>From quoted\n\n'
+                    b'From b@example.com Mon Jan  1 00:01:00 2024\n'
+                    b'Subject: two\n\nbody\n')
+        client = self._connect(LocalBackend(path))
+        self.assertTrue(client.select_folder('INBOX'))
+        self.assertEqual(client.search_emails('ALL'), ['1', '2'])
+        self.assertEqual(client.search_emails('SEEN FLAGGED'), ['1'])
+        self.assertEqual(client.search_emails('UNSEEN'), ['2'])
+        self.assertEqual(client.fetch_email('1').content, 'From the start\n>From quoted\n')
+        self.assertEqual(client.fetch_email('2').content, 'body\n')
+
+    def _maildir(self, path, names):
+        for sub in ('cur', 'new', 'tmp'):
+            os.makedirs(os.path.join(path, sub))
+        for index, name in enumerate(names):
+            with open(os.path.join(path, name), 'wb') as f:
+                f.write(make_message(index))
+
+    def test_maildir_folders_and_flags(self):
+        self._maildir(self.dir, ['cur/1.host:2,S', 'cur/2.host:2,FS', 'new/3.host'])
+        self._maildir(os.path.join(self.dir, '.Sent'), ['cur/1.host:2,S'])
+        client = self._connect(LocalBackend(self.dir))
+        self.assertEqual(sorted(client.list_folders()), ['INBOX', 'Sent'])
+        self.assertTrue(client.select_folder('INBOX'))
+        self.assertEqual(client.search_emails('UNSEEN'), ['3'])
+        self.assertEqual(client.search_emails('FLAGGED'), ['2'])
+        self.assertEqual(client.fetch_email('3').subject, '测试邮件 2')
+        self.assertTrue(client.select_folder('Sent'))
+        self.assertEqual(client.search_emails('ALL'), ['1'])
+
+    def test_changes_are_not_written_back(self):
+        path = os.path.join(self.dir, 'archive.mbox')
+        MailGenerator(seed=2, body_kb=1, attachment_kb=1).write_mbox(path, 5)
+        with open(path, 'rb') as f:
+            before = f.read()
+        client = self._connect(LocalBackend(path))
+        self.assertTrue(client.select_folder('INBOX'))
+        self.assertTrue(client.delete_emails(['2', '3'], trash=None))
+        self.assertEqual(client.search_emails('ALL'), ['1', '4', '5'])
+        with open(path, 'rb') as f:
+            self.assertEqual(f.read(), before)
+        again = self._connect(LocalBackend(path))
+        self.assertTrue(again.select_folder('INBOX'))
+        self.assertEqual(len(again.search_emails('ALL')), 5)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,81 @@
+import unittest
+
+from backends import FakeBackend
+from tests.support import connect, make_mailbox
+
+
+class MoveDeleteTest(unittest.TestCase):
+
+    def _run(self, capabilities, action):
+        backend = FakeBackend(make_mailbox(10), capabilities=('IMAP4rev1', 'ID') + capabilities)
+        backend.mailbox.create('Trash')
+        client = connect(backend)
+        self.assertTrue(client.select_folder('INBOX'))
+        self.assertTrue(action(client, ['2', '3', '4', '8']))
+        client.logout()
+        folders = backend.mailbox.folders
+        return [m.uid for m in folders['INBOX'].messages], len(folders['Trash'].messages)
+
+    def test_move_with_and_without_move_extension(self):
+        for capabilities in (('MOVE',), (), ('UIDPLUS',)):
+            inbox, trash = self._run(capabilities, lambda c, ids: c.move_emails(ids, 'Trash'))
+            self.assertEqual(inbox, [1, 5, 6, 7, 9, 10], capabilities)
+            self.assertEqual(trash, 4, capabilities)
+
+    def test_delete_to_trash_and_expunge(self):
+        for capabilities in (('MOVE',), ()):
+            inbox, trash = self._run(capabilities, lambda c, ids: c.delete_emails(ids))
+            self.assertEqual(inbox, [1, 5, 6, 7, 9, 10], capabilities)
+            self.assertEqual(trash, 4, capabilities)
+        for capabilities in (('UIDPLUS',), ()):
+            inbox, trash = self._run(capabilities, lambda c, ids: c.delete_emails(ids, trash=None))
+            self.assertEqual(inbox, [1, 5, 6, 7, 9, 10], capabilities)
+            self.assertEqual(trash, 0, capabilities)
+
+    def test_plain_expunge_refused_when_other_messages_are_deleted(self):
+        for capabilities in ((), ('UIDPLUS',)):
+            backend = FakeBackend(make_mailbox(10), capabilities=('IMAP4rev1', 'ID') + capabilities)
+            backend.mailbox.create('Trash')
+            backend.mailbox.folders['INBOX'].messages[5].flags.add('\\Deleted')
+            client = connect(backend)
+            self.assertTrue(client.select_folder('INBOX'))
+            inbox = backend.mailbox.folders['INBOX']
+            if capabilities:
+                # UID EXPUNGE 只清除指定的邮件
+                self.assertTrue(client.delete_emails(['2', '3'], trash=None))
+                self.assertEqual([m.uid for m in inbox.messages], [1, 4, 5, 6, 7, 8, 9, 10])
+            else:
+                self.assertFalse(client.delete_emails(['2', '3'], trash=None))
+                self.assertFalse(client.move_emails(['2', '3'], 'Trash'))
+                self.assertEqual(len(inbox.messages), 10)
+                self.assertEqual(len(backend.mailbox.folders['Trash'].messages), 0)
+                self.assertEqual(sum('\\Deleted' in m.flags for m in inbox.messages), 1)
+                # 明确允许时连带清除另一封已标记删除的邮件
+                self.assertTrue(client.delete_emails(['2', '3'], trash=None, expunge_all=True))
+                self.assertEqual([m.uid for m in inbox.messages], [1, 4, 5, 7, 8, 9, 10])
+            client.logout()
+
+    def test_batches_by_sequence_number(self):
+        # 序号模式下 MOVE 会立即清除邮件，分批时后面批次的序号不能受前面批次影响
+        backend = FakeBackend(make_mailbox(10), capabilities=('IMAP4rev1', 'ID', 'MOVE'))
+        backend.mailbox.create('Trash')
+        client = connect(backend, use_uid=False)
+        self.assertTrue(client.select_folder('INBOX'))
+        self.assertTrue(client.move_emails(['2', '3', '4', '8'], 'Trash', batch_size=2))
+        client.logout()
+        self.assertEqual([m.uid for m in backend.mailbox.folders['INBOX'].messages], [1, 5, 6, 7, 9, 10])
+        self.assertEqual(client.metrics.snapshot()['commands']['MOVE']['count'], 2)
+
+    def test_copy_compacts_ids(self):
+        backend = FakeBackend(make_mailbox(10))
+        backend.mailbox.create('Archive')
+        client = connect(backend)
+        self.assertTrue(client.select_folder('INBOX'))
+        self.assertTrue(client.copy_emails([str(uid) for uid in range(1, 11)], 'Archive'))
+        client.logout()
+        self.assertEqual(len(backend.mailbox.folders['Archive'].messages), 10)
+        self.assertEqual(client.metrics.snapshot()['commands']['UID COPY']['count'], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
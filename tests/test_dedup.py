@@ -0,0 +1,60 @@
+import unittest
+
+import dedup
+from backends import FakeBackend
+from fakeimap import make_message
+from tests.support import connect, make_mailbox
+
+
+class MessageKeyTest(unittest.TestCase):
+
+    def test_normalizes_date_and_address(self):
+        a = (b'Message-ID: <1@example.com>\r\nDate: Mon, 01 Jan 2024 08:00:00 +0800\r\n'
+             b'From: Alice <Alice@Example.com>\r\nSubject: hello\r\n  world\r\n\r\n')
+        b = (b'Message-ID: <1@example.com>\r\nDate: Mon, 01 Jan 2024 00:00:00 +0000\r\n'
+             b'From: alice@example.com\r\nSubject: hello world\r\n\r\n')
+        self.assertEqual(dedup.message_key(a, 100), dedup.message_key(b, 100))
+        self.assertNotEqual(dedup.message_key(a, 100), dedup.message_key(a, 101))
+        self.assertEqual(len(dedup.message_key(None, 0)), 16)
+
+    def test_index_keeps_first(self):
+        index = dedup.DuplicateIndex()
+        self.assertIsNone(index.add('1', b'k'))
+        self.assertEqual(index.add('5', b'k'), '1')
+        self.assertIsNone(index.add('6', b'x'))
+        self.assertEqual(index.delete_ids(), {'5'})
+        self.assertEqual(index.seen, 3)
+
+
+class FindDuplicatesTest(unittest.TestCase):
+
+    def setUp(self):
+        self.backend = FakeBackend(make_mailbox(10))
+        inbox = self.backend.mailbox
+        inbox.append('INBOX', make_message(2))
+        inbox.append('INBOX', make_message(5))
+        # 头部和大小都相同、正文不同的邮件，只有复核正文时才能区分
+        inbox.append('INBOX', make_message(20, body='正文甲\n'))
+        inbox.append('INBOX', make_message(20, body='正文乙\n'))
+        self.client = connect(self.backend)
+
+    def tearDown(self):
+        self.client.logout()
+
+    def test_header_fingerprint(self):
+        keep, delete = self.client.find_duplicates('INBOX', batch_size=4)
+        self.assertEqual(delete, {'11', '12', '14'})
+        self.assertEqual(keep, {str(uid) for uid in range(1, 15)} - delete)
+
+    def test_verify_content(self):
+        keep, delete = self.client.find_duplicates('INBOX', verify=True)
+        self.assertEqual(delete, {'11', '12'})
+        self.assertIn('14', keep)
+
+    def test_failed_batch_returns_nothing(self):
+        self.backend.server.fail('FETCH')
+        self.assertEqual(self.client.find_duplicates('INBOX', batch_size=4), (set(), set()))
+
+
+if __name__ == '__main__':
+    unittest.main()
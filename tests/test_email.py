@@ -0,0 +1,70 @@
+import email
+import gc
+import pickle
+import unittest
+
+from bench.mailgen import MailGenerator
+from fakeimap import make_message
+from to163 import EmailClient
+
+Email = EmailClient.Email
+
+
+def _parsed(raw):
+    ''':return: 用 email 解析器得到的 (主题, 发件人, 日期, 正文)，作为对照'''
+    msg = email.message_from_bytes(raw)
+    record = Email(0, msg['Subject'], msg['From'], msg['Date'], None)
+    # 保存整封原始字节时 content 由 email 解析
+    record._body = raw
+    record._pending |= Email._CONTENT
+    return record.subject, record.sender, record.date, record.content
+
+
+class EmailRecordTest(unittest.TestCase):
+
+    def test_from_raw_matches_email_parser(self):
+        generator = MailGenerator(seed=3, body_kb=1, attachment_kb=2)
+        messages = list(generator.messages(80))
+        # 同一批邮件换成 CRLF 行尾
+        messages += [raw.replace(b'\n', b'\r\n') for raw in messages[:20]]
+        for index, raw in enumerate(messages):
+            record = Email.from_raw(str(index), raw)
+            self.assertEqual((record.subject, record.sender, record.date, record.content), _parsed(raw))
+
+    def test_keeps_only_decoded_text(self):
+        raw = MailGenerator(seed=1, mix={'attachment': 1}, attachment_kb=8).message(0)
+        record = Email.from_raw('1', raw, 7, 9)
+        # 附件和头部的原始字节都不被邮件对象引用
+        self.assertFalse(any(isinstance(obj, bytes) for obj in gc.get_referents(record)))
+        self.assertTrue(record.content)
+        self.assertEqual((record.uid, record.uidvalidity), (7, 9))
+
+    def test_message_part_falls_back_to_email_parser(self):
+        raw = (b'Subject: fwd\nContent-Type: message/rfc822\n\n'
+               b'Subject: inner\nContent-Type: text/plain; charset=utf-8\n\n\xe6\xad\xa3\xe6\x96\x87\n')
+        self.assertEqual(Email.from_raw('1', raw).content, _parsed(raw)[3])
+
+    def test_multipart_without_text_plain(self):
+        raw = (b'Content-Type: multipart/mixed; boundary=b\n\n--b\nContent-Type: text/html\n\n<p>x</p>\n--b--\n')
+        self.assertEqual(Email.from_raw('1', raw).content, '')
+
+    def test_from_parts_decodes_lazily(self):
+        raw = make_message(3)
+        header = raw[:raw.find(b'\n\n') + 1]
+        record = Email.from_parts('3', header, '5q2j5paH'.encode(), 'base64', 'utf-8')
+        self.assertTrue(record._subject.startswith('=?utf-8?'))
+        self.assertEqual(record.subject, '测试邮件 3')
+        self.assertEqual(record.date, '2024-01-01 00:03:00')
+        self.assertEqual(record.content, '正文')
+        self.assertIsNone(record._body)
+
+    def test_setters_and_pickle(self):
+        record = Email.from_raw('2', make_message(2))
+        record.subject = '新主题'
+        copy = pickle.loads(pickle.dumps(record))
+        self.assertEqual((copy.subject, copy.sender, copy.content), (record.subject, record.sender, record.content))
+        self.assertFalse(hasattr(record, '__dict__'))
+
+
+if __name__ == '__main__':
+    unittest.main()
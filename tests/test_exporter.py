@@ -0,0 +1,99 @@
+import imaplib
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+from backends import FakeBackend
+from exporter import Exporter
+from tests.support import connect, make_mailbox
+
+
+class _Interrupted(Exception):
+    pass
+
+
+class ExporterTest(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.dir, 'INBOX.json')
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def _records(self, uids):
+        return ((uid, {'uid': uid}) for uid in uids)
+
+    def test_resume_from_checkpoint(self):
+        exporter = Exporter(self.path, checkpoint_every=2, quiet=True)
+        exporter.open(uidvalidity=7)
+        for uid, record in self._records(range(1, 6)):
+            exporter.write(record, uid)
+        # 模拟进程被杀死：断点停在第 4 封，第 5 封写了一半
+        exporter._file.write(b',{"uid": 5')
+        exporter._file.close()
+
+        exporter = Exporter(self.path, checkpoint_every=2, quiet=True)
+        self.assertEqual(exporter.open(uidvalidity=7), 4)
+        self.assertEqual(exporter.export(self._records(range(5, 8))), 7)
+        with open(self.path, encoding='utf-8') as f:
+            self.assertEqual([r['uid'] for r in json.load(f)], list(range(1, 8)))
+        self.assertFalse(os.path.exists(exporter.checkpoint_path))
+
+    def test_uidvalidity_change_restarts(self):
+        exporter = Exporter(self.path, 'ndjson', checkpoint_every=1, quiet=True)
+        exporter.open(uidvalidity=1)
+        exporter.write({'uid': 1}, 1)
+        exporter.abort()
+        exporter = Exporter(self.path, 'ndjson', checkpoint_every=1, quiet=True)
+        self.assertEqual(exporter.open(uidvalidity=2), 0)
+        exporter.close()
+        self.assertEqual(os.path.getsize(self.path), 0)
+
+    def test_client_export_resumes_after_interruption(self):
+        client = connect(make_mailbox(10))
+        record = client._email_record
+        written = []
+
+        def interrupt(email_obj):
+            if len(written) == 6:
+                raise _Interrupted()
+            written.append(email_obj.uid)
+            return record(email_obj)
+
+        client._email_record = interrupt
+        with self.assertRaises(_Interrupted):
+            client.save_emails_to_local('INBOX', self.dir, checkpoint_every=2)
+        client._email_record = record
+        self.assertEqual(client.save_emails_to_local('INBOX', self.dir, checkpoint_every=2), 10)
+        with open(self.path, encoding='utf-8') as f:
+            self.assertEqual([r['email_id'] for r in json.load(f)], [str(i) for i in range(1, 11)])
+        client.logout()
+
+    def test_failed_fetch_batch_keeps_checkpoint(self):
+        backend = FakeBackend(make_mailbox(30))
+        client = connect(backend)
+        for mode in ('text', 'full'):
+            backend.server.fail('FETCH')
+            with self.assertRaises(imaplib.IMAP4.error):
+                client.save_emails_to_local('INBOX', self.dir, mode=mode, checkpoint_every=5)
+            self.assertFalse(os.path.exists(self.path))
+            self.assertTrue(os.path.exists(self.path + '.checkpoint'))
+            self.assertTrue(os.path.exists(self.path + '.part'))
+        self.assertEqual(client.save_emails_to_local('INBOX', self.dir, checkpoint_every=5), 30)
+        self.assertFalse(os.path.exists(self.path + '.checkpoint'))
+        with open(self.path, encoding='utf-8') as f:
+            self.assertEqual(len(json.load(f)), 30)
+        client.logout()
+
+    def test_incomplete_cache_is_not_exported(self):
+        backend = FakeBackend(make_mailbox(30))
+        client = connect(backend, cache_path=os.path.join(self.dir, 'cache.db'))
+        backend.server.fail('FETCH')
+        self.assertEqual(client.save_emails_to_local('INBOX', self.dir), 0)
+        self.assertFalse(os.path.exists(self.path))
+        self.assertEqual(client.save_emails_to_local('INBOX', self.dir), 30)
+        client.logout()
+        client.cache.close()
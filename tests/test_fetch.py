@@ -0,0 +1,68 @@
+import unittest
+
+from imapparse import chunked, parse, parse_fetch, sequence_set
+from tests.support import connect, make_mailbox
+
+
+class SequenceSetTest(unittest.TestCase):
+
+    def test_compacts_ranges(self):
+        self.assertEqual(sequence_set([1, 2, 3, 5]), '1:3,5')
+        self.assertEqual(sequence_set(['9', '7', '8', '8', 1]), '1,7:9')
+        self.assertEqual(sequence_set([4]), '4')
+        self.assertEqual(sequence_set([]), '')
+
+    def test_chunked(self):
+        self.assertEqual(list(chunked([1, 2, 3, 4, 5], 2)), [[1, 2], [3, 4], [5]])
+
+
+class ParseFetchTest(unittest.TestCase):
+
+    def test_literal_and_atoms(self):
+        data = [(b'1 (UID 11 FLAGS (\\Seen) RFC822 {5}', b'hello'), b')',
+                (b'2 (UID 12 FLAGS () RFC822 {3}', b'a)b'), b')']
+        result = parse_fetch(data)
+        self.assertEqual([seq for seq, _ in result], [1, 2])
+        self.assertEqual(result[0][1]['UID'], b'11')
+        self.assertEqual(result[0][1]['FLAGS'], [b'\\Seen'])
+        self.assertEqual(result[0][1]['RFC822'], b'hello')
+        # 字面量中的括号不影响解析
+        self.assertEqual(result[1][1]['RFC822'], b'a)b')
+        self.assertEqual(result[1][1]['FLAGS'], [])
+
+    def test_skips_unrelated_lines(self):
+        self.assertEqual(parse_fetch([b'3 EXISTS', b'1 (UID 5)']), [(1, {'UID': b'5'})])
+
+    def test_unbalanced_parenthesis(self):
+        self.assertEqual(parse_fetch([b'1 (UID 5))', b'2 (UID 6)']), [(1, {'UID': b'5'}), (2, {'UID': b'6'})])
+
+    def test_quoted_and_nil(self):
+        self.assertEqual(parse(b'(1 "a \\"b\\"" NIL)'), [[b'1', b'a "b"', None]])
+
+
+class FetchEmailsTest(unittest.TestCase):
+
+    def setUp(self):
+        self.client = connect(make_mailbox(25), use_uid=False)
+        self.assertTrue(self.client.select_folder('INBOX'))
+
+    def tearDown(self):
+        self.client.logout()
+
+    def test_one_fetch_per_batch(self):
+        email_ids = [str(i) for i in range(1, 26)]
+        emails = list(self.client.fetch_emails(email_ids, batch_size=10))
+        self.assertEqual([e.email_id for e in emails], email_ids)
+        self.assertEqual(emails[4].subject, '测试邮件 4')
+        self.assertEqual(emails[4].content, '这是第 4 封测试邮件的正文。\n' * 5)
+        self.assertEqual(self.client.metrics.snapshot()['commands']['FETCH']['count'], 3)
+
+    def test_search_and_fetch_sparse_ids(self):
+        self.assertEqual(self.client.search_emails('ALL'), [str(i) for i in range(1, 26)])
+        emails = list(self.client.fetch_emails(['3', '4', '5', '9'], batch_size=500))
+        self.assertEqual([e.subject for e in emails], ['测试邮件 2', '测试邮件 3', '测试邮件 4', '测试邮件 8'])
+        self.assertEqual(self.client.metrics.snapshot()['commands']['FETCH']['count'], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,80 @@
+import os
+import time
+import unittest
+
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+
+try:
+    from PyQt5.QtWidgets import QApplication
+except ImportError:
+    QApplication = None
+
+if QApplication is not None:
+    from tkClient import MailWindow
+from backends import FakeBackend
+from tests.support import connect, make_mailbox
+from watcher import Change
+
+
+def _wait(predicate, timeout=5):
+    '''处理事件循环，直到 predicate() 为真'''
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        if time.monotonic() > deadline:
+            raise AssertionError('等待超时')
+        QApplication.processEvents()
+        time.sleep(0.005)
+
+
+@unittest.skipIf(QApplication is None, '未安装 PyQt5')
+class MailWindowTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.app = QApplication.instance() or QApplication([])
+
+    def setUp(self):
+        self.mailbox = make_mailbox(3)
+        make_mailbox(1, 'Sent', self.mailbox)
+        # 支持 IDLE 时监视线程不需要轮询，变化会立即推送
+        self.client = connect(FakeBackend(self.mailbox, capabilities=('IMAP4rev1', 'ID', 'IDLE')))
+        self.window = MailWindow(self.client)
+        self.addCleanup(self._close)
+        self.model = self.window.email_model
+
+    def _close(self):
+        if self.window.watcher is not None:
+            self.window.watcher.stop()
+        self.window.pool.waitForDone()
+        self.window.close()
+        self.client.logout()
+
+    def _rows(self):
+        return [self.model.email_id(r) for r in range(self.model.rowCount())]
+
+    def test_folders_and_status(self):
+        _wait(lambda: self.window.folder_list.count() == 2)
+        _wait(lambda: self.window.folder_items['INBOX'].text() == 'INBOX (3，未读 3)')
+        _wait(lambda: self.window.folder_items['Sent'].text() == 'Sent (1，未读 1)')
+        self.assertEqual(self.window.current_folder, 'INBOX')
+        _wait(lambda: self._rows() == ['3', '2', '1'])
+
+    def test_changes_update_list(self):
+        _wait(lambda: self._rows() == ['3', '2', '1'])
+        _wait(lambda: self.window.watcher.client is not None and len(self.window.watcher.uids) == 3)
+        self.mailbox.append('INBOX', b'Subject: new\n\nbody\n')
+        _wait(lambda: self._rows() == ['4', '3', '2', '1'])
+        _wait(lambda: self.window.folder_items['INBOX'].text() == 'INBOX (4，未读 4)')
+        with self.mailbox.lock:
+            folder = self.mailbox.folder('INBOX')
+            folder.messages = [m for m in folder.messages if m.uid != 2]
+        _wait(lambda: self._rows() == ['4', '3', '1'])
+
+    def test_change_in_other_folder_is_ignored(self):
+        _wait(lambda: self._rows() == ['3', '2', '1'])
+        self.window.on_change(Change('new', 'Sent', 9))
+        self.assertEqual(self._rows(), ['3', '2', '1'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,41 @@
+import base64
+import unittest
+
+import headers
+
+
+def _words(data, charset, sizes):
+    '''把字节按 sizes 切开，每段编码为一个 B 编码的 encoded-word'''
+    words = []
+    for size in sizes:
+        chunk, data = data[:size], data[size:]
+        words.append(f"=?{charset}?B?{base64.b64encode(chunk).decode()}?=")
+    return words
+
+
+class DecodeHeaderValueTest(unittest.TestCase):
+
+    def test_multibyte_character_split_across_words(self):
+        text = '关于项目评审的通知'
+        data = text.encode('utf-8')
+        # 每个汉字 3 个字节，按 4、5 字节切开，每个 encoded-word 都以半个汉字结尾
+        value = '\r\n '.join(_words(data, 'UTF-8', [4, 5, 4, 5, 9]))
+        self.assertEqual(headers.decode_header_value(value), text)
+
+    def test_gbk_split_and_gb2312_label(self):
+        text = '发票已开具请查收'
+        data = text.encode('gbk')
+        value = ' '.join(_words(data, 'gb2312', [3, 5, 8]))
+        self.assertEqual(headers.decode_header_value(value), text)
+
+    def test_plain_text_between_words(self):
+        value = '=?utf-8?Q?=E5=91=A8=E6=8A=A5?= - Weekly =?utf-8?B?5oql5ZGK?='
+        self.assertEqual(headers.decode_header_value(value), '周报 - Weekly 报告')
+
+    def test_undeclared_8bit_header(self):
+        self.assertEqual(headers.decode_bytes('报销单'.encode('gbk')), '报销单')
+        self.assertEqual(headers.decode_header_value(None), '')
+
+    def test_format_date(self):
+        self.assertEqual(headers.format_date('Mon, 1 Jan 2024 08:30:00 +0800 (CST)'), '2024-01-01 08:30:00')
+        self.assertIsNone(headers.format_date('not a date'))
@@ -0,0 +1,92 @@
+import time
+import unittest
+
+try:
+    from PyQt5.QtCore import QCoreApplication, QThreadPool, Qt
+except ImportError:
+    QCoreApplication = None
+
+if QCoreApplication is not None:
+    from mailmodel import ClientSource, EmailListModel, ListSource, LRUCache
+from tests.support import connect, make_mailbox
+
+
+def _wait(predicate, timeout=5):
+    '''处理事件循环，直到 predicate() 为真'''
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        if time.monotonic() > deadline:
+            raise AssertionError('等待超时')
+        QCoreApplication.processEvents()
+        time.sleep(0.005)
+
+
+@unittest.skipIf(QCoreApplication is None, '未安装 PyQt5')
+class EmailListModelTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.app = QCoreApplication.instance() or QCoreApplication([])
+
+    def _model(self, source, **kwargs):
+        pool = QThreadPool()
+        pool.setMaxThreadCount(1)
+        # 模型销毁前等后台任务结束
+        self.addCleanup(pool.waitForDone)
+        model = EmailListModel(pool=pool, **kwargs)
+        counts = []
+        model.countChanged.connect(counts.append)
+        model.set_source(source)
+        _wait(lambda: counts)
+        return model
+
+    def _text(self, model, row):
+        '''显示该行，等后台加载完成后返回显示的文本'''
+        model.data(model.index(row))
+        _wait(lambda: model.data(model.index(row), Qt.UserRole) is not None)
+        return model.data(model.index(row))
+
+    def test_lru_cache(self):
+        cache = LRUCache(2)
+        cache.put(1, 'a')
+        cache.put(2, 'b')
+        cache.get(1)
+        cache.put(3, 'c')
+        self.assertNotIn(2, cache)
+        self.assertEqual((cache.get(1), cache.get(3), len(cache)), ('a', 'c', 2))
+
+    def test_rows_grow_and_load_by_window(self):
+        emails = [{'id': i, 'subject': f"主题 {i}", 'sender': 'a@example.com', 'date': ''} for i in range(1, 251)]
+        model = self._model(ListSource(emails), window_size=100, max_windows=1)
+        self.assertEqual((model.total(), model.rowCount()), (250, 100))
+        self.assertEqual(model.data(model.index(0)), EmailListModel.PLACEHOLDER)
+        # 最新的邮件排在最前面
+        self.assertEqual(self._text(model, 0), '主题 250 - a@example.com')
+        while model.canFetchMore():
+            model.fetchMore()
+        self.assertEqual(model.rowCount(), 250)
+        self.assertEqual(self._text(model, 249), '主题 1 - a@example.com')
+        # 只保留一个窗口，第一个窗口已被淘汰，再次显示时重新加载
+        self.assertIsNone(model.data(model.index(0), Qt.UserRole))
+        self.assertEqual(self._text(model, 0), '主题 250 - a@example.com')
+
+    def test_insert_remove_and_check(self):
+        emails = [{'id': i, 'subject': str(i), 'sender': 's', 'date': ''} for i in range(1, 6)]
+        model = self._model(ListSource(emails), window_size=3)
+        model.add_ids([6, 7])
+        self.assertEqual([model.email_id(r) for r in range(model.rowCount())], ['7', '6', '5', '4', '3'])
+        model.setData(model.index(2), Qt.Checked, Qt.CheckStateRole)
+        model.remove_id('7')
+        self.assertEqual(model.total(), 6)
+        self.assertEqual(model.checked_ids(), ['5'])
+
+    def test_client_source(self):
+        client = connect(make_mailbox(5))
+        self.addCleanup(client.logout)
+        model = self._model(ClientSource(client, 'INBOX'), window_size=2)
+        self.assertEqual(model.total(), 5)
+        self.assertEqual(self._text(model, 0).split(' - ')[0], '测试邮件 4')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,153 @@
+import contextlib
+import io
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+from asyncclient import AsyncEmailClient
+from backends import FakeBackend
+from fakeimap import FakeImapServer
+from metrics import Metrics
+from tests.support import connect, make_mailbox
+
+
+class MetricsTest(unittest.TestCase):
+
+    def setUp(self):
+        self.metrics = Metrics(buckets=(0.1, 1.0))
+        self.metrics.command('FETCH', 'OK', 0.05, bytes_in=100, bytes_out=10)
+        self.metrics.command('FETCH', 'NO', 0.5)
+        self.metrics.command('LOGOUT', 'BYE', 0.01)
+        self.metrics.retry('FETCH')
+        self.metrics.stage('export', 2.0, items=10, nbytes=500)
+
+    def test_snapshot(self):
+        with self.metrics.timer('parse', 4):
+            pass
+        snap = self.metrics.snapshot()
+        fetch = snap['commands']['FETCH']
+        self.assertEqual((fetch['count'], fetch['errors'], fetch['retries']), (2, 1, 1))
+        self.assertEqual((fetch['bytes_in'], fetch['bytes_out']), (100, 10))
+        self.assertEqual(fetch['buckets'], {0.1: 1, 1.0: 1})
+        # LOGOUT 正常结束时返回 BYE，不计为错误
+        self.assertEqual(snap['commands']['LOGOUT']['errors'], 0)
+        self.assertEqual(snap['stages']['export']['items_per_second'], 5.0)
+        self.assertEqual(snap['stages']['parse']['items'], 4)
+        self.assertEqual(json.loads(self.metrics.to_json())['commands']['FETCH']['count'], 2)
+
+    def test_prometheus(self):
+        lines = self.metrics.to_prometheus().splitlines()
+        self.assertIn('# TYPE imap_client_commands_total counter', lines)
+        self.assertIn('imap_client_commands_total{command="FETCH"} 2', lines)
+        self.assertIn('imap_client_command_retries_total{command="FETCH"} 1', lines)
+        # 直方图的桶是累计的
+        self.assertIn('imap_client_command_duration_seconds_bucket{command="FETCH",le="0.1"} 1', lines)
+        self.assertIn('imap_client_command_duration_seconds_bucket{command="FETCH",le="1.0"} 2', lines)
+        self.assertIn('imap_client_command_duration_seconds_bucket{command="FETCH",le="+Inf"} 2', lines)
+        self.assertIn('imap_client_stage_bytes_total{stage="export"} 500', lines)
+
+    def test_write(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        path = os.path.join(directory, 'metrics.json')
+        self.metrics.write(path, 'json')
+        with open(path, encoding='utf-8') as f:
+            self.assertEqual(json.load(f)['stages']['export']['bytes'], 500)
+        self.assertEqual(os.listdir(directory), ['metrics.json'])
+        with self.assertRaises(ValueError):
+            self.metrics.write(path, 'xml')
+
+    def test_failing_hook_does_not_stop_others(self):
+        events = []
+
+        def broken(event):
+            raise RuntimeError('boom')
+
+        self.metrics.add_hook(broken)
+        self.metrics.add_hook(events.append)
+        with contextlib.redirect_stdout(io.StringIO()):
+            self.metrics.command('NOOP', 'OK', 0.001, bytes_in=20)
+        self.assertEqual(events, [{'command': 'NOOP', 'status': 'OK', 'seconds': 0.001,
+                                   'bytes_in': 20, 'bytes_out': 0}])
+
+
+class ClientMetricsTest(unittest.TestCase):
+
+    def setUp(self):
+        self.backend = FakeBackend(make_mailbox(6))
+        self.events = []
+        metrics = Metrics()
+        metrics.add_hook(self.events.append)
+        self.client = connect(self.backend, metrics=metrics)
+        self.addCleanup(self.client.logout)
+        self.assertTrue(self.client.select_folder('INBOX'))
+
+    def test_commands_are_recorded(self):
+        emails = list(self.client.fetch_emails(['1', '2', '3'], batch_size=2))
+        self.assertEqual(len(emails), 3)
+        fetch = self.client.metrics.snapshot()['commands']['UID FETCH']
+        self.assertEqual((fetch['count'], fetch['errors']), (2, 0))
+        self.assertGreater(fetch['bytes_in'], 3 * 300)
+        self.assertGreater(fetch['bytes_out'], 0)
+        self.assertEqual([e['command'] for e in self.events][:2], ['LOGIN', 'ID'])
+        self.assertEqual(sum(e['bytes_in'] for e in self.events if e['command'] == 'UID FETCH'), fetch['bytes_in'])
+
+    def test_throttled_fetch_is_retried(self):
+        self.backend.server.fail('FETCH', response='NO [THROTTLED] slow down')
+        self.assertEqual(len(list(self.client.fetch_emails(['1', '2']))), 2)
+        fetch = self.client.metrics.snapshot()['commands']['UID FETCH']
+        self.assertEqual((fetch['count'], fetch['errors'], fetch['retries']), (2, 1, 1))
+        self.assertEqual([e['status'] for e in self.events if e['command'] == 'UID FETCH'], ['NO', 'OK'])
+
+    def test_export_stages(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        self.assertEqual(self.client.save_emails_to_local('INBOX', directory), 6)
+        stages = self.client.metrics.snapshot()['stages']
+        self.assertEqual(stages['export']['items'], 6)
+        self.assertGreater(stages['export']['bytes'], 0)
+
+
+class QuietTest(unittest.TestCase):
+
+    def _run(self, quiet):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        out = io.StringIO()
+        with contextlib.redirect_stdout(out):
+            client = connect(make_mailbox(5), quiet=quiet)
+            client.save_emails_to_local('INBOX', directory)
+            client.select_folder('INBOX')
+            client.delete_emails(['1'], trash=None)
+            client.logout()
+        return out.getvalue()
+
+    def test_client(self):
+        self.assertIn('登录成功', self._run(False))
+        self.assertEqual(self._run(True), '')
+
+
+class AsyncQuietTest(unittest.IsolatedAsyncioTestCase):
+
+    async def _run(self, quiet):
+        server = FakeImapServer(make_mailbox(5))
+        host, port = server.start()
+        self.addCleanup(server.stop)
+        out = io.StringIO()
+        with contextlib.redirect_stdout(out):
+            client = AsyncEmailClient('test@example.com', 'secret', host, port, use_ssl=False, quiet=quiet)
+            await client.login()
+            await client.select_folder('INBOX')
+            await client.copy_emails(['1', '2'], 'INBOX')
+            await client.logout()
+        return out.getvalue()
+
+    async def test_async_client(self):
+        self.assertIn('登录成功', await self._run(False))
+        self.assertEqual(await self._run(True), '')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,106 @@
+import base64
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+from bench.mailgen import MailGenerator
+from fakeimap import Mailbox
+from imapparse import parse, parse_bodystructure
+from tests.support import connect
+from to163 import EmailClient
+
+_TRUNCATED = (b'Subject: truncated\r\nFrom: a@example.com\r\nMIME-Version: 1.0\r\n'
+              b'Content-Type: text/plain; charset=utf-8\r\nContent-Transfer-Encoding: base64\r\n\r\n'
+              + base64.b64encode('你好世界'.encode('utf-8'))[:-1] + b'\r\n')
+
+
+class ParseBodystructureTest(unittest.TestCase):
+
+    def test_multipart_sections(self):
+        value = parse(b'((("TEXT" "PLAIN" ("CHARSET" "gbk") NIL NIL "BASE64" 120 3 NIL NIL NIL)'
+                      b'("TEXT" "HTML" ("CHARSET" "utf-8") NIL NIL "QUOTED-PRINTABLE" 300 8 NIL NIL NIL) '
+                      b'"ALTERNATIVE" ("BOUNDARY" "x") NIL NIL)'
+                      b'("APPLICATION" "PDF" ("NAME" "a.pdf") NIL NIL "BASE64" 4096 NIL '
+                      b'("ATTACHMENT" ("FILENAME" "report.pdf")) NIL) "MIXED" ("BOUNDARY" "y") NIL NIL)')
+        parts = parse_bodystructure(value[0])
+        self.assertEqual([p['section'] for p in parts], ['1.1', '1.2', '2'])
+        self.assertEqual(parts[0]['params']['charset'], 'gbk')
+        self.assertEqual(parts[0]['encoding'], 'base64')
+        self.assertEqual(parts[1]['subtype'], 'html')
+        self.assertEqual(parts[2]['disposition'], 'attachment')
+        self.assertEqual(parts[2]['filename'], 'report.pdf')
+        self.assertEqual(parts[2]['size'], 4096)
+
+    def test_single_part(self):
+        value = parse(b'("TEXT" "PLAIN" ("CHARSET" "us-ascii") NIL NIL "7BIT" 10 1 NIL NIL NIL)')
+        parts = parse_bodystructure(value[0])
+        self.assertEqual(len(parts), 1)
+        self.assertEqual(parts[0]['section'], '1')
+        self.assertIsNone(parts[0]['filename'])
+
+
+class DecodeTransferTest(unittest.TestCase):
+
+    def test_truncated_base64(self):
+        data = base64.b64encode('你好世界'.encode('utf-8'))
+        self.assertEqual(EmailClient._decode_transfer(data, 'base64'), '你好世界'.encode('utf-8'))
+        with self.assertLogs(level='WARNING'):
+            self.assertEqual(EmailClient._decode_transfer(data[:-1], 'base64'), '你好世界'.encode('utf-8')[:-1])
+        with self.assertLogs(level='WARNING'):
+            self.assertEqual(EmailClient._decode_transfer(data[:-3], 'base64'), '你好世'.encode('utf-8'))
+
+    def test_text_export_with_truncated_base64(self):
+        mailbox = Mailbox()
+        mailbox.append('INBOX', _TRUNCATED)
+        client = connect(mailbox)
+        save_path = tempfile.mkdtemp()
+        try:
+            with self.assertLogs(level='WARNING'):
+                self.assertEqual(client.save_emails_to_local('INBOX', save_path), 1)
+            with open(os.path.join(save_path, 'INBOX.json'), encoding='utf-8') as f:
+                self.assertTrue(json.load(f)[0]['content'].startswith('你好世'))
+        finally:
+            client.logout()
+            shutil.rmtree(save_path)
+
+
+class PartialFetchTest(unittest.TestCase):
+
+    def setUp(self):
+        mailbox = MailGenerator(seed=2, mix={'attachment': 1, 'nested': 1}, attachment_kb=16, duplicates=0).mailbox(6)
+        self.client = connect(mailbox)
+        self.assertTrue(self.client.select_folder('INBOX'))
+        self.uids = [str(uid) for uid in range(1, 7)]
+
+    def tearDown(self):
+        self.client.logout()
+
+    def _bytes_in(self):
+        return self.client.metrics.snapshot()['commands']['UID FETCH']['bytes_in']
+
+    def test_text_mode_skips_attachments(self):
+        full = list(self.client.fetch_emails(self.uids, mode='full'))
+        full_bytes = self._bytes_in()
+        text = list(self.client.fetch_emails(self.uids, mode='text'))
+        self.assertEqual([e.content for e in text], [e.content for e in full])
+        self.assertEqual([e.subject for e in text], [e.subject for e in full])
+        self.assertTrue(all(e.content for e in text))
+        # 附件约 16 KB，text 模式下载的字节数远少于整封邮件
+        self.assertLess(self._bytes_in() - full_bytes, full_bytes / 4)
+
+    def test_headers_mode(self):
+        full = list(self.client.fetch_emails(self.uids, mode='full'))
+        headers = list(self.client.fetch_emails(self.uids, mode='headers'))
+        self.assertEqual([(e.subject, e.sender, e.date) for e in headers],
+                         [(e.subject, e.sender, e.date) for e in full])
+        self.assertEqual({e.content for e in headers}, {''})
+
+    def test_unknown_mode(self):
+        with self.assertRaises(ValueError):
+            list(self.client.fetch_emails(self.uids, mode='body'))
+
+
+if __name__ == '__main__':
+    unittest.main()
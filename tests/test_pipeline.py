@@ -0,0 +1,52 @@
+import imaplib
+import unittest
+
+from backends import FakeBackend
+from pipeline import ParsePipeline
+from tests.support import connect, make_mailbox
+
+
+class ParsePipelineTest(unittest.TestCase):
+
+    def setUp(self):
+        self.backend = FakeBackend(make_mailbox(20))
+        self.client = connect(self.backend)
+        self.assertTrue(self.client.select_folder('INBOX'))
+        self.uids = [str(uid) for uid in range(1, 21)]
+
+    def tearDown(self):
+        self.client.logout()
+
+    def _fields(self, emails):
+        return [(e.email_id, e.uid, e.uidvalidity, e.subject, e.sender, e.date, e.content) for e in emails]
+
+    def test_same_result_as_inline_parsing(self):
+        inline = self._fields(self.client.fetch_emails(self.uids, batch_size=7, workers=0))
+        parsed = self._fields(ParsePipeline(workers=2, chunk_size=3).run(self.client, self.uids, batch_size=7))
+        self.assertEqual(parsed, inline)
+        self.assertEqual(len(parsed), 20)
+
+    def test_fetch_emails_with_workers(self):
+        emails = list(self.client.fetch_emails(self.uids[:5], batch_size=2, workers=1))
+        self.assertEqual([e.subject for e in emails], [f"测试邮件 {i}" for i in range(5)])
+
+    def test_strict_failure_reaches_consumer(self):
+        self.backend.server.fail('FETCH')
+        with self.assertRaises(imaplib.IMAP4.error):
+            list(ParsePipeline(workers=1).run(self.client, self.uids, batch_size=5, strict=True))
+
+    def test_failed_batch_is_skipped(self):
+        self.backend.server.fail('FETCH')
+        emails = list(ParsePipeline(workers=1).run(self.client, self.uids, batch_size=5))
+        self.assertEqual([e.email_id for e in emails], self.uids[5:])
+
+    def test_consumer_can_stop_early(self):
+        emails = ParsePipeline(workers=1, chunk_size=2).run(self.client, self.uids, batch_size=4)
+        self.assertEqual(next(emails).email_id, '1')
+        emails.close()
+        # 下载线程已退出，连接可以继续使用
+        self.assertEqual(len(self.client.search_emails('ALL')), 20)
+
+
+if __name__ == '__main__':
+    unittest.main()
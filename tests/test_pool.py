@@ -0,0 +1,91 @@
+import contextlib
+import io
+import json
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+from unittest import mock
+
+from backends import FakeBackend
+from pool import ConnectionPool
+from tests.support import make_mailbox
+from to163 import EmailClient
+
+
+class SaveFolderTest(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.backend = FakeBackend(make_mailbox(120))
+        self.pool = ConnectionPool('pool@example.com', 'secret', size=3, backend=self.backend, quiet=True)
+
+    def tearDown(self):
+        self.pool.close()
+        shutil.rmtree(self.dir)
+
+    def _saved(self):
+        with open(os.path.join(self.dir, 'INBOX.json'), encoding='utf-8') as f:
+            return [int(r['email_id']) for r in json.load(f)]
+
+    def test_merges_ranges_in_order(self):
+        self.assertEqual(self.pool.save_folder('INBOX', self.dir, batch_size=20), 120)
+        self.assertEqual(self._saved(), list(range(1, 121)))
+
+    def _failing_select(self, failures):
+        '''让第 failures 次 select_folder 调用失败（从 1 开始计数，第 1 次是 save_folder 自己的选择）'''
+        select = EmailClient.select_folder
+        lock = threading.Lock()
+        calls = [0]
+
+        def select_folder(client, folder):
+            with lock:
+                calls[0] += 1
+                call = calls[0]
+            return False if call in failures else select(client, folder)
+
+        return mock.patch.object(EmailClient, 'select_folder', select_folder)
+
+    def test_failed_range_is_retried(self):
+        with self._failing_select({2}):
+            self.assertEqual(self.pool.save_folder('INBOX', self.dir, batch_size=20), 120)
+        self.assertEqual(self._saved(), list(range(1, 121)))
+
+    def test_failed_range_aborts_export(self):
+        # 第 2 次是某个区间的第一次选择，第 5 次是它的重试
+        with self._failing_select({2, 5}):
+            self.assertEqual(self.pool.save_folder('INBOX', self.dir, batch_size=20), 0)
+        self.assertEqual(os.listdir(self.dir), [])
+
+    def test_failed_search(self):
+        self.backend.server.fail('SEARCH')
+        self.assertEqual(self.pool.save_folder('INBOX', self.dir), 0)
+        self.assertEqual(os.listdir(self.dir), [])
+
+    def test_failed_fetch_batch_is_retried(self):
+        self.backend.server.fail('FETCH')
+        self.assertEqual(self.pool.save_folder('INBOX', self.dir, batch_size=20), 120)
+        self.assertEqual(self._saved(), list(range(1, 121)))
+
+    def test_short_range_is_retried(self):
+        # 服务器对一批 FETCH 回答 OK 但不返回任何邮件
+        self.backend.server.fail('FETCH', response='OK [fake] nothing')
+        self.assertEqual(self.pool.save_folder('INBOX', self.dir, batch_size=20), 120)
+        self.assertEqual(self._saved(), list(range(1, 121)))
+
+    def test_short_range_fails_export(self):
+        self.backend.server.fail('FETCH', count=100, response='OK [fake] nothing')
+        self.assertEqual(self.pool.save_folder('INBOX', self.dir, batch_size=20), 0)
+        self.assertEqual(os.listdir(self.dir), [])
+
+    def test_quiet_pool_does_not_print(self):
+        out = io.StringIO()
+        with contextlib.redirect_stdout(out):
+            with self.assertLogs(level='INFO') as logs:
+                self.assertEqual(self.pool.save_folder('INBOX', self.dir, batch_size=20), 120)
+                self.backend.server.fail('SEARCH')
+                self.assertEqual(self.pool.save_folder('INBOX', self.dir), 0)
+        self.assertEqual(out.getvalue(), '')
+        self.assertTrue(any('共保存 120 封邮件' in line for line in logs.output))
+        self.assertTrue(any(line.startswith('ERROR') and '搜索文件夹 INBOX' in line for line in logs.output))
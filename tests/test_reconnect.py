@@ -0,0 +1,67 @@
+import imaplib
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+from backends import FakeBackend
+from fakeimap import DROP
+from tests.support import connect, make_mailbox
+
+
+class ReconnectTest(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.backend = FakeBackend(make_mailbox(30))
+        self.server = self.backend.server
+        self.client = connect(self.backend, reconnect_delay=0)
+
+    def tearDown(self):
+        self.client.logout()
+        shutil.rmtree(self.dir)
+
+    def _retries(self, command):
+        return self.client.metrics.snapshot()['commands'][command]['retries']
+
+    def test_select_after_dropped_connection(self):
+        self.server.fail('SELECT', response=DROP)
+        self.assertTrue(self.client.select_folder('INBOX'))
+        self.assertEqual(self.client.exists, 30)
+        self.assertEqual(self._retries('SELECT'), 1)
+
+    def test_export_starting_on_dropped_connection(self):
+        self.server.fail('SELECT', response=DROP)
+        self.assertEqual(self.client.save_emails_to_local('INBOX', self.dir), 30)
+
+    def test_fetch_and_reselect_dropped(self):
+        self.assertTrue(self.client.select_folder('INBOX'))
+        self.server.fail('FETCH', response=DROP)
+        self.server.fail('SELECT', response=DROP)
+        emails = list(self.client.fetch_emails(self.client._uid_search('ALL'), batch_size=10, uid=True))
+        self.assertEqual([e.uid for e in emails], list(range(1, 31)))
+        # 第一次重新连接时 SELECT 又中断，由外层等待后再连一次，不嵌套重连
+        self.assertEqual(self._retries('UID FETCH'), 2)
+        self.assertNotIn('SELECT', {c for c, s in self.client.metrics.snapshot()['commands'].items()
+                                    if s['retries']})
+        self.assertEqual(self.client.current_folder, 'INBOX')
+
+    def test_uidvalidity_change_stops_fetch(self):
+        self.assertTrue(self.client.select_folder('INBOX'))
+        uids = self.client._uid_search('ALL')
+        self.server.fail('FETCH', response=DROP)
+        self.backend.mailbox.folders['INBOX'].uidvalidity += 1
+        # 之前的 UID 都已失效，不能在新连接上继续获取
+        with self.assertRaises(imaplib.IMAP4.abort):
+            list(self.client.fetch_emails(uids, uid=True))
+
+    def test_export_resumes_after_retries_run_out(self):
+        self.client.reconnect_retries = 1
+        self.assertTrue(self.client.select_folder('INBOX'))
+        self.server.fail('FETCH', count=2, response=DROP)
+        with self.assertRaises(imaplib.IMAP4.abort):
+            self.client.save_emails_to_local('INBOX', self.dir, checkpoint_every=5)
+        self.assertEqual(self.client.save_emails_to_local('INBOX', self.dir, checkpoint_every=5), 30)
+        with open(os.path.join(self.dir, 'INBOX.json'), encoding='utf-8') as f:
+            self.assertEqual(len(json.load(f)), 30)
@@ -0,0 +1,55 @@
+import unittest
+
+from fakeimap import Mailbox, make_message
+from mailcache import fts_query
+from tests.support import connect
+
+
+class SearchLocalTest(unittest.TestCase):
+
+    def setUp(self):
+        mailbox = Mailbox()
+        mailbox.append('INBOX', make_message(1, subject='季度报销单审批结果', body='Quarterly budget review\n'))
+        mailbox.append('INBOX', make_message(2, subject='项目周报', body='本周完成了报表导出功能。\n'))
+        mailbox.append('INBOX', make_message(3, subject='午餐', sender='张三 <zhang@example.com>', body='lunch?\n'))
+        mailbox.append('Archive', make_message(4, subject='旧的报销单', body='archived budget\n'))
+        self.client = connect(mailbox, cache_path=':memory:')
+        for folder in ('INBOX', 'Archive'):
+            self.client.sync_folder(folder)
+
+    def tearDown(self):
+        self.client.logout()
+        self.client.cache.close()
+
+    def _subjects(self, query, **kwargs):
+        return sorted(r['subject'] for r in self.client.search_local(query, **kwargs))
+
+    def test_chinese_phrase(self):
+        self.assertEqual(self._subjects('报销单'), ['季度报销单审批结果', '旧的报销单'])
+        self.assertEqual(self._subjects('报销单', folder='INBOX'), ['季度报销单审批结果'])
+        # 中文按字面连续匹配，“报表”不匹配“报销”
+        self.assertEqual(self._subjects('报表'), ['项目周报'])
+
+    def test_all_terms_must_match(self):
+        self.assertEqual(self._subjects('budget'), ['季度报销单审批结果', '旧的报销单'])
+        self.assertEqual(self._subjects('budget review'), ['季度报销单审批结果'])
+        self.assertEqual(self._subjects('budget 午餐'), [])
+
+    def test_sender_and_result_fields(self):
+        results = self.client.search_local('张三')
+        self.assertEqual(len(results), 1)
+        self.assertEqual((results[0]['folder'], results[0]['uid'], results[0]['content']), ('INBOX', 3, 'lunch?\n'))
+
+    def test_empty_query_and_limit(self):
+        self.assertEqual(fts_query('  '), '')
+        self.assertEqual(self.client.search_local(''), [])
+        self.assertEqual(len(self.client.search_local('budget', limit=1)), 1)
+
+    def test_without_cache(self):
+        client = connect(Mailbox())
+        self.addCleanup(client.logout)
+        self.assertEqual(client.search_local('budget'), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,99 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from backends import FakeBackend
+from fakeimap import make_message
+from tests.support import connect, make_mailbox
+
+
+class SyncFolderTest(unittest.TestCase):
+
+    capabilities = ('IMAP4rev1', 'ID', 'ENABLE', 'CONDSTORE', 'UIDPLUS')
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.backend = FakeBackend(make_mailbox(30), capabilities=self.capabilities)
+        self.client = connect(self.backend, cache_path=os.path.join(self.dir, 'cache.db'))
+        self.cache = self.client.cache
+
+    def tearDown(self):
+        self.client.logout()
+        self.cache.close()
+        shutil.rmtree(self.dir)
+
+    def test_incremental(self):
+        self.assertEqual(self.client.sync_folder('INBOX'), 30)
+        self.backend.mailbox.append('INBOX', make_message(30))
+        self.assertEqual(self.client.sync_folder('INBOX'), 1)
+        self.assertEqual(self.client.sync_folder('INBOX'), 0)
+        self.assertEqual(self.cache.uids('INBOX'), set(range(1, 32)))
+
+    def test_after_expunge(self):
+        self.client.sync_folder('INBOX')
+        self.assertTrue(self.client.delete_emails(['5', '6', '20'], trash=None))
+        self.backend.mailbox.append('INBOX', make_message(30))
+        self.assertEqual(self.client.sync_folder('INBOX'), 1)
+        self.assertEqual(self.cache.uids('INBOX'), set(range(1, 32)) - {5, 6, 20})
+
+    def test_uidvalidity_change(self):
+        self.client.sync_folder('INBOX')
+        folder = self.backend.mailbox.folders['INBOX']
+        with self.backend.mailbox.lock:
+            folder.uidvalidity += 1
+            del folder.messages[10:]
+        self.assertEqual(self.client.sync_folder('INBOX'), 10)
+        self.assertEqual(self.cache.folder_state('INBOX')[0], folder.uidvalidity)
+        self.assertEqual(self.cache.count('INBOX'), 10)
+
+    def test_flag_changes(self):
+        self.client.sync_folder('INBOX')
+        self.assertTrue(self.client.select_folder('INBOX'))
+        self.client.mail.uid('STORE', '3', '+FLAGS', '(\\Flagged)')
+        self.client.sync_folder('INBOX')
+        flags = {r['uid']: r['flags'] for r in self.cache.records('INBOX')}
+        self.assertIn('\\Flagged', flags[3])
+        self.assertNotIn('\\Flagged', flags[4])
+
+    def test_failed_search_keeps_cache(self):
+        self.client.sync_folder('INBOX')
+        self.client.delete_emails(['1'], trash=None)
+        # 搜索失败不能当作服务器上没有邮件
+        self.backend.server.fail('SEARCH')
+        self.assertEqual(self.client.sync_folder('INBOX'), 0)
+        self.assertEqual(self.cache.count('INBOX'), 30)
+        self.assertEqual(self.client.sync_folder('INBOX'), 0)
+        self.assertEqual(self.cache.uids('INBOX'), set(range(2, 31)))
+
+    def test_failed_full_search_skips_cleanup(self):
+        self.client.sync_folder('INBOX')
+        self.client.delete_emails(['1'], trash=None)
+        self.backend.mailbox.append('INBOX', make_message(30))
+        real = self.client._uid_search
+        self.client._uid_search = lambda criteria: None if criteria == 'ALL' else real(criteria)
+        self.assertEqual(self.client.sync_folder('INBOX'), 1)
+        self.assertEqual(self.cache.count('INBOX'), 31)
+        self.client._uid_search = real
+        self.assertEqual(self.client.sync_folder('INBOX'), 0)
+        self.assertEqual(self.cache.uids('INBOX'), set(range(2, 32)))
+
+    def test_failed_fetch_batch_is_retried(self):
+        self.backend.server.fail('FETCH', count=1)
+        self.assertEqual(self.client.sync_folder('INBOX', batch_size=10), 20)
+        self.assertEqual(self.cache.uids('INBOX'), set(range(11, 31)))
+        self.assertEqual(self.client.sync_folder('INBOX', batch_size=10), 10)
+        self.assertEqual(self.cache.uids('INBOX'), set(range(1, 31)))
+
+
+class SelectCondstoreTest(SyncFolderTest):
+    '''服务器支持 CONDSTORE 但没有 ENABLE 扩展，通过 SELECT 的 CONDSTORE 参数启用'''
+
+    capabilities = ('IMAP4rev1', 'ID', 'CONDSTORE', 'UIDPLUS')
+
+    def test_highestmodseq_without_enable(self):
+        self.client.sync_folder('INBOX')
+        self.assertTrue(self.client._condstore)
+        self.assertEqual(self.client.highestmodseq, self.backend.mailbox.folders['INBOX'].highestmodseq)
+        self.assertTrue(self.client.select_folder('INBOX'))
+        self.assertIsNotNone(self.client.highestmodseq)
@@ -0,0 +1,42 @@
+import unittest
+
+from throttle import AdaptiveThrottle
+
+
+class AdaptiveThrottleTest(unittest.TestCase):
+
+    def test_backoff_leaves_slow_start(self):
+        throttle = AdaptiveThrottle(rate=100, min_rate=1, increase=10)
+        throttle.success(100, 0.5)
+        self.assertEqual(throttle.rate, 200)
+        throttle.backoff()
+        self.assertFalse(throttle.slow_start)
+        rate = throttle.rate
+        throttle.success(10, 0.1)
+        self.assertEqual(throttle.rate, rate + 10)
+
+    def test_lasting_latency_rise_backs_off_once(self):
+        throttle = AdaptiveThrottle(rate=100, min_rate=1, max_rate=400, increase=10)
+        for _ in range(5):
+            throttle.success(10, 0.01, 10000)
+        self.assertEqual(throttle.rate, 400)
+        for _ in range(20):
+            throttle.success(10, 0.04, 10000)
+        self.assertGreater(throttle.rate, 200)
+        self.assertFalse(throttle.slow)
+        self.assertAlmostEqual(throttle.avg_latency, 0.04 / 10000, delta=0.01 / 10000)
+
+    def test_latency_compared_per_byte(self):
+        throttle = AdaptiveThrottle(rate=100, min_rate=1, max_rate=400)
+        throttle.success(10, 0.01, 10000)
+        # 同样 10 封邮件，数据多 20 倍、耗时多 10 倍，不算变慢
+        throttle.success(10, 0.1, 200000)
+        self.assertEqual(throttle.rate, 400)
+
+    def test_slow_start_is_bounded_by_throughput(self):
+        throttle = AdaptiveThrottle(rate=100, min_rate=1)
+        for _ in range(200):
+            throttle.success(100, 0.01)
+        # 服务器每秒处理 10000 封，速率最多是它的 headroom 倍
+        self.assertTrue(throttle.slow_start)
+        self.assertEqual(throttle.rate, 20000)
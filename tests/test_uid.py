@@ -0,0 +1,45 @@
+import unittest
+
+from tests.support import connect, make_mailbox
+
+
+class UidModeTest(unittest.TestCase):
+
+    def setUp(self):
+        self.mailbox = make_mailbox(10)
+        self.mailbox.create('Archive')
+        # 前 3 封已被清除，序号和 UID 不再一致：序号 1 对应 UID 4
+        del self.mailbox.folders['INBOX'].messages[:3]
+
+    def _connect(self, use_uid):
+        client = connect(self.mailbox, use_uid=use_uid)
+        self.addCleanup(client.logout)
+        self.assertTrue(client.select_folder('INBOX'))
+        return client
+
+    def test_search_and_fetch_by_uid(self):
+        client = self._connect(True)
+        self.assertEqual(client.search_emails('ALL'), [str(uid) for uid in range(4, 11)])
+        email_obj = next(client.fetch_emails(['5']))
+        self.assertEqual(email_obj.subject, '测试邮件 4')
+        self.assertEqual((email_obj.email_id, email_obj.uid), ('5', 5))
+        self.assertEqual(email_obj.uidvalidity, self.mailbox.folders['INBOX'].uidvalidity)
+
+    def test_copy_by_uid(self):
+        client = self._connect(True)
+        self.assertTrue(client.copy_emails(['5', '9'], 'Archive'))
+        copied = [m.raw for m in self.mailbox.folders['Archive'].messages]
+        self.assertEqual(copied, [m.raw for m in self.mailbox.folders['INBOX'].messages if m.uid in (5, 9)])
+        self.assertIn('UID COPY', client.metrics.snapshot()['commands'])
+
+    def test_sequence_numbers(self):
+        client = self._connect(False)
+        self.assertEqual(client.search_emails('ALL'), [str(seq) for seq in range(1, 8)])
+        email_obj = next(client.fetch_emails(['1']))
+        self.assertEqual(email_obj.subject, '测试邮件 3')
+        # 按序号获取时也记下 UID
+        self.assertEqual((email_obj.email_id, email_obj.uid), ('1', 4))
+
+
+if __name__ == '__main__':
+    unittest.main()
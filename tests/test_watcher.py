@@ -0,0 +1,83 @@
+import os
+import queue
+import shutil
+import tempfile
+import time
+import unittest
+
+from backends import FakeBackend
+from fakeimap import make_message
+from tests.support import connect, make_mailbox
+from watcher import CacheUpdater, FolderWatcher
+
+
+class FolderWatcherTest(unittest.TestCase):
+
+    capabilities = ('IMAP4rev1', 'ID', 'IDLE')
+
+    def setUp(self):
+        self.backend = FakeBackend(make_mailbox(3), capabilities=self.capabilities)
+        self.mailbox = self.backend.mailbox
+        self.changes = queue.Queue()
+
+    def _watch(self, *callbacks):
+        watcher = FolderWatcher('test@example.com', 'secret', poll_interval=0.05,
+                                backend=self.backend, quiet=True)
+        for callback in (self.changes.put,) + callbacks:
+            watcher.subscribe(callback)
+        watcher.start()
+        self.addCleanup(watcher.stop)
+        # 记下初始的 UID 之后服务器上的变化才会作为事件发出
+        deadline = time.monotonic() + 5
+        while watcher.client is None or len(watcher.uids) < 3:
+            self.assertLess(time.monotonic(), deadline)
+            time.sleep(0.01)
+        return watcher
+
+    def _next(self):
+        change = self.changes.get(timeout=5)
+        return change.kind, change.folder, change.uid
+
+    def test_new_flags_and_expunge(self):
+        self._watch()
+        self.mailbox.append('INBOX', make_message(3))
+        self.assertEqual(self._next(), ('new', 'INBOX', 4))
+        with self.mailbox.lock:
+            folder = self.mailbox.folder('INBOX')
+            folder.messages[0].flags.add('\\Seen')
+            folder.touch(folder.messages[0])
+        change = self.changes.get(timeout=5)
+        self.assertEqual((change.kind, change.uid, change.flags), ('flags', 1, '\\Seen'))
+        with self.mailbox.lock:
+            del folder.messages[1]
+        self.assertEqual(self._next(), ('expunge', 'INBOX', 2))
+        self.assertTrue(self.changes.empty())
+
+    def test_cache_updater(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        client = connect(self.backend, cache_path=os.path.join(directory, 'cache.db'))
+        self.addCleanup(client.cache.close)
+        self.addCleanup(client.logout)
+        client.sync_folder('INBOX')
+        self._watch(CacheUpdater(client))
+        self.mailbox.append('INBOX', make_message(3))
+        self.assertEqual(self._next()[0], 'new')
+        with self.mailbox.lock:
+            del self.mailbox.folder('INBOX').messages[0]
+        self.assertEqual(self._next()[0], 'expunge')
+        # 队列先于 CacheUpdater 收到事件，等缓存更新完成后再检查
+        deadline = time.monotonic() + 5
+        while client.cache.uids('INBOX') != {2, 3, 4}:
+            self.assertLess(time.monotonic(), deadline)
+            time.sleep(0.01)
+
+
+class PollingWatcherTest(FolderWatcherTest):
+    '''服务器不支持 IDLE 时用 NOOP 轮询'''
+
+    capabilities = ('IMAP4rev1', 'ID')
+
+
+if __name__ == '__main__':
+    unittest.main()
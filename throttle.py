@@ -0,0 +1,123 @@
+'''
+自适应限速：基于令牌桶的 AIMD 节流器
+'''
+import threading
+import time
+
+
+class AdaptiveThrottle:
+    '''
+    令牌桶限速器，速率按 AIMD 策略自动调整：
+    服务器响应正常时提速（首次被限速前每批至少翻倍，之后线性增加），
+    遇到 NO/BAD、[THROTTLED] 或响应明显变慢时速率成倍下降。
+    响应变慢按每字节耗时判断，邮件大小不同的批次之间才能比较；持续变慢时只降速一次，
+    变慢的样本同样计入平均值，平均值追上新的耗时后恢复提速。
+
+    :param rate: 初始速率（封/秒）
+    :param min_rate: 速率下限
+    :param max_rate: 速率上限，为 None 时不设上限
+    :param increase: 线性增长阶段每批增加的速率
+    :param decrease: 被限速时速率乘以的系数
+    :param slow_factor: 每字节耗时超过历史平均值的倍数时视为响应变慢
+    :param headroom: 首次被限速前速率最多为实际处理速度的倍数
+    '''
+
+    def __init__(self, rate=100.0, min_rate=1.0, max_rate=None, increase=50.0,
+                 decrease=0.5, slow_factor=3.0, headroom=2.0):
+        self.rate = float(rate)
+        self.min_rate = float(min_rate)
+        self.max_rate = max_rate
+        self.increase = increase
+        self.decrease = decrease
+        self.slow_factor = slow_factor
+        self.headroom = headroom
+        self.slow_start = True
+        self.tokens = None
+        self.avg_latency = None
+        self.slow = False
+        self.count = 0
+        self.started = None
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, n=1):
+        '''
+        申请 n 个令牌，令牌不足时阻塞等待
+        :param n: 本次请求包含的邮件数量
+        '''
+        with self._lock:
+            now = time.monotonic()
+            if self.started is None:
+                self.started = now
+            capacity = max(self.rate, n)
+            if self.tokens is None:
+                # 第一次请求时令牌桶是满的
+                self.tokens = capacity
+            else:
+                self.tokens = min(capacity, self.tokens + (now - self._last) * self.rate)
+            self._last = now
+            self.tokens -= n
+            wait = -self.tokens / self.rate if self.tokens < 0 else 0
+        if wait > 0:
+            time.sleep(wait)
+
+    def success(self, n, elapsed, nbytes=None):
+        '''
+        记录一次成功的请求并据此调整速率
+        :param n: 本次请求包含的邮件数量
+        :param elapsed: 本次请求耗时（秒）
+        :param nbytes: 响应的字节数，为 None 时按每封邮件的耗时判断是否变慢；同一个限速器应保持一致
+        '''
+        with self._lock:
+            self.count += n
+            size = n if nbytes is None else nbytes
+            if size > 0:
+                latency = elapsed / size
+                slow = self.avg_latency is not None and latency > self.avg_latency * self.slow_factor
+                self.avg_latency = latency if self.avg_latency is None else 0.8 * self.avg_latency + 0.2 * latency
+                if slow:
+                    # 同一段变慢期间只降速一次，否则耗时持续升高时每批都减半，一直降到 min_rate
+                    if not self.slow:
+                        self.slow = True
+                        self._decrease()
+                    return
+                self.slow = False
+            if self.slow_start:
+                # 尚未被限速时直接追上服务器实际处理速度；服务器一直不限速时翻倍没有尽头，
+                # 所以不超过实际处理速度的 headroom 倍
+                observed = n / elapsed if elapsed > 0 else self._throughput()
+                if observed:
+                    self.rate = max(self.rate, min(max(self.rate * 2, observed), observed * self.headroom))
+            else:
+                self.rate += self.increase
+            if self.max_rate is not None:
+                self.rate = min(self.rate, self.max_rate)
+
+    def backoff(self):
+        '''服务器返回 NO/BAD 或 [THROTTLED] 时调用，成倍降低速率'''
+        with self._lock:
+            self._decrease()
+
+    def _decrease(self):
+        if self.slow_start:
+            # 首次被限速时从实际达到的速率开始减半，而不是从快速增长后的估计值开始
+            self.slow_start = False
+            achieved = self._throughput()
+            if achieved:
+                self.rate = min(self.rate, achieved)
+        self.rate = max(self.min_rate, self.rate * self.decrease)
+        self.tokens = min(self.tokens or 0, 0)
+
+    def throughput(self):
+        '''
+        实际达到的吞吐量
+        :return: 自第一次申请令牌以来的平均速率（封/秒）
+        '''
+        with self._lock:
+            return self._throughput()
+
+    def _throughput(self):
+        if self.started is None or not self.count:
+            return 0.0
+        elapsed = time.monotonic() - self.started
+        return self.count / elapsed if elapsed > 0 else 0.0
@@ -1,34 +1,14 @@
 import sys
-import random
-from datetime import datetime, timedelta
-from PyQt5.QtWidgets import QApplication, QWidget, QVBoxLayout, QHBoxLayout, QLabel, QLineEdit, QPushButton, QListWidget, QListWidgetItem, QTextEdit
-from PyQt5.QtCore import Qt
-
-# 生成随机邮件数据
-def generate_random_emails(num_emails):
-    subjects = ["项目进展汇报", "会议邀请", "技术分享", "培训通知", "活动公告"]
-    senders = ["team1@example.com", "team2@example.com", "team3@example.com", "team4@example.com", "team5@example.com"]
-    contents = ["项目已经完成了 50%", "本周三下午 3 点开会", "分享最新的技术趋势", "参加培训可获得证书", "周末有户外活动"]
-    emails = []
-    start_date = datetime.now() - timedelta(days=30)
-
-    for i in range(num_emails):
-        email = {
-            "id": i + 1,
-            "subject": random.choice(subjects),
-            "sender": f"发件人 <{random.choice(senders)}>",
-            "date": (start_date + timedelta(days=random.randint(0, 30))).strftime("%Y-%m-%d %H:%M"),
-            "content": random.choice(contents)
-        }
-        emails.append(email)
-    return emails
-
-# 不同文件夹的虚拟邮件数据
-folder_emails = {
-    "Inbox": generate_random_emails(50),
-    "垃圾邮件": [],
-    "订阅邮件": []
-}
+from PyQt5.QtWidgets import QApplication, QWidget, QVBoxLayout, QHBoxLayout, QLabel, QLineEdit, QPushButton, QListWidget, QListWidgetItem, QListView, QTextEdit
+from PyQt5.QtCore import Qt, QObject, QThreadPool, pyqtSignal
+
+from mailmodel import ClientSource, EmailListModel, Task
+from to163 import EmailClient
+from watcher import FolderWatcher
+
+class WatcherBridge(QObject):
+    # 监视线程中的变化事件通过信号转到界面线程
+    changed = pyqtSignal(object)
 
 class LoginWindow(QWidget):
     def __init__(self):
@@ -50,29 +30,56 @@ class LoginWindow(QWidget):
         layout.addWidget(self.password_input)
 
         # 登录按钮
-        login_button = QPushButton("登录")
-        login_button.clicked.connect(self.login)
-        layout.addWidget(login_button)
+        self.login_button = QPushButton("登录")
+        self.login_button.clicked.connect(self.login)
+        layout.addWidget(self.login_button)
+
+        # 登录状态提示
+        self.status_label = QLabel()
+        layout.addWidget(self.status_label)
 
         self.setLayout(layout)
         self.setWindowTitle("登录")
         self.setGeometry(300, 300, 300, 200)
 
     def login(self):
-        # 这里简单模拟登录成功，实际应用中需要验证用户名和密码
+        # 在线程池中登录，界面线程不等待网络
         username = self.username_input.text()
         password = self.password_input.text()
-        if username and password:
-            self.close()
-            self.mail_window = MailWindow()
-            self.mail_window.show()
+        if not username or not password:
+            self.status_label.setText("请输入用户名和密码")
+            return
+        self.login_button.setEnabled(False)
+        self.status_label.setText("正在登录…")
+        self.client = EmailClient(username, password)
+        task = Task(0, None, self.client.login)
+        task.signals.done.connect(self.on_login)
+        task.signals.failed.connect(self.on_login_failed)
+        QThreadPool.globalInstance().start(task)
+
+    def on_login(self, generation, key, result):
+        if not result:
+            self.on_login_failed(generation, key, "用户名或密码错误")
+            return
+        self.close()
+        self.mail_window = MailWindow(self.client)
+        self.mail_window.show()
+
+    def on_login_failed(self, generation, key, message):
+        self.login_button.setEnabled(True)
+        self.status_label.setText(f"登录失败: {message}")
 
 class MailWindow(QWidget):
-    def __init__(self):
+    def __init__(self, client):
         super().__init__()
-        self.current_folder = "Inbox"
-        self.current_page = 0
-        self.items_per_page = 15
+        self.client = client
+        self.current_folder = None
+        self.watcher = None
+        self.bridge = WatcherBridge()
+        self.bridge.changed.connect(self.on_change)
+        # EmailClient 只有一个连接，所有网络操作都放进这个单线程的线程池排队执行
+        self.pool = QThreadPool(self)
+        self.pool.setMaxThreadCount(1)
         self.initUI()
 
     def initUI(self):
@@ -80,22 +87,24 @@ class MailWindow(QWidget):
 
         # 左侧文件夹列表，显示文件夹下邮件数量
         self.folder_list = QListWidget()
-        for folder, emails in folder_emails.items():
-            item = QListWidgetItem(f"{folder} ({len(emails)})")
-            self.folder_list.addItem(item)
         self.folder_list.itemClicked.connect(self.show_emails)
         layout.addWidget(self.folder_list)
 
-        # 右侧邮件列表
-        self.email_list = QListWidget()
-        self.email_list.setSelectionMode(QListWidget.MultiSelection)  # 设置多选模式
+        # 右侧邮件列表：模型随滚动按窗口加载邮件头部，不再分页
+        self.email_model = EmailListModel(window_size=100, max_windows=20, pool=self.pool, parent=self)
+        self.email_model.loadFailed.connect(self.show_error)
+        self.email_list = QListView()
+        self.email_list.setModel(self.email_model)
+        self.email_list.setUniformItemSizes(True)  # 行高一致，滚动时不必逐行计算尺寸
+        self.email_list.setSelectionMode(QListView.MultiSelection)  # 设置多选模式
         layout.addWidget(self.email_list)
 
-        # 分页布局
-        self.page_layout = QHBoxLayout()
         main_layout = QVBoxLayout()
         main_layout.addLayout(layout)
-        main_layout.addLayout(self.page_layout)
+
+        # 状态提示
+        self.status_label = QLabel()
+        main_layout.addWidget(self.status_label)
 
         # 退出按钮
         logout_button = QPushButton("退出")
@@ -106,52 +115,76 @@ class MailWindow(QWidget):
         self.setWindowTitle("邮箱客户端")
         self.setGeometry(300, 300, 800, 600)
 
+        self.load_folders()
+
+    def run(self, key, func, *args, done=None):
+        '''在后台执行 func(*args)，完成后在界面线程调用 done(key, result)'''
+        task = Task(0, key, func, *args)
+        if done is not None:
+            task.signals.done.connect(lambda generation, k, result: done(k, result))
+        task.signals.failed.connect(lambda generation, k, message: self.show_error(message))
+        self.pool.start(task)
+
+    def load_folders(self):
+        self.status_label.setText("正在加载文件夹…")
+        self.run(None, self.client.list_folders, done=self.on_folders)
+
+    def on_folders(self, key, folders):
+        self.folder_list.clear()
+        self.folder_items = {}
+        for folder in folders:
+            item = QListWidgetItem(folder)
+            item.setData(Qt.UserRole, folder)
+            self.folder_list.addItem(item)
+            self.folder_items[folder] = item
+            # 每个文件夹只发一条 STATUS (MESSAGES UNSEEN)，不需要 SELECT 和 SEARCH
+            self.run(folder, self.client.folder_status, folder, done=self.on_folder_status)
+        self.status_label.setText("")
         # 初始显示收件箱邮件
-        self.show_emails(self.folder_list.item(0))
+        if folders:
+            inbox = next((i for i in range(len(folders)) if folders[i].upper() == 'INBOX'), 0)
+            self.show_emails(self.folder_list.item(inbox))
+
+    def on_folder_status(self, folder, status):
+        item = self.folder_items.get(folder)
+        if item is None or not status:
+            return
+        item.setText(f"{folder} ({status.get('MESSAGES', 0)}，未读 {status.get('UNSEEN', 0)})")
 
     def show_emails(self, item):
-        folder_name = item.text().split(" (")[0]
+        folder_name = item.data(Qt.UserRole)
         self.current_folder = folder_name
-        self.current_page = 0
-        self.update_email_list()
-        self.update_page_buttons()
-
-    def update_email_list(self):
-        emails = folder_emails[self.current_folder]
-        start_index = self.current_page * self.items_per_page
-        end_index = start_index + self.items_per_page
-        displayed_emails = emails[start_index:end_index]
-
-        self.email_list.clear()
-        for email in displayed_emails:
-            item = QListWidgetItem(f"{email['subject']} - {email['sender']}")
-            item.setFlags(item.flags() | Qt.ItemIsUserCheckable)
-            item.setCheckState(Qt.Unchecked)
-            self.email_list.addItem(item)
-
-    def update_page_buttons(self):
-        # 清空分页按钮
-        for i in reversed(range(self.page_layout.count())):
-            widget = self.page_layout.itemAt(i).widget()
-            if widget is not None:
-                widget.deleteLater()
-
-        emails = folder_emails[self.current_folder]
-        total_pages = (len(emails) + self.items_per_page - 1) // self.items_per_page
-
-        for page in range(total_pages):
-            page_button = QPushButton(str(page + 1))
-            if page == self.current_page:
-                page_button.setStyleSheet("background-color: lightblue")
-            page_button.clicked.connect(lambda _, p=page: self.change_page(p))
-            self.page_layout.addWidget(page_button)
-
-    def change_page(self, page):
-        self.current_page = page
-        self.update_email_list()
-        self.update_page_buttons()
+        self.email_model.set_source(ClientSource(self.client, folder_name))
+        self.watch(folder_name)
+
+    def watch(self, folder):
+        '''用单独的连接监视当前文件夹，新邮件和删除直接更新列表，不再整体刷新'''
+        if self.watcher is not None:
+            self.watcher.stop(timeout=0)
+        self.watcher = FolderWatcher(self.client.user, self.client.password, folder, backend=self.client.backend)
+        self.watcher.subscribe(self.bridge.changed.emit)
+        self.watcher.start()
+
+    def on_change(self, change):
+        if change.folder != self.current_folder:
+            return
+        if change.kind == 'new' and self.client.use_uid:
+            self.email_model.add_ids([change.uid])
+        elif change.kind == 'expunge' and self.client.use_uid:
+            self.email_model.remove_id(change.uid)
+        elif change.kind != 'flags':
+            # 序号模式或需要整体同步时重新加载列表
+            self.email_model.set_source(ClientSource(self.client, change.folder))
+        # 数量和未读数只需一条 STATUS
+        self.run(change.folder, self.client.folder_status, change.folder, done=self.on_folder_status)
+
+    def show_error(self, message):
+        self.status_label.setText(f"操作失败: {message}")
 
     def logout(self):
+        if self.watcher is not None:
+            self.watcher.stop(timeout=0)
+        self.run(None, self.client.logout)
         self.close()
         self.login_window = LoginWindow()
         self.login_window.show()
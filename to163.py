@@ -1,78 +1,329 @@
-from datetime import datetime
 import imaplib
 import email
-from email.header import decode_header
+from email.policy import compat32
 import re
 import logging
 import time
 import os
-import json
+import binascii
+import itertools
+import quopri
+
+from imapparse import chunked, find_attr, parse, parse_bodystructure, parse_fetch, sequence_set
+from throttle import AdaptiveThrottle
+from mailcache import MailCache
+from exporter import Exporter
+from pipeline import ParsePipeline
+import attachments
+from backends import ImapBackend
+from metrics import Metrics, instrument
+import dedup
+import headers
+
+# 头部字段：字段名、冒号和值，值包括以空白开头的续行
+_FIELD = re.compile(rb'^([^\s:]+)[ \t]*:[ \t]*([^\r\n]*(?:\r?\n[ \t][^\r\n]*)*)', re.M)
+# Content-Type 的参数，例如 ; charset="utf-8"
+_PARAM = re.compile(r';\s*([\w.-]+)\s*=\s*(?:"([^"]*)"|([^\s;]+))')
+
+
+def _header_end(raw, start, end):
+    '''
+    查找邮件或 MIME 部分中分隔头部和正文的空行
+    :return: (头部结束位置, 正文开始位置)，没有空行时全部视为头部
+    '''
+    if raw.startswith(b'\r\n', start, end):
+        return start, start + 2
+    if raw.startswith(b'\n', start, end):
+        return start, start + 1
+    crlf = raw.find(b'\r\n\r\n', start, end)
+    lf = raw.find(b'\n\n', start, end)
+    if lf >= 0 and (crlf < 0 or lf < crlf):
+        return lf + 1, lf + 2
+    if crlf >= 0:
+        return crlf + 2, crlf + 4
+    return end, end
+
+
+def _header_fields(raw, start, end):
+    '''
+    不经过 email 解析器，直接取出头部字段的原始值，结果与 compat32 策略的 msg[name] 相同
+    :return: {小写字段名: 原始值}，同名字段只保留第一个
+    '''
+    fields = {}
+    for m in _FIELD.finditer(raw, start, end):
+        name = m.group(1).decode('ascii', 'surrogateescape')
+        key = name.lower()
+        if key not in fields:
+            value = m.group(2).decode('ascii', 'surrogateescape').rstrip('\r\n')
+            fields[key] = compat32.header_fetch_parse(name, value)
+    return fields
+
+
+def _content_type(fields):
+    ''':return: (小写的内容类型, {小写参数名: 参数值})，没有 Content-Type 时为 text/plain'''
+    value = str(fields.get('content-type') or 'text/plain')
+    ctype = value.split(';', 1)[0].strip().lower()
+    if '/' not in ctype:
+        ctype = 'text/plain'
+    params = {m.group(1).lower(): m.group(2) if m.group(2) is not None else m.group(3)
+              for m in _PARAM.finditer(value)}
+    return ctype, params
+
+
+def _text_part(raw, start, end, fields):
+    '''
+    按 MIME 边界查找正文部分，只切分字节，不解码附件等其他部分
+    与 Email._decode_body 的规则相同：multipart 取深度优先的第一个 text/plain 部分，否则取整个正文
+    :return: (正文开始位置, 正文结束位置, 传输编码, 字符集)，multipart 中没有 text/plain 时为 None；
+             包含 message/rfc822 或缺少边界等不便快速切分的结构时返回 False
+    '''
+    ctype, params = _content_type(fields)
+    if ctype.startswith('message/'):
+        return False
+    if not ctype.startswith('multipart/'):
+        encoding = str(fields.get('content-transfer-encoding') or '').strip().lower()
+        charset = params.get('charset')
+        return start, end, encoding, charset.lower() if charset else None
+    boundary = params.get('boundary')
+    if not boundary:
+        return False
+    delimiter = re.compile(rb'^--' + re.escape(boundary.encode('ascii', 'surrogateescape')) + rb'(--)?[ \t]*\r?$', re.M)
+    part_start = None
+    for m in delimiter.finditer(raw, start, end):
+        if part_start is not None:
+            # 分隔行前面的换行属于分隔行
+            part_end = m.start() - 1
+            if part_end > part_start and raw[part_end - 1:part_end] == b'\r':
+                part_end -= 1
+            found = _find_in_part(raw, part_start, max(part_start, part_end))
+            if found is not None:
+                return found
+        if m.group(1):
+            return None
+        part_start = min(m.end() + 1, end)
+    if part_start is not None:
+        # 缺少结束分隔行时，最后一个分隔行之后的内容都属于最后一个部分，与 email 一样去掉末尾的换行
+        part_end = end
+        if raw.endswith(b'\n', part_start, part_end):
+            part_end -= 2 if raw.endswith(b'\r\n', part_start, part_end) else 1
+        return _find_in_part(raw, part_start, part_end)
+    return None
+
+
+def _find_in_part(raw, start, end):
+    '''在 multipart 的一个部分中查找 text/plain，返回值同 _text_part'''
+    header_end, body_start = _header_end(raw, start, end)
+    fields = _header_fields(raw, start, header_end)
+    ctype, _ = _content_type(fields)
+    if ctype.startswith('multipart/') or ctype.startswith('message/'):
+        return _text_part(raw, body_start, end, fields)
+    if ctype == 'text/plain':
+        return _text_part(raw, body_start, end, fields)
+    return None
+
 
 class EmailClient:
-    def __init__(self, user=None, password=None):
+    def __init__(self, user=None, password=None, host='imap.163.com', port=993, use_ssl=True,
+                 rate=100.0, min_rate=1.0, max_rate=None, throttle_retries=3, cache_path=None,
+                 use_uid=True, parse_workers=0, backend=None, metrics=None, quiet=False, timeout=None,
+                 reconnect_retries=5, reconnect_delay=1.0, reconnect_max_delay=60.0):
+        '''
+        :param rate: 初始获取速率（封/秒），之后按服务器响应自动调整
+        :param min_rate: 获取速率下限（封/秒）
+        :param max_rate: 获取速率上限（封/秒），为 None 时不设上限
+        :param throttle_retries: 服务器返回 [THROTTLED] 时同一批次的最大重试次数
+        :param cache_path: 本地缓存数据库路径，设置后 save_emails_to_local 会先增量同步再从缓存导出
+        :param use_uid: 为 True 时搜索、获取、复制和删除都使用 UID 而不是易变的序号
+        :param parse_workers: 批量获取整封邮件时用于解析的进程数，为 0 时在下载线程中解析
+        :param backend: 连接后端（见 backends 模块），例如 LocalBackend('mail.mbox') 读取本地归档；
+                        为 None 时按 host、port、use_ssl 连接 IMAP 服务器
+        :param metrics: 记录命令和各阶段指标的 Metrics 对象，多个客户端可以共用一个；为 None 时新建
+        :param quiet: 为 True 时不打印登录成功、导出完成等提示，只通过 logging.info 记录，错误仍然打印
+        :param timeout: 套接字超时（秒），服务器超过这个时间没有响应时视为连接中断；为 None 时不超时
+        :param reconnect_retries: 连接中断或超时后重新连接并重试同一命令的最大次数，为 0 时不重试
+        :param reconnect_delay: 第一次重新连接前的等待时间（秒），之后每次翻倍
+        :param reconnect_max_delay: 重新连接前的最长等待时间（秒）
+        '''
         self.user = user
         self.password = password
+        self.host = host
+        self.port = port
+        self.use_ssl = use_ssl
+        self.backend = backend or ImapBackend(host, port, use_ssl, timeout)
+        self.metrics = metrics if metrics is not None else Metrics()
+        self.quiet = quiet
+        self.reconnect_retries = reconnect_retries
+        self.reconnect_delay = reconnect_delay
+        self.reconnect_max_delay = reconnect_max_delay
         self.mail = None
+        self.throttle = AdaptiveThrottle(rate=rate, min_rate=min_rate, max_rate=max_rate)
+        self.throttle_retries = throttle_retries
+        self.cache = MailCache(cache_path) if cache_path else None
+        self.use_uid = use_uid
+        self.parse_workers = parse_workers
+        self.current_folder = None
+        self.uidvalidity = None
+        self.highestmodseq = None
+        self.exists = 0
+        self._condstore = False
+        # 服务器没有 ENABLE 扩展时，SELECT 带 CONDSTORE 参数来启用 CONDSTORE
+        self._condstore_select = False
+        # 正在 _reconnect 中重新登录和选择文件夹，此时的命令不再嵌套重新连接
+        self._reconnecting_now = False
 
     class Email:
-        def __init__(self, email_id, subject, sender, date, content):
+        '''
+        邮件对象，使用 __slots__ 节省内存
+        构造时只取出主题、发件人和日期的原始头部值，解码留到第一次访问时进行，结果保存下来；
+        整封邮件按 MIME 边界切出正文部分直接解码，不保留头部、HTML 和附件等其余原始字节
+        '''
+
+        # _body 为 (正文字节, 传输编码, 字符集)，或交给 email 解析的整封邮件原始字节
+        __slots__ = ('email_id', 'uid', 'uidvalidity', '_body', '_subject', '_sender', '_date', '_content', '_pending')
+
+        # _pending 中的标志位：对应字段还保存着未解码的原始值
+        _SUBJECT = 1
+        _SENDER = 2
+        _DATE = 4
+        _CONTENT = 8
+
+        def __init__(self, email_id, subject, sender, date, content, uid=None, uidvalidity=None):
             """
             初始化邮件对象
 
             :param email_id: 邮件的唯一标识符
-            :param subject: 邮件的主题
-            :param sender: 邮件的发件人
-            :param date: 邮件的发送日期
+            :param subject: 邮件的主题（原始头部值）
+            :param sender: 邮件的发件人（原始头部值）
+            :param date: 邮件的发送日期（原始头部值）
             :param content: 邮件的内容
+            :param uid: 邮件的 UID，服务器未返回时为 None
+            :param uidvalidity: 邮件所在文件夹的 UIDVALIDITY，与 uid 一起在重新连接后仍然有效
             """
-            try:
-                self.date = self._parse_date(date)
-            except ValueError:
-                print(f"日期格式错误: {date}，使用原始日期。")
-                self.date = date
-            try:
-                self.subject = self._decode_email_header(subject)
-            except UnicodeDecodeError:
-                print(f"无法解码主题: {subject}，使用原始主题。")
-                self.subject = subject
             self.email_id = email_id
-            self.sender = sender
-            self.content = content
+            self.uid = uid
+            self.uidvalidity = uidvalidity
+            self._body = None
+            self._subject = subject
+            self._sender = sender
+            self._date = date
+            self._content = content
+            self._pending = self._SUBJECT | self._SENDER | self._DATE
 
-        def _parse_date(self, date):
-            """
-            解析日期字符串并格式化为 '%Y-%m-%d %H:%M:%S'
+        @classmethod
+        def from_raw(cls, email_id, raw, uid=None, uidvalidity=None):
+            '''
+            由 RFC822 原始字节构造邮件对象
+            正文部分按 MIME 边界切分后解码，只保存正文字符串；
+            结构特殊（例如包含 message/rfc822）时保存原始字节，访问 content 时再用 email 解析
+            :param raw: 邮件的原始字节
+            '''
+            header_end, body_start = _header_end(raw, 0, len(raw))
+            fields = _header_fields(raw, 0, header_end)
+            obj = cls(email_id, fields.get('subject'), fields.get('from'), fields.get('date'), '', uid, uidvalidity)
+            part = _text_part(raw, body_start, len(raw), fields)
+            if part is False:
+                obj._body = raw
+                obj._pending |= cls._CONTENT
+            elif part is not None:
+                start, end, encoding, charset = part
+                payload = EmailClient._decode_transfer(raw[start:end], encoding)
+                obj._content = EmailClient._decode_content(email_id, payload, charset)
+            return obj
 
-            :param date: 日期字符串
-            :return: 格式化后的日期字符串
-            """
-            date_str = re.sub(r' \(CST\)', '', date)
-            datetime_obj = datetime.strptime(date_str, '%a, %d %b %Y %H:%M:%S %z')
-            return datetime_obj.strftime('%Y-%m-%d')
-        def _decode_email_header(self, header):
-            '''解码邮件头'''
-            if header is None:
-                return ""  # Return an empty string if the header is None
-            decoded_header = decode_header(header)[0]
-            if isinstance(decoded_header, tuple):
-                part, charset = decoded_header
-                if isinstance(part, bytes):  # 检查是否为字节串
-                    try:
-                        # 尝试使用指定的字符集进行解码
-                        if charset and charset.lower() != 'unknown-8bit':
-                            decoded_part = part.decode(charset)
-                        else:
-                            # 若字符集为 unknown-8bit 或为空，使用 utf-8 并采用 replace 策略解码
-                            decoded_part = part.decode('utf-8', errors='replace')
-                    except (UnicodeDecodeError, LookupError):
-                        # 若解码失败，使用 utf-8 并采用 replace 策略解码
-                        decoded_part = part.decode('utf-8', errors='replace')
-                else:  # 如果已经是字符串，直接使用
-                    decoded_part = part
-                return decoded_part
-            else:
-                # 如果解码结果不是元组，直接将其转换为字符串返回
-                return str(decoded_header)
+        @classmethod
+        def from_parts(cls, email_id, header, body=None, encoding=None, charset=None, uid=None, uidvalidity=None):
+            '''
+            由单独获取的头部和正文部分构造邮件对象，正文在访问 content 时才解码
+            :param header: BODY.PEEK[HEADER] 返回的头部字节
+            :param body: BODY.PEEK[n] 返回的正文字节，为 None 时正文为空
+            :param encoding: 正文的 Content-Transfer-Encoding
+            :param charset: 正文声明的字符集
+            '''
+            header = header or b''
+            fields = _header_fields(header, 0, len(header))
+            obj = cls(email_id, fields.get('subject'), fields.get('from'), fields.get('date'), '', uid, uidvalidity)
+            if body is not None:
+                obj._body = (body, encoding or '', charset)
+                obj._pending |= cls._CONTENT
+            return obj
+
+        @property
+        def subject(self):
+            if self._pending & self._SUBJECT:
+                self._subject = headers.decode_header_value(self._subject)
+                self._pending &= ~self._SUBJECT
+            return self._subject
+
+        @subject.setter
+        def subject(self, value):
+            self._subject = value
+            self._pending &= ~self._SUBJECT
+
+        @property
+        def sender(self):
+            if self._pending & self._SENDER:
+                # 同一发件人在文件夹中反复出现，按原始字符串缓存解码结果
+                self._sender = headers.decode_sender(self._sender)
+                self._pending &= ~self._SENDER
+            return self._sender
+
+        @sender.setter
+        def sender(self, value):
+            self._sender = value
+            self._pending &= ~self._SENDER
+
+        @property
+        def date(self):
+            if self._pending & self._DATE:
+                date = headers.format_date(self._date)
+                if date is None:
+                    logging.warning(f"日期格式错误: {self._date}，使用原始日期。")
+                    date = str(self._date)
+                self._date = date
+                self._pending &= ~self._DATE
+            return self._date
+
+        @date.setter
+        def date(self, value):
+            self._date = value
+            self._pending &= ~self._DATE
+
+        @property
+        def content(self):
+            if self._pending & self._CONTENT:
+                self._content = self._decode_body()
+                self._body = None
+                self._pending &= ~self._CONTENT
+            return self._content
+
+        @content.setter
+        def content(self, value):
+            self._content = value
+            self._body = None
+            self._pending &= ~self._CONTENT
+
+        def _decode_body(self):
+            '''解码正文：完整邮件取第一个 text/plain 部分，单独获取的正文部分按传输编码和字符集解码'''
+            if isinstance(self._body, tuple):
+                body, encoding, charset = self._body
+                payload = EmailClient._decode_transfer(body, encoding)
+                return EmailClient._decode_content(self.email_id, payload, charset)
+            msg = email.message_from_bytes(self._body)
+            if msg.is_multipart():
+                for part in msg.walk():
+                    if part.get_content_type() == 'text/plain':
+                        return EmailClient._decode_content(self.email_id, part.get_payload(decode=True),
+                                                           part.get_content_charset())
+                return ''
+            return EmailClient._decode_content(self.email_id, msg.get_payload(decode=True), msg.get_content_charset())
+
+        def decode(self):
+            '''
+            立即解码全部字段并释放原始字节，例如在解析进程中调用，避免把原始字节传回主进程
+            :return: 邮件对象本身
+            '''
+            self.subject, self.sender, self.date, self.content
+            return self
 
         def __str__(self):
             """
@@ -80,6 +331,13 @@ class EmailClient:
             """
             return f"邮件ID: {self.email_id}\n主题: {self.subject}\n发件人: {self.sender}\n日期: {self.date}\n内容: {self.content}"
 
+    def _info(self, message):
+        '''打印提示信息，quiet 模式下只记录到日志'''
+        if self.quiet:
+            logging.info(message)
+        else:
+            print(message)
+
     def login(self):
         '''登录邮箱'''
         if not self.user or not self.password:
@@ -87,15 +345,15 @@ class EmailClient:
             return None
 
         try:
-            self.mail = imaplib.IMAP4_SSL(port=993, host='imap.163.com')
+            self.mail = instrument(self.backend.connect(), self.metrics)
             typ,dat = self.mail.login(self.user, self.password)
             # print(typ, dat)
             if typ == 'OK':
-                print(f"登录成功: {self.user}")
+                self._info(f"登录成功: {self.user}")
             else:
                 print(dat[0].decode())
                 return None
-        except imaplib.IMAP4.error as e:
+        except (imaplib.IMAP4.error, OSError) as e:
             print(f"登录失败: {e}")
             return None
 
@@ -109,13 +367,24 @@ class EmailClient:
         return self.mail
 
     def select_folder(self, folder):
-        '''选择文件夹'''
+        '''选择文件夹，连接中断时重新连接后重试'''
         if self.mail:
+            # SELECT 失败后服务器上不再有选中的文件夹，重新连接时也不应再选回原来的文件夹
+            self.current_folder = None
+            self.uidvalidity = None
             try:
-                typ, dat = self.mail.select(folder)
+                if self._reconnecting_now:
+                    # _reconnect 中的重新选择：连接再次中断时由外层的 _reconnecting 等待后重试
+                    typ, dat = self._select(folder)
+                else:
+                    typ, dat = self._reconnecting('SELECT', lambda: self._select(folder))
                 if typ == 'OK':
-                    print(f"已选择文件夹 {folder}")
-                    print(f"邮件数量: {dat[0].decode()}")
+                    self.current_folder = folder
+                    self.exists = int(dat[0])
+                    self.uidvalidity = self._response_code('UIDVALIDITY')
+                    self.highestmodseq = self._response_code('HIGHESTMODSEQ')
+                    self._info(f"已选择文件夹 {folder}")
+                    self._info(f"邮件数量: {dat[0].decode()}")
                     return typ, dat
                 else:
                     print(dat[0].decode())
@@ -124,13 +393,114 @@ class EmailClient:
                 return None
         return None
 
+    def _select(self, folder):
+        '''发送 SELECT，需要时带上 CONDSTORE 参数；连接状态的处理与 imaplib.IMAP4.select 相同'''
+        if not self._condstore_select:
+            return self.mail.select(folder)
+        self.mail.untagged_responses = {}
+        self.mail.is_readonly = False
+        typ, dat = self.mail._simple_command('SELECT', folder, '(CONDSTORE)')
+        if typ != 'OK':
+            self.mail.state = 'AUTH'
+            return typ, dat
+        self.mail.state = 'SELECTED'
+        return typ, self.mail.untagged_responses.get('EXISTS', [None])
+
+    def _reconnect(self):
+        '''
+        丢弃中断的连接，重新登录（包括 ID 命令）并重新选择原来的文件夹
+        :return: 成功返回 True，登录或选择文件夹失败时返回 False；
+                 文件夹的 UIDVALIDITY 变化时抛出 imaplib.IMAP4.abort，之前的 UID 都已失效，不能继续
+        '''
+        if self.mail is not None:
+            try:
+                self.mail.shutdown()
+            except Exception:
+                pass
+        folder, uidvalidity = self.current_folder, self.uidvalidity
+        condstore, self._condstore, self._condstore_select = self._condstore, False, False
+        self._reconnecting_now = True
+        try:
+            if not self.login():
+                return False
+            if condstore:
+                self._enable_condstore()
+            if folder is not None and not self.select_folder(folder):
+                # 下一次重新连接时仍然要选回这个文件夹
+                self.current_folder, self.uidvalidity = folder, uidvalidity
+                return False
+        except (imaplib.IMAP4.abort, OSError) as e:
+            print(f"重新连接失败: {e}")
+            self.current_folder, self.uidvalidity = folder, uidvalidity
+            return False
+        finally:
+            self._reconnecting_now = False
+        if uidvalidity is not None and self.uidvalidity != uidvalidity:
+            raise imaplib.IMAP4.abort(f"文件夹 {folder} 的 UIDVALIDITY 已变化 ({uidvalidity} -> {self.uidvalidity})，"
+                                      f"无法继续")
+        return True
+
+    def _reconnecting(self, command, call):
+        '''
+        执行一条命令，连接中断（imaplib.IMAP4.abort）或超时等套接字错误时重新连接后重试，
+        每次重试前的等待时间按指数增长；只用于可以安全重复执行的命令，例如 SELECT、FETCH、SEARCH、STATUS、STORE
+        :param command: 命令名，用于日志和重试计数
+        :param call: 无参数函数，通过 self.mail 发送命令，重新连接后 self.mail 是新的连接
+        :return: call 的返回值；重试次数用完后抛出 imaplib.IMAP4.abort
+        '''
+        attempt = 0
+        while True:
+            try:
+                return call()
+            except (imaplib.IMAP4.abort, OSError) as e:
+                error = e
+            while True:
+                if attempt >= self.reconnect_retries:
+                    raise imaplib.IMAP4.abort(f"{command} 失败，已尝试重新连接 {attempt} 次: {error}") from error
+                delay = min(self.reconnect_delay * 2 ** attempt, self.reconnect_max_delay)
+                attempt += 1
+                logging.warning(f"{command} 时连接中断: {error}，{delay:.1f} 秒后第 {attempt} 次重新连接")
+                self.metrics.retry(command)
+                time.sleep(delay)
+                if self._reconnect():
+                    break
+
+    def _response_code(self, code):
+        '''读取 SELECT 返回的响应码，例如 UIDVALIDITY，不存在时返回 None'''
+        typ, dat = self.mail.response(code)
+        if dat and dat[-1]:
+            return int(dat[-1])
+        return None
+
+    def folder_status(self, folder, items=('MESSAGES', 'UNSEEN')):
+        '''
+        用一条 STATUS 命令获取文件夹的邮件数等信息，不需要选择文件夹
+        :param folder: 邮箱文件夹名称
+        :param items: 要获取的状态项，例如 MESSAGES、UNSEEN、UIDNEXT、UIDVALIDITY
+        :return: {状态项: 整数}，失败时返回 None
+        '''
+        if not self.mail:
+            print("未登录邮箱，无法获取文件夹状态。")
+            return None
+        try:
+            typ, dat = self._reconnecting('STATUS', lambda: self.mail.status(folder, f"({' '.join(items)})"))
+        except imaplib.IMAP4.error as e:
+            print(f"获取文件夹 {folder} 状态失败: {e}")
+            return None
+        if typ != 'OK' or not dat or not dat[0]:
+            print(f"获取文件夹 {folder} 状态时收到非 OK 响应: {dat[0].decode() if dat and dat[0] else ''}")
+            return None
+        values = parse(dat[0])
+        attrs = values[-1] if values and isinstance(values[-1], list) else []
+        return {attrs[i].decode().upper(): int(attrs[i + 1]) for i in range(0, len(attrs) - 1, 2)}
+
     def create_folder(self, folder_name):
         '''创建文件夹'''
         if self.mail:
             try:
                 typ, dat = self.mail.create(folder_name)
                 if typ == 'OK':
-                    print(f"文件夹 {folder_name} 已成功创建")
+                    self._info(f"文件夹 {folder_name} 已成功创建")
                     return True
                 else:
                     print(f"创建文件夹 {folder_name} 时收到非 OK 响应: {dat[0].decode()}")
@@ -149,7 +519,7 @@ class EmailClient:
                 typ, dat = self.mail.delete(folder_name)
                 # print(typ, dat)
                 if typ == 'OK':
-                    print(f"文件夹 {folder_name} 已删除")
+                    self._info(f"文件夹 {folder_name} 已删除")
                     return True
                 else:
                     print(f"删除文件夹 {folder_name} 时收到非 OK 响应:{dat[0].decode()}")
@@ -185,11 +555,11 @@ class EmailClient:
         '''
         搜索邮件
         :param criteria: 搜索条件，例如 'FROM "sender@example.com"'
-        :return: 搜索到的邮件 ID 列表
+        :return: 搜索到的邮件 ID 列表，UID 模式下为 UID
         '''
         if self.mail:
             try:
-                typ, dat = self.mail.search(None, criteria)
+                typ, dat = self._reconnecting('SEARCH', lambda: self._msg_command('SEARCH', criteria))
                 if typ == 'OK':
                     email_ids = dat[0].decode().split()
                     return email_ids
@@ -202,111 +572,282 @@ class EmailClient:
         else:
             print("未登录邮箱，无法搜索邮件。")
             return []
-    def save_emails_to_local(self, folder, save_path):
+
+    def search_local(self, query, folder=None, limit=50):
+        '''
+        在本地缓存中全文搜索，不访问服务器；缓存由 sync_folder 增量更新
+        :param query: 查询词，空格分隔的多个词须同时出现，中文按字面连续匹配
+        :param folder: 只搜索该文件夹，为 None 时搜索所有已缓存的文件夹
+        :param limit: 最多返回的结果数
+        :return: 字典列表，包含 folder、uid、subject、sender、date、content、flags
+        '''
+        if self.cache is None:
+            print("未配置本地缓存，无法在本地搜索。")
+            return []
+        return self.cache.search(query, folder, limit)
+
+    def _msg_command(self, name, *args):
+        '''按 use_uid 发送 UID 命令或按序号的命令，例如 _msg_command('COPY', ids, folder)'''
+        if self.use_uid:
+            return self.mail.uid(name, *args)
+        if name == 'SEARCH':
+            return self.mail.search(None, *args)
+        method = getattr(self.mail, name.lower(), None)
+        if method is None:
+            # imaplib 没有提供方法的命令，例如 MOVE
+            return self.mail._simple_command(name, *args)
+        return method(*args)
+
+    def save_emails_to_local(self, folder, save_path, mode='text', fmt='json', checkpoint_every=500,
+                             attachment_dir=None):
         """
-        按邮箱文件夹获取所有邮件并以 JSON 格式保存在本地
+        按邮箱文件夹获取所有邮件并流式保存在本地
+        配置了本地缓存时先增量同步，再从缓存导出；导出按 UID 升序进行并定期记录断点，
+        中断后再次调用会从最后写入的 UID 之后继续。某一批 FETCH 失败或连接中断时保存断点并抛出
+        imaplib.IMAP4.error，不会生成缺少邮件的导出文件
         :param folder: 邮箱文件夹名称
         :param save_path: 保存邮件的本地路径
-        :return: 成功保存的邮件数量
+        :param mode: 获取模式，默认 'text' 只下载头部和 text/plain 部分，跳过附件
+        :param fmt: 'json' 保存为 JSON 数组（<folder>.json），'ndjson' 每行一封邮件（<folder>.ndjson）
+        :param checkpoint_every: 每写入多少封邮件记录一次断点，为 0 时不记录断点
+        :param attachment_dir: 附件存储目录，设置后分块下载附件保存到该目录，每条记录的 attachments
+                               字段引用附件文件（路径相对于 save_path），不把附件内容写入导出文件；
+                               附件下载失败的邮件 attachments 为 null，与没有附件的空列表区分
+        :return: 文件中保存的邮件数量
         """
         if not self.mail:
             print("未登录邮箱，无法获取邮件。")
             return 0
-    
-        # 选择文件夹
-        result = self.select_folder(folder)
-        if not result:
-            return 0
-    
-        # 获取所有邮件的ID
-        email_ids = self.search_emails('ALL')
-        if not email_ids:
-            print(f"在文件夹 {folder} 中未找到邮件。")
-            return 0
-    
+
+        if self.cache is not None:
+            self.sync_folder(folder, mode)
+            if not self.cache.count(folder):
+                print(f"在文件夹 {folder} 中未找到邮件。")
+                return 0
+            if self.cache.count(folder) < self.exists:
+                print(f"文件夹 {folder} 有邮件没有同步到缓存，本次不导出，请稍后重试。")
+                return 0
+        else:
+            # 选择文件夹
+            result = self.select_folder(folder)
+            if not result:
+                return 0
+
+            # 按 UID 导出，断点才能在重新连接后继续使用
+            uids = self._uid_search('ALL')
+            if uids is None:
+                print(f"搜索文件夹 {folder} 中的邮件失败。")
+                return 0
+            if not uids:
+                print(f"在文件夹 {folder} 中未找到邮件。")
+                return 0
+
         # 创建保存路径
         if not os.path.exists(save_path):
             os.makedirs(save_path)
-    
+
         # 生成文件名
-        filename = f"{folder}.json"
-        file_path = os.path.join(save_path, filename)
-    
-        saved_count = 0
-        # 以追加模式打开文件，写入左中括号表示开始一个 JSON 数组
-        with open(file_path, 'w', encoding='utf-8') as f:
-            f.write('[')
-            first_email = True
-            for email_id in email_ids:
-                # 获取邮件内容
-                email_obj = self.fetch_email(email_id)
-                if email_obj:
-                    # 确保所有值都是 JSON 可序列化的
-                    email_dict = {
-                        "email_id": str(email_obj.email_id),
-                        # 调用正确的解码方法
-                        "subject": str(EmailClient.Email._decode_email_header(email_obj, email_obj.subject)),
-                        "sender": str(EmailClient.Email._decode_email_header(email_obj, email_obj.sender)),
-                        "date": str(email_obj.date),
-                        "content": str(email_obj.content)
-                    }
-                    # 如果不是第一封邮件，先写入逗号分隔
-                    if not first_email:
-                        f.write(',')
-                    else:
-                        first_email = False
-                    # 将邮件信息以 JSON 格式写入文件
-                    json.dump(email_dict, f, ensure_ascii=False, indent=4)
-                    saved_count += 1
-                    print(f"已保存邮件: {email_obj.subject}")
-    
-                # 添加小的延迟，避免瞬间完成请求
-                time.sleep(0.5)
-            # 写入右中括号表示 JSON 数组结束
-            f.write(']')
-    
-        print(f"共保存 {saved_count} 封邮件到 {file_path}。")
+        file_path = os.path.join(save_path, f"{folder}.{fmt}")
+        exporter = Exporter(file_path, fmt, checkpoint_every=checkpoint_every, quiet=self.quiet)
+
+        start_time = time.monotonic()
+        last_uid = exporter.open(self.uidvalidity)
+        resumed = exporter.count
+        if self.cache is not None:
+            records = ((r['uid'], {"email_id": str(r['uid']), "subject": r['subject'], "sender": r['sender'],
+                                   "date": r['date'], "content": r['content']})
+                       for r in self.cache.records(folder, after=last_uid))
+        else:
+            uids = [u for u in uids if int(u) > last_uid]
+            records = ((e.uid, self._email_record(e))
+                       for e in self.fetch_emails(uids, mode=mode, uid=True, strict=True) if e)
+        if attachment_dir is not None:
+            records = self._with_attachments(records, attachments.AttachmentStore(attachment_dir), save_path)
+        saved_count = exporter.export(records)
+
+        elapsed = time.monotonic() - start_time
+        # export 阶段包括获取、解码和写入，即端到端的导出吞吐量
+        self.metrics.stage('export', elapsed, saved_count - resumed, exporter.bytes_written)
+        speed = (saved_count - resumed) / elapsed if elapsed > 0 else 0.0
+        self._info(f"共保存 {saved_count} 封邮件到 {file_path}，耗时 {elapsed:.1f} 秒，平均 {speed:.1f} 封/秒。")
         return saved_count
-    
-    # 配置日志记录
-    logging.basicConfig(level=logging.ERROR)
-    
-    def fetch_email(self, email_id):
+
+    def _with_attachments(self, records, store, save_path, batch_size=100):
+        '''
+        按批下载导出记录对应邮件的附件，在记录中加入 attachments 引用列表，下载失败时为 None
+        :param records: (UID, 记录) 生成器
+        :return: (UID, 记录) 生成器
+        '''
+        records = iter(records)
+        while True:
+            batch = list(itertools.islice(records, batch_size))
+            if not batch:
+                return
+            found = self.save_attachments([uid for uid, _ in batch], store, uid=True)
+            for email_uid, record in batch:
+                # 不在结果中说明连 BODYSTRUCTURE 都没有拿到，同样算作失败
+                refs = found.get(str(email_uid))
+                for ref in refs or ():
+                    ref['path'] = os.path.relpath(store.path(ref['sha256']), save_path)
+                record['attachments'] = refs
+                yield email_uid, record
+
+    def _email_record(self, email_obj):
+        '''将邮件对象转换为可 JSON 序列化的字典，各字段在此时按需解码，解码耗时计入 parse 阶段'''
+        start = time.perf_counter()
+        record = {
+            "email_id": str(email_obj.email_id),
+            "subject": str(email_obj.subject),
+            "sender": str(email_obj.sender),
+            "date": str(email_obj.date),
+            "content": str(email_obj.content)
+        }
+        self.metrics.stage('parse', time.perf_counter() - start)
+        return record
+
+    def sync_folder(self, folder, mode='text', batch_size=500):
+        '''
+        增量同步文件夹到本地缓存
+        只下载 UID 大于已缓存最大 UID 的邮件（UID SEARCH UID n:*）；服务器支持 CONDSTORE 时
+        用 CHANGEDSINCE 只更新标志有变化的邮件；UIDVALIDITY 变化时丢弃该文件夹的缓存；
+        缓存数量与服务器不一致时用 UID SEARCH ALL 清理已删除的邮件，并补上之前获取失败的邮件
+        :param folder: 邮箱文件夹名称
+        :param mode: 新邮件的获取模式
+        :param batch_size: 每批获取和写入缓存的邮件数量
+        :return: 新下载的邮件数量
+        '''
+        if self.cache is None:
+            print("未配置本地缓存，无法同步。")
+            return 0
+        if not self.mail:
+            print("未登录邮箱，无法同步。")
+            return 0
+
+        self._enable_condstore()
+        if not self.select_folder(folder):
+            return 0
+        state = self.cache.folder_state(folder)
+        if state is None or state[0] != self.uidvalidity:
+            if state is not None:
+                print(f"文件夹 {folder} 的 UIDVALIDITY 已变化，丢弃本地缓存。")
+            self.cache.reset_folder(folder, self.uidvalidity)
+            state = (self.uidvalidity, None)
+        last_uid = self.cache.max_uid(folder)
+        cached = self.cache.count(folder)
+
+        # 已缓存邮件的标志变化
+        if last_uid and state[1] and self.highestmodseq and self.highestmodseq != state[1]:
+            self._sync_flags(folder, f"1:{last_uid}", state[1])
+
+        new_uids = self._uid_search(f"UID {last_uid + 1}:*")
+        if new_uids is None:
+            print(f"搜索文件夹 {folder} 的新邮件失败，本次不同步。")
+            return 0
+        new_uids = [u for u in new_uids if int(u) > last_uid]
+        # 数量对不上说明有邮件被删除，或者之前有批次获取失败、UID 小于已缓存的最大 UID 的邮件没有缓存；
+        # 搜索失败时不能当作服务器上没有邮件，保留缓存
+        if cached + len(new_uids) != self.exists:
+            live = self._uid_search('ALL')
+            if live is None:
+                print(f"获取文件夹 {folder} 的邮件列表失败，本次不清理已删除的邮件。")
+            else:
+                live = {int(u) for u in live}
+                cached_uids = self.cache.uids(folder)
+                self.cache.remove(folder, cached_uids - live)
+                missing = sorted(u for u in live - cached_uids if u <= last_uid)
+                new_uids = [str(u) for u in missing] + new_uids
+
+        saved = 0
+        pending = []
+        for email_obj in self.fetch_emails(new_uids, batch_size, mode, uid=True):
+            record = self._email_record(email_obj)
+            record['uid'] = email_obj.uid
+            pending.append(record)
+            if len(pending) >= batch_size:
+                saved += self.cache.store(folder, pending)
+                pending = []
+        saved += self.cache.store(folder, pending)
+        if saved < len(new_uids):
+            # 缓存的邮件数少于服务器上的数量，下次同步时会重新获取缺少的邮件
+            print(f"文件夹 {folder} 有 {len(new_uids) - saved} 封邮件获取失败，下次同步时重试。")
+        if new_uids:
+            self._sync_flags(folder, sequence_set(new_uids))
+        if self.highestmodseq:
+            self.cache.set_modseq(folder, self.highestmodseq)
+        self._info(f"文件夹 {folder} 同步完成，新增 {saved} 封邮件，缓存共 {self.cache.count(folder)} 封。")
+        return saved
+
+    def _enable_condstore(self):
+        '''
+        服务器支持时启用 CONDSTORE，使 SELECT 返回 HIGHESTMODSEQ
+        有 ENABLE 扩展时发送 ENABLE CONDSTORE，否则之后的 SELECT 都带上 CONDSTORE 参数（RFC 7162 3.1.8）
+        '''
+        if self._condstore or 'CONDSTORE' not in self.mail.capabilities:
+            return
+        if 'ENABLE' not in self.mail.capabilities:
+            self._condstore = self._condstore_select = True
+            return
+        try:
+            typ, dat = self.mail.enable('CONDSTORE')
+            self._condstore = typ == 'OK'
+        except imaplib.IMAP4.error as e:
+            logging.error(f"启用 CONDSTORE 失败: {e}")
+
+    def _uid_search(self, criteria):
+        '''执行 UID SEARCH，返回 UID 字符串列表，搜索失败时返回 None（与没有结果的空列表区分）'''
+        try:
+            typ, dat = self._reconnecting('UID SEARCH', lambda: self.mail.uid('SEARCH', criteria))
+        except imaplib.IMAP4.error as e:
+            logging.error(f"UID 搜索失败: {e}")
+            return None
+        if typ != 'OK':
+            logging.error(f"UID 搜索失败: {dat}")
+            return None
+        if not dat or not dat[0]:
+            return []
+        return dat[0].decode().split()
+
+    def _sync_flags(self, folder, uid_set, changedsince=None):
+        '''获取邮件标志并写入缓存，changedsince 不为空时只获取 MODSEQ 更大的邮件'''
+        args = ['FETCH', uid_set, '(FLAGS)']
+        if changedsince:
+            args.append(f"(CHANGEDSINCE {changedsince})")
+        try:
+            typ, dat = self._reconnecting('UID FETCH', lambda: self.mail.uid(*args))
+        except imaplib.IMAP4.error as e:
+            logging.error(f"获取邮件标志失败: {e}")
+            return
+        if typ != 'OK':
+            return
+        flags = {}
+        for seq, attrs in parse_fetch(dat):
+            if 'UID' in attrs:
+                flags[int(attrs['UID'])] = ' '.join(f.decode() for f in attrs.get('FLAGS') or [])
+        self.cache.update_flags(folder, flags)
+
+    # 获取模式：full 下载整封 RFC822；text 先取头部和 BODYSTRUCTURE，再只下载 text/plain 部分；
+    # headers 只取主题、发件人和日期，不下载正文
+    FETCH_MODES = ('full', 'text', 'headers')
+    HEADER_FIELDS = 'BODY.PEEK[HEADER.FIELDS (SUBJECT FROM DATE)]'
+
+    def fetch_email(self, email_id, mode='full'):
             '''
             获取邮件内容
             :param email_id: 要获取的邮件的ID
+            :param mode: 获取模式，'full'、'text' 或 'headers'
             :return: 邮件对象
             '''
+            if mode != 'full':
+                return next(self.fetch_emails([email_id], mode=mode), None)
             if self.mail:
                 try:
-                    typ, dat = self.mail.fetch(email_id, '(RFC822)')
+                    typ, dat = self._reconnecting('FETCH', lambda: self._msg_command('FETCH', email_id, '(UID RFC822)'))
                     if typ == 'OK':
-                        msg = email.message_from_bytes(dat[0][1])
-                        subject = msg['Subject']
-                        sender = msg['From']
-                        date = msg['Date']
-                        content = ''
-    
-                        # 获取邮件内容
-                        if msg.is_multipart():
-                            for part in msg.walk():
-                                if part.get_content_type() == 'text/plain':
-                                    charset = part.get_content_charset() or 'utf-8'
-                                    try:
-                                        content = part.get_payload(decode=True).decode(charset)
-                                    except UnicodeDecodeError:
-                                        logging.error(f"无法解码邮件内容 (ID: {email_id})，使用默认字符集 'utf-8'。")
-                                        content = part.get_payload(decode=True).decode('utf-8', errors='replace')
-                                    break
-                        else:
-                            charset = msg.get_content_charset() or 'utf-8'
-                            try:
-                                content = msg.get_payload(decode=True).decode(charset)
-                            except UnicodeDecodeError:
-                                logging.error(f"无法解码邮件内容 (ID: {email_id})，使用默认字符集 'utf-8'。")
-                                content = msg.get_payload(decode=True).decode('utf-8', errors='replace')
-    
-                        return self.Email(email_id, subject, sender, date, content)
+                        for seq, attrs in parse_fetch(dat):
+                            if 'RFC822' in attrs:
+                                return self._parse_message(email_id, attrs['RFC822'], self._attr_uid(attrs))
+                        logging.error(f"未找到邮件 (ID: {email_id})")
+                        return None
                     else:
                         logging.error(f"获取邮件 (ID: {email_id}) 时收到非 OK 响应: {dat[0].decode()}")
                         return None
@@ -317,6 +858,347 @@ class EmailClient:
                 logging.error("未登录邮箱，无法获取邮件。")
                 return None
 
+    def fetch_emails(self, email_ids, batch_size=500, mode='full', uid=None, workers=None, strict=False):
+        '''
+        批量获取邮件内容，每批 ID 压缩成一个序列集（如 1:500），只发送一条 FETCH
+        :param email_ids: 要获取的邮件ID列表（UID 模式下为 UID 列表）
+        :param batch_size: 每条 FETCH 命令包含的邮件数量
+        :param mode: 获取模式，'full'、'text' 或 'headers'，见 FETCH_MODES
+        :param uid: 为 True 时 email_ids 是 UID，使用 UID FETCH；为 None 时按 use_uid
+        :param workers: full 模式下解析邮件的进程数，下载和解析同时进行；为 None 时按 parse_workers，
+                        为 0 时在当前线程解析
+        :param strict: 为 True 时某一批 FETCH 失败就抛出 imaplib.IMAP4.error，否则记录日志后跳过这一批
+        :return: 生成器，每解析完一批就依次产出邮件对象
+        '''
+        if mode not in self.FETCH_MODES:
+            raise ValueError(f"未知的获取模式: {mode}")
+        if uid is None:
+            uid = self.use_uid
+        if workers is None:
+            workers = self.parse_workers
+        if not self.mail:
+            logging.error("未登录邮箱，无法获取邮件。")
+            return
+        if mode != 'full':
+            for batch in chunked(email_ids, batch_size):
+                yield from self._fetch_partial(batch, mode, uid, strict)
+            return
+        if workers:
+            yield from ParsePipeline(workers).run(self, email_ids, batch_size, uid, strict)
+            return
+        for batch in self._fetch_raw(email_ids, batch_size, uid, strict):
+            for email_id, raw, email_uid in batch:
+                yield self._parse_message(email_id, raw, email_uid)
+
+    def _fetch_raw(self, email_ids, batch_size, uid, strict=False):
+        '''
+        按批下载整封邮件，不做解析
+        :return: 生成器，每批产出 [(邮件ID, 原始字节, UID), ...]
+        '''
+        for batch in chunked(email_ids, batch_size):
+            id_set = sequence_set(batch)
+            dat = self._throttled_fetch(id_set, '(UID RFC822)', len(batch), uid)
+            if dat is None:
+                if strict:
+                    raise imaplib.IMAP4.error(f"批量获取邮件 ({id_set}) 失败")
+                continue
+            yield [(self._fetch_id(seq, attrs, uid), attrs['RFC822'], self._attr_uid(attrs))
+                   for seq, attrs in parse_fetch(dat) if attrs.get('RFC822') is not None]
+
+    @staticmethod
+    def _attr_uid(attrs):
+        '''从 FETCH 属性中取出 UID，没有时返回 None'''
+        value = attrs.get('UID')
+        return int(value) if value else None
+
+    def _fetch_id(self, seq, attrs, uid):
+        '''FETCH 响应中邮件的 ID：UID 模式下为 UID，否则为序号'''
+        return str(self._attr_uid(attrs)) if uid else str(seq)
+
+    def _fetch_partial(self, batch, mode, uid=False, strict=False):
+        '''
+        按 text/headers 模式获取一批邮件
+        先用一条 FETCH 取回头部字段（text 模式附带 BODYSTRUCTURE），
+        再把正文所在部分编号相同的邮件合并，用 BODY.PEEK[n] 只下载 text/plain 部分
+        :param strict: 为 True 时任何一条 FETCH 失败都抛出 imaplib.IMAP4.error
+        '''
+        id_set = sequence_set(batch)
+        dat = self._throttled_fetch(id_set, self._partial_items(mode), len(batch), uid)
+        if dat is None:
+            if strict:
+                raise imaplib.IMAP4.error(f"批量获取邮件 ({id_set}) 失败")
+            return
+        messages, sections = self._collect_headers(dat, mode, uid)
+        bodies = {}
+        for section, ids in sections.items():
+            dat = self._throttled_fetch(sequence_set(ids), f"(BODY.PEEK[{section}])", len(ids), uid)
+            if dat is not None:
+                bodies.update(self._collect_bodies(dat, section, uid))
+            elif strict:
+                raise imaplib.IMAP4.error(f"获取邮件正文 ({sequence_set(ids)}) 失败")
+        yield from self._build_partial(messages, bodies)
+
+    def _partial_items(self, mode):
+        '''text/headers 模式第一条 FETCH 的数据项'''
+        if mode == 'text':
+            return f"(UID {self.HEADER_FIELDS} BODYSTRUCTURE)"
+        return f"(UID {self.HEADER_FIELDS})"
+
+    def _collect_headers(self, dat, mode, uid):
+        '''
+        解析第一条 FETCH 的响应
+        :return: (messages, sections)，messages 为 {邮件ID: (头部, 正文部分, UID)}，
+                 sections 为 {部分编号: [邮件ID, ...]}
+        '''
+        messages = {}
+        sections = {}
+        for seq, attrs in parse_fetch(dat):
+            header = find_attr(attrs, 'BODY[HEADER')
+            if header is None:
+                continue
+            email_id = self._fetch_id(seq, attrs, uid)
+            part = self._text_part(attrs.get('BODYSTRUCTURE')) if mode == 'text' else None
+            if part:
+                sections.setdefault(part['section'], []).append(email_id)
+            messages[email_id] = (header, part, self._attr_uid(attrs))
+        return messages, sections
+
+    def _collect_bodies(self, dat, section, uid):
+        '''解析 BODY.PEEK[n] 的响应，返回 {邮件ID: 正文字节}'''
+        bodies = {}
+        for seq, attrs in parse_fetch(dat):
+            body = attrs.get(f"BODY[{section}]")
+            if body is not None:
+                bodies[self._fetch_id(seq, attrs, uid)] = body
+        return bodies
+
+    def _build_partial(self, messages, bodies):
+        '''由头部和正文构造邮件对象'''
+        for email_id, (header, part, email_uid) in messages.items():
+            if email_id in bodies:
+                yield self.Email.from_parts(email_id, header, bodies[email_id], part['encoding'],
+                                            part['params'].get('charset'), email_uid, self.uidvalidity)
+            else:
+                yield self.Email.from_parts(email_id, header, uid=email_uid, uidvalidity=self.uidvalidity)
+
+    @staticmethod
+    def _text_part(structure):
+        '''
+        从 BODYSTRUCTURE 中找出正文部分，规则与 _parse_message 一致：
+        单部分邮件取整个正文，多部分邮件取第一个 text/plain 部分
+        :return: parse_bodystructure 返回的部分字典，没有正文时返回 None
+        '''
+        parts = parse_bodystructure(structure)
+        if not parts:
+            return None
+        if not isinstance(structure[0], list):
+            return parts[0]
+        for part in parts:
+            if part['type'] == 'text' and part['subtype'] == 'plain':
+                return part
+        return None
+
+    @staticmethod
+    def _decode_transfer(data, encoding):
+        '''
+        按 Content-Transfer-Encoding 解码部分内容
+        与 get_payload(decode=True) 一样宽松：被截断或含非法字符的 base64 尽量解码，只记录警告
+        '''
+        if encoding == 'base64':
+            try:
+                return binascii.a2b_base64(data)
+            except binascii.Error as e:
+                logging.warning(f"base64 内容有误，按宽松模式解码: {e}")
+            data = re.sub(rb'[^A-Za-z0-9+/]', b'', data)
+            # 剩余 1 个字符不足一个字节，丢弃；剩余 2、3 个字符补齐填充
+            if len(data) % 4 == 1:
+                data = data[:-1]
+            return binascii.a2b_base64(data + b'=' * (-len(data) % 4))
+        if encoding == 'quoted-printable':
+            return quopri.decodestring(data)
+        return data
+
+    def _throttled_fetch(self, id_set, items, count, uid=False):
+        '''
+        经过限速器发送一条 FETCH，服务器限速时降速并重试
+        :param id_set: 序列集
+        :param items: FETCH 数据项，例如 '(RFC822)'
+        :param count: 本次请求包含的邮件数量
+        :param uid: 为 True 时 id_set 是 UID 集合，使用 UID FETCH
+        :return: FETCH 响应数据，失败时返回 None
+        '''
+        for _ in range(self.throttle_retries + 1):
+            self.throttle.acquire(count)
+            start = time.monotonic()
+            try:
+                if uid:
+                    typ, dat = self._reconnecting('UID FETCH', lambda: self.mail.uid('FETCH', id_set, items))
+                else:
+                    typ, dat = self._reconnecting('FETCH', lambda: self.mail.fetch(id_set, items))
+            except imaplib.IMAP4.abort:
+                # 重新连接也没有恢复，交给调用方中断任务（导出会保存断点），不能跳过这一批继续
+                raise
+            except imaplib.IMAP4.error as e:
+                # BAD 响应会以异常形式抛出
+                self.throttle.backoff()
+                logging.error(f"批量获取邮件 ({id_set}) 失败: {e}")
+                return None
+            if typ == 'OK':
+                nbytes = sum(len(p) for item in dat if item for p in (item if isinstance(item, tuple) else (item,)))
+                self.throttle.success(count, time.monotonic() - start, nbytes)
+                return dat
+            self.throttle.backoff()
+            message = dat[0].decode() if dat and dat[0] else ''
+            if 'THROTTLED' not in message.upper():
+                logging.error(f"批量获取邮件 ({id_set}) 时收到非 OK 响应: {message}")
+                return None
+            logging.warning(f"服务器限速，降低速率至 {self.throttle.rate:.1f} 封/秒后重试: {message}")
+            self.metrics.retry('UID FETCH' if uid else 'FETCH')
+        return None
+
+    def _parse_message(self, email_id, raw, uid=None):
+        '''
+        将 RFC822 原始字节包装为邮件对象，头部和正文在第一次访问时才解析
+        :param email_id: 邮件的ID
+        :param raw: 邮件的原始字节
+        :param uid: 邮件的 UID
+        :return: 邮件对象
+        '''
+        return self.Email.from_raw(email_id, raw, uid, self.uidvalidity)
+
+    @staticmethod
+    def _decode_content(email_id, payload, charset):
+        '''
+        按字符集解码正文，失败时退回 utf-8 并替换无法解码的字符
+        :param email_id: 邮件的ID，用于记录日志
+        :param payload: 已经过传输解码的正文字节
+        :param charset: 正文声明的字符集
+        :return: 正文字符串
+        '''
+        try:
+            return payload.decode(charset or 'utf-8')
+        except (UnicodeDecodeError, LookupError):
+            logging.error(f"无法解码邮件内容 (ID: {email_id})，使用默认字符集 'utf-8'。")
+            return payload.decode('utf-8', errors='replace')
+
+    def save_attachments(self, email_ids, store, chunk_size=1 << 20, batch_size=500, uid=None):
+        '''
+        下载邮件的附件到内容寻址存储，内容相同的附件只保存一份
+        先批量获取 BODYSTRUCTURE 找出附件，再按 chunk_size 分块用 BODY.PEEK[n]<offset.length> 获取，
+        边解码边写入磁盘，内存占用与附件大小无关；与 text 模式相同的正文部分不算附件
+        :param email_ids: 邮件ID列表
+        :param store: AttachmentStore 或存储目录路径
+        :param chunk_size: 每条 FETCH 获取的字节数
+        :param batch_size: 每条获取 BODYSTRUCTURE 的 FETCH 命令包含的邮件数量
+        :param uid: 为 True 时 email_ids 是 UID；为 None 时按 use_uid
+        :return: {邮件ID: [附件引用, ...]}，附件引用为包含 filename、content_type、size、sha256 的字典；
+                 有附件下载失败的邮件对应 None，BODYSTRUCTURE 获取失败的邮件不在结果中
+        '''
+        if not self.mail:
+            print("未登录邮箱，无法下载附件。")
+            return {}
+        if uid is None:
+            uid = self.use_uid
+        if not isinstance(store, attachments.AttachmentStore):
+            store = attachments.AttachmentStore(store)
+        result = {}
+        for batch in chunked(email_ids, batch_size):
+            dat = self._throttled_fetch(sequence_set(batch), '(UID BODYSTRUCTURE)', len(batch), uid)
+            if dat is None:
+                continue
+            for seq, attrs in parse_fetch(dat):
+                email_id = self._fetch_id(seq, attrs, uid)
+                structure = attrs.get('BODYSTRUCTURE')
+                text = self._text_part(structure)
+                text_section = text['section'] if text and text['type'] == 'text' else None
+                refs = []
+                for part in attachments.attachment_parts(structure, text_section):
+                    ref = self._download_part(email_id, part, store, chunk_size, uid)
+                    if ref is None:
+                        refs = None
+                        break
+                    refs.append(ref)
+                result[email_id] = refs
+        return result
+
+    def _download_part(self, email_id, part, store, chunk_size, uid):
+        '''
+        分块下载一个附件并写入存储
+        :return: 附件引用，失败时返回 None
+        '''
+        section = part['section']
+        decoder = attachments.make_decoder(part['encoding'])
+        writer = store.writer()
+        offset = 0
+        try:
+            while True:
+                items = f"(BODY.PEEK[{section}]<{offset}.{chunk_size}>)"
+                dat = self._throttled_fetch(str(email_id), items, 1, uid)
+                if dat is None:
+                    writer.abort()
+                    return None
+                data = b''
+                for _, attrs in parse_fetch(dat):
+                    data = find_attr(attrs, f"BODY[{section}]") or data
+                writer.write(decoder.feed(data))
+                offset += len(data)
+                if len(data) < chunk_size:
+                    break
+            writer.write(decoder.finish())
+            digest = writer.commit()
+        except imaplib.IMAP4.abort:
+            writer.abort()
+            raise
+        except (binascii.Error, OSError) as e:
+            writer.abort()
+            logging.error(f"保存附件失败 (ID: {email_id}, 部分: {section}): {e}")
+            return None
+        return {
+            'filename': part['filename'],
+            'content_type': f"{part['type']}/{part['subtype']}",
+            'size': writer.size,
+            'sha256': digest,
+        }
+
+    def find_duplicates(self, folder=None, verify=False, batch_size=1000):
+        '''
+        查找重复邮件
+        只批量获取 Message-ID、Date、From、Subject 和 RFC822.SIZE 计算指纹，所有字段都相同才视为重复，
+        每组保留最先出现（ID 最小）的一封
+        :param folder: 邮箱文件夹名称，为 None 时使用当前选择的文件夹
+        :param verify: 为 True 时再下载候选邮件的 text/plain 部分，正文摘要相同才视为重复
+        :param batch_size: 每条 FETCH 命令包含的邮件数量
+        :return: (keep, delete) 两个邮件 ID 集合（UID 模式下为 UID），delete 可以直接传给 delete_emails
+        '''
+        if not self.mail:
+            print("未登录邮箱，无法查找重复邮件。")
+            return set(), set()
+        if folder is not None and not self.select_folder(folder):
+            return set(), set()
+        email_ids = self.search_emails('ALL')
+
+        index = dedup.DuplicateIndex()
+        for batch in chunked(email_ids, batch_size):
+            dat = self._throttled_fetch(sequence_set(batch), dedup.FETCH_ITEMS, len(batch), self.use_uid)
+            if dat is None:
+                # 有批次失败时结果不完整，不返回任何可删除的邮件
+                print("获取邮件头部失败，无法查找重复邮件。")
+                return set(), set()
+            for seq, attrs in parse_fetch(dat):
+                header = find_attr(attrs, 'BODY[HEADER')
+                index.add(self._fetch_id(seq, attrs, self.use_uid), dedup.message_key(header, attrs.get('RFC822.SIZE')))
+
+        if verify and index.duplicates:
+            candidates = {i for pair in index.duplicates for i in pair}
+            digests = {e.email_id: dedup.content_digest(e.content)
+                       for e in self.fetch_emails(sorted(candidates, key=int), batch_size, mode='text') if e}
+            index.confirm(digests)
+
+        delete = index.delete_ids()
+        keep = set(email_ids) - delete
+        self._info(f"共检查 {index.seen} 封邮件，发现 {len(delete)} 封重复邮件。")
+        return keep, delete
+
     def copy_email(self, email_id, target_folder):
         '''
         复制邮件到指定文件夹
@@ -324,46 +1206,166 @@ class EmailClient:
         :param target_folder: 目标文件夹的名称
         :return: 复制成功返回 True，失败返回 False
         '''
-        # 检查是否已经登录到邮箱
-        if self.mail:
-            try:
-                typ, dat = self.mail.copy(email_id, target_folder)
-                if typ == 'OK':
-                    print(f"邮件已成功复制到 {target_folder} 文件夹")
-                    return True
-                else:
-                    print(dat[0].decode())
-                    return False
-            except imaplib.IMAP4.error as e:    
-                print(f"复制邮件失败: {e}")
-                return False
-        else:
-            print("未登录邮箱，无法复制邮件。")
-            return False
-    
+        return self.copy_emails([email_id], target_folder)
+
     def delete_email(self, email_id):
         '''
         删除邮件
         :param email_id: 要删除的邮件的ID
         :return: 删除成功返回 True，失败返回 False
         '''
+        return self.delete_emails([email_id])
+
+    def copy_emails(self, email_ids, target_folder, batch_size=5000):
+        '''
+        批量复制邮件到指定文件夹，ID 压缩成序列集后每批只发送一条 COPY
+        :param email_ids: 要复制的邮件ID列表
+        :param target_folder: 目标文件夹的名称
+        :param batch_size: 每条命令包含的邮件数量
+        :return: 复制成功返回 True，失败返回 False
+        '''
         # 检查是否已经登录到邮箱
-        if self.mail:
+        if not self.mail:
+            print("未登录邮箱，无法复制邮件。")
+            return False
+        if not self._bulk_command('COPY', email_ids, batch_size, target_folder):
+            return False
+        self._info(f"{len(email_ids)} 封邮件已成功复制到 {target_folder} 文件夹")
+        return True
+
+    def move_emails(self, email_ids, target_folder, batch_size=5000, expunge_all=False):
+        '''
+        批量移动邮件到指定文件夹
+        服务器支持 MOVE 时每批发送一条 MOVE，否则退回 COPY + STORE +FLAGS (\\Deleted)，
+        最后用一条 EXPUNGE 清除原邮件
+        注意：没有 MOVE 时，UID 模式且服务器支持 UIDPLUS 才能用 UID EXPUNGE 只清除这些邮件；
+        否则普通 EXPUNGE 会清除文件夹中所有带 \\Deleted 标志的邮件，文件夹中还有其他这样的邮件时
+        不执行任何操作并返回 False，除非 expunge_all 为 True
+        :param email_ids: 要移动的邮件ID列表
+        :param target_folder: 目标文件夹的名称
+        :param batch_size: 每条命令包含的邮件数量
+        :param expunge_all: 为 True 时允许普通 EXPUNGE 连带清除文件夹中其他带 \\Deleted 标志的邮件
+        :return: 移动成功返回 True，失败或拒绝执行时返回 False
+        '''
+        if not self.mail:
+            print("未登录邮箱，无法移动邮件。")
+            return False
+        if 'MOVE' in self.mail.capabilities:
+            if not self._bulk_command('MOVE', email_ids, batch_size, target_folder):
+                return False
+        else:
+            if not expunge_all and not self._expunge_is_safe(email_ids):
+                return False
+            if not self._bulk_command('COPY', email_ids, batch_size, target_folder):
+                return False
+            if not self._mark_deleted(email_ids, batch_size):
+                return False
+        self._info(f"{len(email_ids)} 封邮件已移动到 {target_folder} 文件夹")
+        return True
+
+    def delete_emails(self, email_ids, trash='Trash', batch_size=5000, expunge_all=False):
+        '''
+        批量删除邮件：移动到垃圾箱，或直接标记 \\Deleted 并清除
+        注意：清除时只有 UID 模式且服务器支持 UIDPLUS 才能用 UID EXPUNGE 只清除这些邮件；
+        否则普通 EXPUNGE 会清除文件夹中所有带 \\Deleted 标志的邮件，文件夹中还有其他这样的邮件时
+        不执行任何操作并返回 False，除非 expunge_all 为 True（移动到垃圾箱且服务器不支持 MOVE 时同样如此）
+        :param email_ids: 要删除的邮件ID列表
+        :param trash: 垃圾箱文件夹名称，为 None 时不保留副本直接清除
+        :param batch_size: 每条命令包含的邮件数量
+        :param expunge_all: 为 True 时允许普通 EXPUNGE 连带清除文件夹中其他带 \\Deleted 标志的邮件
+        :return: 删除成功返回 True，失败或拒绝执行时返回 False
+        '''
+        if not self.mail:
+            print("未登录邮箱，无法删除邮件。")
+            return False
+        if not email_ids:
+            return True
+        if trash:
+            return self.move_emails(email_ids, trash, batch_size, expunge_all)
+        if not expunge_all and not self._expunge_is_safe(email_ids):
+            return False
+        if not self._mark_deleted(email_ids, batch_size):
+            return False
+        self._info(f"{len(email_ids)} 封邮件已删除")
+        return True
+
+    def _mark_deleted(self, email_ids, batch_size):
+        '''给邮件加上 \\Deleted 标志，然后清除'''
+        if not self._bulk_command('STORE', email_ids, batch_size, '+FLAGS.SILENT', '(\\Deleted)'):
+            return False
+        return self._expunge(email_ids)
+
+    def _uid_expunge(self):
+        ''':return: 能否用 UID EXPUNGE 只清除指定的邮件'''
+        return self.use_uid and 'UIDPLUS' in self.mail.capabilities
+
+    def _expunge_is_safe(self, email_ids):
+        '''
+        检查清除 email_ids 时会不会连带清除别的邮件：不能用 UID EXPUNGE 时，
+        文件夹中除 email_ids 以外还有带 \\Deleted 标志的邮件就拒绝执行
+        :return: 可以清除返回 True；会连带清除其他邮件或检查失败时打印原因并返回 False
+        '''
+        if self._uid_expunge():
+            return True
+        try:
+            typ, dat = self._reconnecting('SEARCH', lambda: self._msg_command('SEARCH', 'DELETED'))
+        except imaplib.IMAP4.error as e:
+            print(f"检查带删除标志的邮件失败: {e}")
+            return False
+        if typ != 'OK':
+            print(dat[0].decode())
+            return False
+        others = set(map(int, dat[0].split())) - set(map(int, email_ids))
+        if others:
+            print(f"服务器不支持 UIDPLUS，EXPUNGE 会连带清除文件夹中另外 {len(others)} 封已标记删除的邮件，未执行操作；"
+                  f"确认要一起清除时传入 expunge_all=True。")
+            return False
+        return True
+
+    def _expunge(self, email_ids):
+        '''
+        清除带 \\Deleted 标志的邮件
+        UID 模式且服务器支持 UIDPLUS 时用一条 UID EXPUNGE 只清除指定邮件，否则清除整个文件夹
+        '''
+        try:
+            if self._uid_expunge():
+                typ, dat = self.mail.uid('EXPUNGE', sequence_set(email_ids))
+            else:
+                typ, dat = self.mail.expunge()
+        except imaplib.IMAP4.error as e:
+            print(f"清除邮件失败: {e}")
+            return False
+        if typ != 'OK':
+            print(dat[0].decode())
+            return False
+        return True
+
+    def _bulk_command(self, name, email_ids, batch_size, *args):
+        '''
+        把 ID 压缩成序列集，分批发送 COPY/MOVE/STORE 等命令
+        :return: 全部成功返回 True，否则返回 False
+        '''
+        if not self.use_uid:
+            # MOVE 会立即清除邮件，从大序号往小处理，避免前面的批次改变后面批次的序号
+            email_ids = sorted(email_ids, key=int, reverse=True)
+        for batch in chunked(email_ids, batch_size):
+            id_set = sequence_set(batch)
             try:
-                typ, dat = self.mail.copy(email_id, 'Trash')
-                if typ == 'OK':
-                    print(f"邮件已成功标记为已删除{dat[0].decode()}")
-                    return True
+                if name == 'STORE':
+                    # 设置标志可以安全地重复执行；COPY/MOVE 重复执行可能产生重复的邮件，不自动重试
+                    typ, dat = self._reconnecting(name, lambda: self._msg_command(name, id_set, *args))
                 else:
-                    print(dat[0].decode())
-                    return False
-            except imaplib.IMAP4.error as e:
-                print(f"删除邮件失败: {e}")
+                    typ, dat = self._msg_command(name, id_set, *args)
+            except (imaplib.IMAP4.error, OSError) as e:
+                print(f"{name} 邮件 ({id_set}) 失败: {e}")
                 return False
-
+            if typ != 'OK':
+                print(dat[0].decode())
+                return False
+        return True
 
     def logout(self):
         '''退出登录'''
         if self.mail:
             typ,dat = self.mail.logout()
-            print(typ, dat)
\ No newline at end of file
+            self._info(f"{typ} {dat}")
\ No newline at end of file
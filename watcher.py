@@ -0,0 +1,265 @@
+'''
+文件夹监视：用单独的连接 IDLE 等待服务器推送，把未标记的 EXISTS/EXPUNGE/FETCH 响应
+转换为增量变化事件；服务器不支持 IDLE 时定期发送 NOOP 轮询
+'''
+import imaplib
+import threading
+
+from imapparse import parse_fetch
+from to163 import EmailClient
+
+
+class Change:
+    '''
+    一条变化事件
+    :param kind: 'new' 新邮件，'expunge' 邮件被删除，'flags' 标志变化，
+                 'resync' 本地状态可能已失效（重新连接或 UIDVALIDITY 变化），需要整体同步
+    :param folder: 文件夹名称
+    :param uid: 邮件的 UID，resync 时为 None
+    :param flags: 标志字符串，只有 new 和 flags 事件才有
+    '''
+
+    def __init__(self, kind, folder, uid=None, flags=None):
+        self.kind = kind
+        self.folder = folder
+        self.uid = uid
+        self.flags = flags
+
+    def __repr__(self):
+        return f"Change({self.kind!r}, {self.folder!r}, uid={self.uid}, flags={self.flags!r})"
+
+
+class FolderWatcher:
+    '''
+    在后台线程中监视一个文件夹，使用独立的 EmailClient 连接
+    订阅者在监视线程中被调用，界面程序需要自行转发到界面线程
+
+    :param user: 邮箱账号
+    :param password: 邮箱密码或授权码
+    :param folder: 要监视的文件夹
+    :param poll_interval: 不支持 IDLE 时的轮询间隔（秒），也是断线后重连的等待时间
+    :param idle_timeout: 重新发起 IDLE 的间隔（秒），RFC 2177 建议不超过 29 分钟
+    :param client_kwargs: 传给 EmailClient 的其它参数，例如 host、port、use_ssl
+    '''
+
+    def __init__(self, user, password, folder='INBOX', poll_interval=30, idle_timeout=29 * 60, **client_kwargs):
+        self.user = user
+        self.password = password
+        self.folder = folder
+        self.poll_interval = poll_interval
+        self.idle_timeout = idle_timeout
+        self.client_kwargs = client_kwargs
+        self.client = None
+        self.uidvalidity = None
+        # 序号 -> UID，uids[i] 是序号 i + 1 的邮件
+        self.uids = []
+        self.exists = 0
+        self._subscribers = []
+        self._stop = threading.Event()
+        self._thread = None
+        self._idle_lock = threading.Lock()
+        self._idle_tag = None
+
+    def subscribe(self, callback):
+        '''注册回调 callback(change)'''
+        self._subscribers.append(callback)
+
+    def _emit(self, kind, uid=None, flags=None):
+        change = Change(kind, self.folder, uid, flags)
+        for callback in self._subscribers:
+            try:
+                callback(change)
+            except Exception as e:
+                print(f"处理变化事件 {change} 失败: {e}")
+
+    def start(self):
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self, timeout=5):
+        '''停止监视并退出登录'''
+        self._stop.set()
+        self._end_idle()
+        if self._thread:
+            self._thread.join(timeout)
+
+    def _run(self):
+        first = True
+        while not self._stop.is_set():
+            try:
+                self._connect(resync=not first)
+                first = False
+                while not self._stop.is_set():
+                    if 'IDLE' in self.client.mail.capabilities:
+                        self._idle()
+                    else:
+                        self._poll()
+            except (imaplib.IMAP4.error, OSError, ValueError) as e:
+                if self._stop.is_set():
+                    break
+                print(f"监视文件夹 {self.folder} 的连接中断: {e}，{self.poll_interval} 秒后重新连接")
+                self._stop.wait(self.poll_interval)
+        self._logout()
+
+    def _connect(self, resync):
+        '''登录、选择文件夹并记录序号与 UID 的对应关系'''
+        self._logout()
+        client = EmailClient(self.user, self.password, **self.client_kwargs)
+        if not client.login():
+            raise imaplib.IMAP4.error('登录失败')
+        if not client.select_folder(self.folder):
+            raise imaplib.IMAP4.error(f'选择文件夹 {self.folder} 失败')
+        self.client = client
+        changed = self.uidvalidity is not None and client.uidvalidity != self.uidvalidity
+        self.uidvalidity = client.uidvalidity
+        uids = client._uid_search('ALL')
+        if uids is None:
+            raise imaplib.IMAP4.error(f'搜索文件夹 {self.folder} 中的邮件失败')
+        self.uids = [int(u) for u in uids]
+        self.exists = len(self.uids)
+        if resync or changed:
+            self._emit('resync')
+
+    def _logout(self):
+        if self.client is not None:
+            try:
+                self.client.logout()
+            except Exception:
+                pass
+            self.client = None
+
+    # ---- IDLE ----
+
+    def _idle(self):
+        '''发起一次 IDLE，直到超时、有新邮件或停止时发送 DONE'''
+        mail = self.client.mail
+        tag = mail._new_tag()
+        mail.send(tag + b' IDLE\r\n')
+        line = mail.readline()
+        if not line.startswith(b'+'):
+            raise imaplib.IMAP4.error(f"IDLE 失败: {line.decode(errors='replace').strip()}")
+        with self._idle_lock:
+            self._idle_tag = tag
+        if self._stop.is_set():
+            self._end_idle()
+        timer = threading.Timer(self.idle_timeout, self._end_idle)
+        timer.daemon = True
+        timer.start()
+        try:
+            while True:
+                line = mail.readline()
+                if not line:
+                    raise imaplib.IMAP4.abort('连接已被服务器关闭')
+                if line.startswith(tag + b' '):
+                    break
+                if line.startswith(b'* '):
+                    self._untagged(line[2:].rstrip(b'\r\n'))
+                    if self.exists > len(self.uids):
+                        # 退出 IDLE 后才能发送 FETCH 取新邮件的 UID
+                        self._end_idle()
+        finally:
+            timer.cancel()
+            with self._idle_lock:
+                self._idle_tag = None
+        self._fetch_new()
+
+    def _end_idle(self):
+        '''发送 DONE 结束 IDLE；可以在其它线程调用，每次 IDLE 只发送一次'''
+        with self._idle_lock:
+            if self._idle_tag is None or self.client is None:
+                return
+            self._idle_tag = None
+            try:
+                self.client.mail.send(b'DONE\r\n')
+            except OSError:
+                pass
+
+    # ---- 轮询 ----
+
+    def _poll(self):
+        '''等待 poll_interval 秒后发送 NOOP，处理服务器附带的变化'''
+        if self._stop.wait(self.poll_interval):
+            return
+        mail = self.client.mail
+        typ, dat = mail.noop()
+        if typ != 'OK':
+            raise imaplib.IMAP4.error(f"NOOP 失败: {dat}")
+        # imaplib 按类型收集未标记响应，先处理删除再处理数量和标志
+        for seq in mail.response('EXPUNGE')[1] or []:
+            if seq:
+                self._untagged(seq + b' EXPUNGE')
+        exists = mail.response('EXISTS')[1] or []
+        if exists and exists[-1]:
+            self._untagged(exists[-1] + b' EXISTS')
+        for item in mail.response('FETCH')[1] or []:
+            data = item[0] if isinstance(item, tuple) else item
+            if data:
+                seq, _, rest = data.partition(b' ')
+                self._untagged(seq + b' FETCH ' + rest)
+        self._fetch_new()
+
+    # ---- 响应处理 ----
+
+    def _untagged(self, line):
+        '''处理一条未标记响应，例如 b'5 EXISTS'、b'3 EXPUNGE'、b'2 FETCH (FLAGS (\\Seen))' '''
+        parts = line.split(b' ', 2)
+        if len(parts) < 2 or not parts[0].isdigit():
+            return
+        seq = int(parts[0])
+        kind = parts[1].upper()
+        if kind == b'EXISTS':
+            self.exists = seq
+        elif kind == b'EXPUNGE':
+            if 1 <= seq <= len(self.uids):
+                uid = self.uids.pop(seq - 1)
+                self.exists -= 1
+                self._emit('expunge', uid)
+        elif kind == b'FETCH' and len(parts) > 2:
+            for _, attrs in parse_fetch([parts[0] + b' ' + parts[2]]):
+                if 'FLAGS' not in attrs:
+                    continue
+                uid = int(attrs['UID']) if attrs.get('UID') else (
+                    self.uids[seq - 1] if 1 <= seq <= len(self.uids) else None)
+                if uid is not None:
+                    self._emit('flags', uid, _flags(attrs['FLAGS']))
+
+    def _fetch_new(self):
+        '''EXISTS 大于已知数量时获取新邮件的 UID 和标志'''
+        if self.exists <= len(self.uids):
+            return
+        typ, dat = self.client.mail.fetch(f"{len(self.uids) + 1}:{self.exists}", '(UID FLAGS)')
+        if typ != 'OK':
+            return
+        for seq, attrs in sorted(parse_fetch(dat), key=lambda r: r[0]):
+            if seq == len(self.uids) + 1 and attrs.get('UID'):
+                uid = int(attrs['UID'])
+                self.uids.append(uid)
+                self._emit('new', uid, _flags(attrs.get('FLAGS')))
+
+
+def _flags(value):
+    return ' '.join(f.decode() for f in value or [])
+
+
+class CacheUpdater:
+    '''
+    把变化事件应用到 EmailClient 的本地缓存：新邮件通过 sync_folder 增量下载，
+    删除和标志变化直接写入缓存，不必整体刷新文件夹
+    :param client: 已登录且配置了缓存的 EmailClient，不能与监视器或其它线程共用
+    :param mode: 下载新邮件的获取模式
+    '''
+
+    def __init__(self, client, mode='text'):
+        self.client = client
+        self.mode = mode
+
+    def __call__(self, change):
+        cache = self.client.cache
+        if change.kind in ('new', 'resync'):
+            self.client.sync_folder(change.folder, self.mode)
+        elif change.kind == 'expunge':
+            cache.remove(change.folder, [change.uid])
+        elif change.kind == 'flags':
+            cache.update_flags(change.folder, {change.uid: change.flags})